@@ -0,0 +1,101 @@
+"""
+Comandos CLI de la aplicación (flask <comando>)
+"""
+import click
+
+
+def registrar_comandos(app):
+    """Registra los comandos CLI en la aplicación"""
+    
+    @app.cli.command('db-init')
+    def db_init():
+        """Crea o actualiza el esquema de la base de datos"""
+        from app.core.database import inicializar_esquema
+        inicializar_esquema()
+        click.echo("✓ Esquema de base de datos listo")
+    
+    @app.cli.command('seed')
+    def seed():
+        """Crea el usuario admin y los servicios de ejemplo si no existen"""
+        from app.core.database import sembrar_datos
+        sembrar_datos()
+        click.echo("✓ Datos iniciales listos")
+    
+    @app.cli.command('catalogo-importar')
+    @click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+    def catalogo_importar(archivo):
+        """Importa servicios desde un CSV o JSON (crea o actualiza por nombre)"""
+        from app.services.service_locator import get_servicio_service
+        from app.services.servicio_service import ImportacionInvalida
+        servicio_service = get_servicio_service()
+        
+        with open(archivo, 'rb') as f:
+            contenido = f.read()
+        try:
+            filas = servicio_service.leer_catalogo(contenido, archivo.rsplit('.', 1)[-1].lower())
+            creados, actualizados = servicio_service.importar_catalogo(filas)
+        except ImportacionInvalida as e:
+            for fila, mensaje in e.errores:
+                click.echo(f"  Fila {fila}: {mensaje}", err=True)
+            raise click.ClickException(str(e))
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"✓ {creados} servicio(s) creado(s), {actualizados} actualizado(s)")
+    
+    @app.cli.command('catalogo-exportar')
+    @click.argument('archivo', type=click.Path(dir_okay=False, writable=True))
+    def catalogo_exportar(archivo):
+        """Exporta el catálogo completo a un CSV o JSON"""
+        from app.services.service_locator import get_servicio_service
+        try:
+            contenido = get_servicio_service().exportar_catalogo(archivo.rsplit('.', 1)[-1].lower())
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        with open(archivo, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(contenido)
+        click.echo(f"✓ Catálogo exportado a {archivo}")
+    
+    @app.cli.command('galeria-variantes')
+    @click.option('--sin-indice', is_flag=True,
+                  help='No actualiza la tabla galeria_imagen (build sin base de datos)')
+    def galeria_variantes(sin_indice):
+        """Genera las variantes responsive que falten en la galería"""
+        from app.services.service_locator import get_galeria_service
+        galeria_service = get_galeria_service()
+        
+        total = galeria_service.generar_variantes_faltantes()
+        if not sin_indice:
+            # Registrar en el índice los anchos generados
+            galeria_service.indexar_carpeta()
+        click.echo(f"✓ {total} variante(s) generada(s)")
+    
+    @app.cli.command('galeria-indexar')
+    def galeria_indexar():
+        """Sincroniza el índice de la galería (tabla galeria_imagen) con la carpeta"""
+        from app.services.service_locator import get_galeria_service
+        agregadas, actualizadas, eliminadas = get_galeria_service().indexar_carpeta()
+        click.echo(f"✓ {agregadas} imagen(es) agregada(s), {actualizadas} actualizada(s), "
+                   f"{eliminadas} eliminada(s) del índice")
+    
+    @app.cli.command('galeria-migrar')
+    def galeria_migrar():
+        """Renombra la galería a nombres por contenido y elimina duplicados"""
+        from app.services.service_locator import get_galeria_service
+        renombradas, duplicadas = get_galeria_service().migrar_a_contenido()
+        click.echo(f"✓ {renombradas} imagen(es) renombrada(s), {duplicadas} duplicada(s) eliminada(s)")
+    
+    @app.cli.command('assets-css')
+    def assets_css():
+        """Empaqueta y minifica la cadena de @import de css/style.css"""
+        from app.web.assets import construir_css
+        bundle = construir_css(app.static_folder)
+        click.echo(f"✓ CSS empaquetado en static/{bundle}")
+    
+    @app.cli.command('assets-comprimir')
+    def assets_comprimir():
+        """Genera los .br/.gz de los estáticos comprimibles"""
+        from app.web.precomprimidos import brotli, comprimir_estaticos
+        generados, eliminados = comprimir_estaticos(app.static_folder)
+        click.echo(f"✓ {generados} archivo(s) comprimido(s), {eliminados} huérfano(s) eliminado(s)")
+        if brotli is None:
+            click.echo("⚠ brotli no está instalado: solo se generaron .gz")
@@ -16,12 +16,38 @@ class Config:
     SESSION_COOKIE_SECURE = False
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
+    
+    # Tamaño máximo de una petición (subidas múltiples a la galería)
+    MAX_CONTENT_LENGTH = 64 * 1024 * 1024
+    
+    # Procesos para optimizar imágenes en segundo plano (0 = en línea)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', min(2, os.cpu_count() or 1)))
+    
+    # Caché en disco de /img/<nombre> (miniaturas bajo demanda): carpeta y presupuesto
+    IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR')
+    IMAGE_CACHE_BYTES = int(os.environ.get('IMAGE_CACHE_MB', 256)) * 1024 * 1024
+    
+    # Instrumentación: cabecera Server-Timing y log de peticiones lentas (ms, 0 = desactivado)
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    # Origen público del sitio para URLs absolutas (og:image). Las páginas se
+    # cachean sin distinguir host, así que no se toma de la petición
+    SITE_URL = (os.environ.get('SITE_URL') or os.environ.get('RENDER_EXTERNAL_URL') or '').rstrip('/')
+    # Zona horaria de la barbería (agenda de citas)
+    TIMEZONE = os.environ.get('TIMEZONE', 'America/Havana')
+    
+    # Si se define, /metrics exige "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Sin token, /metrics no se expone (en producción siempre se exige)
+    METRICS_REQUIRE_TOKEN = False
 
 
 class DevelopmentConfig(Config):
     """Configuración para desarrollo"""
     DEBUG = True
     TESTING = False
+    # Crea el esquema y los datos de ejemplo al arrancar (en producción: flask db-init/seed)
+    AUTO_INIT_DB = True
 
 
 class ProductionConfig(Config):
@@ -29,6 +55,9 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     SESSION_COOKIE_SECURE = True
+    # Proxies delante de la app (Render): la IP real viene en X-Forwarded-For
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 1))
+    METRICS_REQUIRE_TOKEN = True
 
 
 class TestingConfig(Config):
@@ -36,6 +65,52 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    IMAGE_WORKERS = 0
+    AUTO_INIT_DB = True
+
+
+# ==================== PERFILES DEL MOTOR ====================
+
+# Segundos esperando el bloqueo de escritura antes de "database is locked".
+# El driver (timeout) y el PRAGMA busy_timeout fijan el mismo valor: el
+# PRAGMA se aplica después al conectar y sobrescribiría uno distinto.
+SQLITE_LOCK_TIMEOUT = 15
+
+# PRAGMAs que se aplican a cada conexión SQLite (ver app.core.database)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',        # lectores y escritor concurrentes
+    'synchronous': 'NORMAL',      # seguro con WAL y mucho más rápido que FULL
+    'busy_timeout': SQLITE_LOCK_TIMEOUT * 1000,
+    'mmap_size': 64 * 1024 * 1024,
+}
+
+SQLITE_ENGINE_OPTIONS = {
+    'connect_args': {'timeout': SQLITE_LOCK_TIMEOUT, 'check_same_thread': False},
+}
+
+POSTGRES_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+    'pool_timeout': 10,
+    'pool_pre_ping': True,        # descarta conexiones cerradas por el servidor
+    'pool_recycle': 1800,
+}
+
+
+def normalizar_database_url(url):
+    """Heroku/Render entregan postgres://, que SQLAlchemy 2 ya no acepta"""
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def perfil_motor(url):
+    """Opciones de create_engine según el backend de la URL"""
+    if url.startswith('sqlite'):
+        return SQLITE_ENGINE_OPTIONS
+    if url.startswith('postgresql'):
+        return POSTGRES_ENGINE_OPTIONS
+    return {}
 
 
 def get_config(env=None):
@@ -48,4 +123,14 @@ def get_config(env=None):
         'testing': TestingConfig,
     }
     
-    return configs.get(env, DevelopmentConfig)
+    config = configs.get(env, DevelopmentConfig)
+    url = normalizar_database_url(config.SQLALCHEMY_DATABASE_URI)
+    
+    # Subclase con el perfil del motor resuelto para la URL efectiva
+    return type(config.__name__, (config,), {
+        'SQLALCHEMY_DATABASE_URI': url,
+        'SQLALCHEMY_ENGINE_OPTIONS': {
+            **perfil_motor(url),
+            **getattr(config, 'SQLALCHEMY_ENGINE_OPTIONS', {}),
+        },
+    })
@@ -0,0 +1,169 @@
+"""
+Base de datos: ajustes del motor, esquema y datos iniciales
+"""
+from datetime import datetime, timezone
+from sqlalchemy import event
+from app.core.config import SQLITE_PRAGMAS
+from app.domain.models import db, User, Servicio, Barbero, ContadorVersion
+
+
+def registrar_pragmas_sqlite(engine, pragmas=SQLITE_PRAGMAS):
+    """Aplica los PRAGMAs a cada conexión nueva de un motor SQLite"""
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    # journal_mode no aplica a bases en memoria
+    en_memoria = engine.url.database in (None, '', ':memory:')
+    
+    @event.listens_for(engine, 'connect')
+    def aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for nombre, valor in pragmas.items():
+                if nombre == 'journal_mode' and en_memoria:
+                    continue
+                cursor.execute(f"PRAGMA {nombre}={valor}")
+        finally:
+            cursor.close()
+
+
+# ==================== ESQUEMA Y DATOS INICIALES ====================
+
+def inicializar_esquema():
+    """Crea tablas, columnas e índices que falten y rellena datos derivados"""
+    db.create_all()
+    _asegurar_columnas()
+    _eliminar_columnas_obsoletas()
+    _asegurar_indices()
+    _migrar_precios()
+    _migrar_contadores()
+
+
+def _asegurar_columnas():
+    """
+    Añade a las tablas existentes las columnas nuevas de los modelos.
+    Solo columnas opcionales (nullable): create_all() no las añade.
+    """
+    from sqlalchemy import inspect, text
+    
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existentes = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existentes or not column.nullable:
+                continue
+            tipo = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {tipo}'))
+
+
+# Columnas que los modelos ya no declaran: {tabla: (columna, ...)}
+COLUMNAS_OBSOLETAS = {
+    # El compare-and-swap de la agenda usa el bitmap; la versión no se leía
+    'agenda_dia': ('version',),
+}
+
+
+def _eliminar_columnas_obsoletas():
+    """
+    Elimina las columnas obsoletas de las tablas existentes.
+    Las NOT NULL sin valor por defecto en la base harían fallar los INSERT.
+    """
+    from sqlalchemy import inspect, text
+    
+    inspector = inspect(db.engine)
+    for tabla, columnas in COLUMNAS_OBSOLETAS.items():
+        if not inspector.has_table(tabla):
+            continue
+        existentes = {c['name'] for c in inspector.get_columns(tabla)}
+        for columna in columnas:
+            if columna in existentes:
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {tabla} DROP COLUMN {columna}'))
+
+
+def _asegurar_indices():
+    """
+    Crea los índices declarados en los modelos que falten.
+    create_all() no añade índices nuevos a tablas que ya existen.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def _migrar_precios():
+    """Rellena precio_centavos en servicios creados antes de existir la columna"""
+    pendientes = Servicio.query.filter(Servicio.precio_centavos.is_(None)).all()
+    for servicio in pendientes:
+        try:
+            servicio.precio_centavos = Servicio.precio_a_centavos(servicio.precio)
+        except ValueError:
+            print(f"⚠ Precio no numérico en servicio {servicio.id}: {servicio.precio!r}")
+    
+    if pendientes:
+        db.session.commit()
+
+
+def _migrar_contadores():
+    """Fecha de cambio para contadores creados antes de existir la columna"""
+    pendientes = ContadorVersion.query.filter(ContadorVersion.actualizado_at.is_(None)).update(
+        {ContadorVersion.actualizado_at: datetime.now(timezone.utc).replace(tzinfo=None)},
+        synchronize_session=False
+    )
+    if pendientes:
+        db.session.commit()
+
+
+def sembrar_datos():
+    """Crea datos iniciales si no existen"""
+    from app.domain.repositories import ServicioRepository, VersionRepository
+    from app.services.auth_service import AuthService
+    
+    # Crear usuario admin si no existe
+    if not User.query.filter_by(username='admin').first():
+        try:
+            AuthService.crear_usuario('admin', 'barber123')
+            print("✓ Usuario admin creado")
+        except ValueError:
+            pass
+        
+        # Crear servicios de ejemplo
+        servicios_ejemplo = [
+            Servicio(nombre="Corte Clásico", precio="35.000", 
+                    descripcion="Corte tradicional con tijera y máquina", categoria="corte"),
+            Servicio(nombre="Skin Fade + Degrade", precio="45.000", 
+                    descripcion="Degradado perfecto a piel", categoria="corte"),
+            Servicio(nombre="Corte + Barba", precio="60.000", 
+                    descripcion="Pack más vendido", categoria="corte", duracion_minutos=60),
+            Servicio(nombre="Barba Completa", precio="30.000", 
+                    descripcion="Afeitado + perfilado + hot towel", categoria="corte"),
+            Servicio(nombre="Peinados", precio="25.000", 
+                    descripcion="Estilizado con secador y producto", categoria="extra"),
+            Servicio(nombre="Tinte", precio="80.000", 
+                    descripcion="Coloración completa + lavado", categoria="extra", duracion_minutos=90),
+            Servicio(nombre="Afeitado Clásico", precio="35.000", 
+                    descripcion="Con toalla caliente y navaja", categoria="extra"),
+            Servicio(nombre="Perfilado de Cejas", precio="15.000", 
+                    descripcion="Definición perfecta", categoria="extra", duracion_minutos=15),
+        ]
+        db.session.bulk_save_objects(servicios_ejemplo)
+        VersionRepository.incrementar(ServicioRepository.VERSION)
+        db.session.commit()
+        print("✓ Servicios de ejemplo creados")
+    
+    # Al menos un barbero para que la agenda tenga disponibilidad
+    if not Barbero.query.first():
+        db.session.add(Barbero(nombre="APT Barber"))
+        db.session.commit()
+        print("✓ Barbero inicial creado")
+    
+    # Índice de galería al día con el disco: imágenes anteriores al índice
+    # y variantes generadas en el build (flask galeria-variantes --sin-indice)
+    from app.services.service_locator import get_galeria_service
+    agregadas, actualizadas, _ = get_galeria_service().indexar_carpeta()
+    if agregadas or actualizadas:
+        print(f"✓ {agregadas} imagen(es) de la galería indexada(s), {actualizadas} actualizada(s)")
@@ -5,7 +5,7 @@ import os
 from flask import Flask
 from flask_login import LoginManager
 from app.core.config import get_config
-from app.domain.models import db, User
+from app.domain.models import db
 
 
 def create_app(config_name=None):
@@ -23,9 +23,23 @@ def create_app(config_name=None):
     config = get_config(config_name)
     app.config.from_object(config)
     
+    # IP real del cliente detrás del proxy (límites de login)
+    if app.config.get('PROXY_COUNT'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'],
+                                x_proto=app.config['PROXY_COUNT'])
+    
     # Inicializar extensiones
     db.init_app(app)
     
+    # PRAGMAs de SQLite (WAL, busy_timeout...) en cada conexión
+    from app.core.database import registrar_pragmas_sqlite
+    from app.core.instrumentacion import registrar_instrumentacion
+    with app.app_context():
+        registrar_pragmas_sqlite(db.engine)
+        # Tiempos de SQL/plantillas/galería por petición (Server-Timing)
+        registrar_instrumentacion(app, db.engine)
+    
     # Inicializar LoginManager
     login_manager = LoginManager(app)
     login_manager.login_view = 'admin.login'
@@ -33,62 +47,48 @@ def create_app(config_name=None):
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        from app.services.auth_service import AuthService
+        return AuthService.cargar_usuario(user_id)
     
     # Registrar blueprints
     from app.web.main.routes import main_bp
     from app.web.admin.routes import admin_bp
+    from app.web.api.routes import api_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(api_bp)
+    
+    # Caché HTTP de estáticos y CSS empaquetado
+    from app.web.static_cache import registrar_cache_estaticos
+    from app.web.assets import registrar_assets
+    from app.web.precomprimidos import registrar_precomprimidos
+    registrar_cache_estaticos(app)
+    registrar_assets(app)
+    registrar_precomprimidos(app)
+    
+    # Métricas Prometheus (/metrics)
+    from app.core.metricas import registrar_metricas
+    registrar_metricas(app)
+    
+    # Comandos CLI
+    from app.core.cli import registrar_comandos
+    registrar_comandos(app)
     
     # Contexto de aplicación para templates
     @app.context_processor
     def inject_gallery():
         from app.services.service_locator import get_galeria_service
-        galeria_service = get_galeria_service()
-        return {'gallery_images': galeria_service.obtener_galeria()}
+        pagina = get_galeria_service().obtener_pagina()
+        return {'gallery_images': pagina.imagenes, 'gallery_next': pagina.siguiente}
     
-    # Crear tablas
-    with app.app_context():
-        db.create_all()
-        _crear_datos_iniciales()
+    # Esquema y datos iniciales: en producción se ejecutan una sola vez
+    # con `flask db-init` y `flask seed` antes de arrancar los workers
+    if app.config.get('AUTO_INIT_DB'):
+        from app.core.database import inicializar_esquema, sembrar_datos
+        with app.app_context():
+            inicializar_esquema()
+            sembrar_datos()
     
     return app
 
-
-def _crear_datos_iniciales():
-    """Crea datos iniciales si no existen"""
-    from app.services.auth_service import AuthService
-    from app.domain.models import Servicio
-    
-    # Crear usuario admin si no existe
-    if not User.query.filter_by(username='admin').first():
-        try:
-            AuthService.crear_usuario('admin', 'barber123')
-            print("✓ Usuario admin creado")
-        except ValueError:
-            pass
-        
-        # Crear servicios de ejemplo
-        servicios_ejemplo = [
-            Servicio(nombre="Corte Clásico", precio="35.000", 
-                    descripcion="Corte tradicional con tijera y máquina", categoria="corte"),
-            Servicio(nombre="Skin Fade + Degrade", precio="45.000", 
-                    descripcion="Degradado perfecto a piel", categoria="corte"),
-            Servicio(nombre="Corte + Barba", precio="60.000", 
-                    descripcion="Pack más vendido", categoria="corte"),
-            Servicio(nombre="Barba Completa", precio="30.000", 
-                    descripcion="Afeitado + perfilado + hot towel", categoria="corte"),
-            Servicio(nombre="Peinados", precio="25.000", 
-                    descripcion="Estilizado con secador y producto", categoria="extra"),
-            Servicio(nombre="Tinte", precio="80.000", 
-                    descripcion="Coloración completa + lavado", categoria="extra"),
-            Servicio(nombre="Afeitado Clásico", precio="35.000", 
-                    descripcion="Con toalla caliente y navaja", categoria="extra"),
-            Servicio(nombre="Perfilado de Cejas", precio="15.000", 
-                    descripcion="Definición perfecta", categoria="extra"),
-        ]
-        db.session.bulk_save_objects(servicios_ejemplo)
-        db.session.commit()
-        print("✓ Servicios de ejemplo creados")
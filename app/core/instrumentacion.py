@@ -0,0 +1,132 @@
+"""
+Instrumentación por petición: tiempos de SQL, plantillas y galería
+Se emiten en la cabecera Server-Timing y en el log de peticiones lentas.
+"""
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from app.core.metricas import observar_peticion
+
+
+# Métricas de Server-Timing: clave interna -> (nombre, descripción)
+METRICAS = {
+    'db': ('db', 'SQL'),
+    'tpl': ('tpl', 'Plantillas'),
+    'galeria': ('galeria', 'Índice de galería'),
+    'miniatura': ('img', 'Redimensionado'),
+}
+
+
+def _tiempos():
+    """Acumuladores {métrica: [cantidad, ms]} de la petición actual"""
+    tiempos = g.get('_tiempos')
+    if tiempos is None:
+        tiempos = g._tiempos = {}
+    return tiempos
+
+
+def registrar(nombre, ms):
+    """Suma una medición a la petición actual (fuera de una petición no hace nada)"""
+    if not has_request_context():
+        return
+    acumulado = _tiempos().setdefault(nombre, [0, 0.0])
+    acumulado[0] += 1
+    acumulado[1] += ms
+
+
+@contextmanager
+def medir(nombre):
+    """Mide el bloque y lo suma a la métrica `nombre` de la petición"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(nombre, (time.perf_counter() - inicio) * 1000)
+
+
+def resumen():
+    """Mediciones de la petición actual: {métrica: (cantidad, ms)}"""
+    return {nombre: tuple(valores) for nombre, valores in g.get('_tiempos', {}).items()}
+
+
+def _server_timing(total_ms, mediciones):
+    partes = []
+    for clave, (cantidad, ms) in mediciones.items():
+        nombre, descripcion = METRICAS.get(clave, (clave, clave))
+        partes.append(f'{nombre};dur={ms:.1f};desc="{descripcion} ({cantidad})"')
+    partes.append(f'total;dur={total_ms:.1f}')
+    return ', '.join(partes)
+
+
+def registrar_instrumentacion(app, engine):
+    """Engancha los eventos de SQLAlchemy y Jinja y los hooks de petición"""
+    
+    # El inicio se guarda en el contexto de ejecución de cada sentencia: si falla
+    # (IntegrityError...) no hay after_cursor_execute y no queda nada pendiente
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes_consulta(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._inicio_consulta = time.perf_counter()
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _despues_consulta(conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, '_inicio_consulta', None)
+        if inicio is not None:
+            registrar('db', (time.perf_counter() - inicio) * 1000)
+    
+    def _antes_plantilla(sender, template, context, **extra):
+        g.setdefault('_inicio_plantilla', []).append(time.perf_counter())
+    
+    def _plantilla_renderizada(sender, template, context, **extra):
+        pila = g.get('_inicio_plantilla')
+        if pila:
+            registrar('tpl', (time.perf_counter() - pila.pop()) * 1000)
+    
+    before_render_template.connect(_antes_plantilla, app, weak=False)
+    template_rendered.connect(_plantilla_renderizada, app, weak=False)
+    
+    @app.before_request
+    def _inicio_peticion():
+        g._inicio_peticion = time.perf_counter()
+    
+    @app.after_request
+    def _fin_peticion(response):
+        inicio = g.get('_inicio_peticion')
+        if inicio is None:
+            return response
+        
+        total_ms = (time.perf_counter() - inicio) * 1000
+        mediciones = resumen()
+        g._status = response.status_code
+        
+        if app.config.get('SERVER_TIMING'):
+            response.headers['Server-Timing'] = _server_timing(total_ms, mediciones)
+        
+        umbral = app.config.get('SLOW_REQUEST_MS')
+        if umbral and total_ms >= umbral:
+            detalle = ', '.join(
+                f"{clave} {ms:.1f} ms/{cantidad}" for clave, (cantidad, ms) in mediciones.items()
+            )
+            app.logger.warning(
+                "Petición lenta: %s %s -> %s en %.1f ms (%s)",
+                request.method, request.full_path.rstrip('?'), response.status_code,
+                total_ms, detalle or 'sin desglose'
+            )
+        
+        return response
+    
+    @app.teardown_request
+    def _observar_peticion(exception):
+        """
+        Métricas de la petición. En teardown y no en after_request: también se
+        ejecuta cuando una excepción no controlada termina en 500.
+        """
+        inicio = g.get('_inicio_peticion')
+        if inicio is None:
+            return
+        
+        status = 500 if exception is not None else g.get('_status', 500)
+        consultas, sql_ms = resumen().get('db', (0, 0.0))
+        observar_peticion(request.endpoint, request.method, status,
+                          time.perf_counter() - inicio, consultas, sql_ms / 1000)
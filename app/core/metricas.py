@@ -0,0 +1,122 @@
+"""
+Métricas en formato Prometheus (/metrics)
+Con gunicorn se usa el modo multiproceso de prometheus_client: cada worker
+escribe en PROMETHEUS_MULTIPROC_DIR y /metrics agrega todos los procesos.
+"""
+import hmac
+import os
+from contextlib import contextmanager
+from flask import Response, abort, current_app, request
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, multiprocess
+except ImportError:  # Opcional: sin prometheus_client las métricas no hacen nada
+    prometheus_client = None
+
+
+if prometheus_client is not None:
+    PETICIONES = Counter(
+        'aptbarber_http_requests_total', 'Peticiones HTTP atendidas',
+        ['endpoint', 'method', 'status']
+    )
+    LATENCIA = Histogram(
+        'aptbarber_http_request_duration_seconds', 'Duración de las peticiones HTTP',
+        ['endpoint'],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    )
+    CONSULTAS = Counter(
+        'aptbarber_db_queries_total', 'Consultas SQL ejecutadas por peticiones',
+        ['endpoint']
+    )
+    TIEMPO_CONSULTAS = Counter(
+        'aptbarber_db_query_seconds_total', 'Tiempo total en consultas SQL',
+        ['endpoint']
+    )
+    PROCESAMIENTO = Histogram(
+        'aptbarber_imagen_procesamiento_seconds', 'Duración de optimizar_imagen',
+        buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+    )
+    BYTES_AHORRADOS = Counter(
+        'aptbarber_imagen_bytes_ahorrados_total', 'Bytes ahorrados al optimizar imágenes'
+    )
+    IMAGENES = Counter(
+        'aptbarber_imagenes_procesadas_total', 'Imágenes procesadas', ['resultado']
+    )
+    CACHE = Counter(
+        'aptbarber_cache_total', 'Consultas a las cachés en memoria (hit/miss)',
+        ['cache', 'resultado']
+    )
+
+
+# True mientras se precalienta la app: esas peticiones no son tráfico real
+_pausadas = False
+
+
+@contextmanager
+def metricas_pausadas():
+    """No registra métricas dentro del bloque (precalentamiento en el maestro)"""
+    global _pausadas
+    _pausadas = True
+    try:
+        yield
+    finally:
+        _pausadas = False
+
+
+def observar_peticion(endpoint, method, status, segundos, consultas=0, segundos_sql=0.0):
+    if prometheus_client is None or _pausadas:
+        return
+    endpoint = endpoint or 'sin_ruta'
+    PETICIONES.labels(endpoint, method, str(status)).inc()
+    LATENCIA.labels(endpoint).observe(segundos)
+    if consultas:
+        CONSULTAS.labels(endpoint).inc(consultas)
+        TIEMPO_CONSULTAS.labels(endpoint).inc(segundos_sql)
+
+
+def observar_optimizacion(resultado=None):
+    """Registra una optimización (None = fallida)"""
+    if prometheus_client is None or _pausadas:
+        return
+    if resultado is None:
+        IMAGENES.labels('error').inc()
+        return
+    IMAGENES.labels('ok').inc()
+    PROCESAMIENTO.observe(resultado.segundos)
+    BYTES_AHORRADOS.inc(max(0, resultado.bytes_origen - resultado.bytes_destino))
+
+
+def contar_cache(cache, acierto):
+    if prometheus_client is None or _pausadas:
+        return
+    CACHE.labels(cache, 'hit' if acierto else 'miss').inc()
+
+
+def _generar():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return prometheus_client.generate_latest(registry)
+    return prometheus_client.generate_latest()
+
+
+def registrar_metricas(app):
+    """
+    Expone /metrics (protegido por METRICS_TOKEN si está definido).
+    Con METRICS_REQUIRE_TOKEN y sin token la ruta no se registra.
+    """
+    if prometheus_client is None:
+        return
+    if app.config.get('METRICS_REQUIRE_TOKEN') and not app.config.get('METRICS_TOKEN'):
+        app.logger.warning("METRICS_TOKEN no definido: /metrics desactivado")
+        return
+    
+    def metricas():
+        token = current_app.config.get('METRICS_TOKEN')
+        if token and not hmac.compare_digest(
+                request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401)
+        return Response(_generar(), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+    
+    app.add_url_rule('/metrics', 'metricas', metricas)
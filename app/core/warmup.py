@@ -0,0 +1,45 @@
+"""
+Precalentamiento de la aplicación antes del fork de los workers
+"""
+from app.core.metricas import metricas_pausadas
+from app.domain.models import db
+
+
+# Páginas públicas que se renderizan (y quedan en la caché de páginas) al arrancar
+PAGINAS_PUBLICAS = ('/', '/servicios')
+
+
+def precalentar(app):
+    """
+    Compila las plantillas y llena las cachés del catálogo, la galería y las páginas.
+    Pensado para el proceso maestro de gunicorn con preload_app: los workers
+    heredan esta memoria copy-on-write. Cierra las conexiones al terminar.
+    Las peticiones internas no cuentan en /metrics (no son tráfico real).
+    Retorna la cantidad de plantillas compiladas.
+    """
+    from app.services.service_locator import get_servicio_service, get_galeria_service
+    
+    plantillas = 0
+    for nombre in app.jinja_env.list_templates(extensions=('html',)):
+        app.jinja_env.get_template(nombre)
+        plantillas += 1
+    
+    with app.app_context(), metricas_pausadas():
+        try:
+            get_servicio_service().listar_agrupados()
+            galeria_service = get_galeria_service()
+            galeria_service.obtener_galeria()
+            galeria_service.version_galeria()
+            
+            client = app.test_client()
+            for url in PAGINAS_PUBLICAS:
+                client.get(url)
+        except Exception as e:
+            # Sin esquema (db-init pendiente) la app arranca igual, solo que en frío
+            print(f"Error al precalentar: {e}")
+        finally:
+            db.session.remove()
+            # Ninguna conexión abierta debe cruzar el fork
+            db.engine.dispose()
+    
+    return plantillas
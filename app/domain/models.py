@@ -1,11 +1,22 @@
 """
 Domain Models - Entidades de negocio principales
 """
+from datetime import datetime, time, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
 
 db = SQLAlchemy()
 
+# Mayor id que admiten los enteros de SQLite y PostgreSQL (64 bits con signo):
+# los cursores que lo superan se rechazan antes de llegar a la consulta
+ID_MAXIMO = 2 ** 63 - 1
+
+
+def _ahora_utc():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class User(UserMixin, db.Model):
     """
@@ -28,27 +39,298 @@ class Servicio(db.Model):
     Categorías: corte | extra
     """
     __tablename__ = 'servicio'
+    __table_args__ = (
+        # Listado público: WHERE is_active ORDER BY categoria
+        db.Index('ix_servicio_activo_categoria', 'is_active', 'categoria'),
+        # Filtros por rango y orden por precio
+        db.Index('ix_servicio_activo_precio', 'is_active', 'precio_centavos'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False, index=True)
     precio = db.Column(db.String(20), nullable=False)
+    # Precio normalizado en centavos (se calcula al asignar `precio`)
+    precio_centavos = db.Column(db.Integer, nullable=True)
     descripcion = db.Column(db.Text, nullable=True)
     categoria = db.Column(db.String(20), default="corte", nullable=False)
+    # Duración de la cita; define cuántos slots de agenda ocupa
+    duracion_minutos = db.Column(db.Integer, default=30, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=db.func.now())
     updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
     
     CATEGORIA_TIPOS = ['corte', 'extra']
+    CATEGORIA_TITULOS = {'corte': 'Tipos de Cortes', 'extra': 'Servicios Extras'}
+    DURACION_POR_DEFECTO = 30
     
     def __repr__(self):
         return f'<Servicio {self.nombre} - {self.categoria}>'
     
+    @validates('precio')
+    def _validar_precio(self, key, precio):
+        """Mantiene precio_centavos sincronizado con el texto del precio"""
+        self.precio_centavos = self.precio_a_centavos(precio)
+        return precio
+    
+    @staticmethod
+    def precio_a_centavos(precio):
+        """
+        Convierte un precio escrito a centavos
+        '35.000' -> 3500000 | '35,50' -> 3550 | '1.234,5' -> 123450
+        Un separador repetido, o seguido de exactamente 3 dígitos, es de miles.
+        """
+        texto = str(precio or '').strip().replace('$', '').replace(' ', '')
+        if not texto:
+            raise ValueError("Precio requerido")
+        
+        puntos, comas = texto.count('.'), texto.count(',')
+        if puntos and comas:
+            # Ambos separadores: el último es el decimal
+            decimal = '.' if texto.rfind('.') > texto.rfind(',') else ','
+        elif puntos or comas:
+            sep = '.' if puntos else ','
+            repetido = texto.count(sep) > 1
+            decimal = None if repetido or len(texto.rsplit(sep, 1)[1]) == 3 else sep
+        else:
+            decimal = None
+        
+        if decimal:
+            entero, _, decimales = texto.rpartition(decimal)
+        else:
+            entero, decimales = texto, ''
+        texto = entero.replace('.', '').replace(',', '') + '.' + decimales
+        
+        try:
+            valor = Decimal(texto.rstrip('.'))
+        except InvalidOperation:
+            raise ValueError(f"Precio inválido: {precio}")
+        
+        # is_finite primero: comparar NaN con 0 lanza InvalidOperation
+        if not valor.is_finite() or valor < 0:
+            raise ValueError(f"Precio inválido: {precio}")
+        
+        return int((valor * 100).to_integral_value(ROUND_HALF_UP))
+    
     def to_dict(self):
         """Convierte el modelo a diccionario"""
         return {
             'id': self.id,
             'nombre': self.nombre,
             'precio': self.precio,
+            'precio_centavos': self.precio_centavos,
             'descripcion': self.descripcion,
-            'categoria': self.categoria
+            'categoria': self.categoria,
+            'duracion_minutos': self.duracion_minutos or self.DURACION_POR_DEFECTO
+        }
+
+
+class ContadorVersion(db.Model):
+    """
+    Contador de versión por conjunto de datos (p. ej. 'catalogo')
+    Se incrementa en la misma transacción que la escritura, así las
+    cachés en memoria de cada worker saben cuándo están obsoletas
+    """
+    __tablename__ = 'contador_version'
+    
+    nombre = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    # Momento del último incremento (UTC): Last-Modified que sí cambia con los borrados
+    actualizado_at = db.Column(db.DateTime, default=_ahora_utc, nullable=True)
+    
+    def __repr__(self):
+        return f'<ContadorVersion {self.nombre}={self.version}>'
+
+
+class TrabajoGaleria(db.Model):
+    """
+    Trabajo de procesamiento de imágenes subidas a la galería
+    Se guarda en BD para que cualquier worker pueda consultar su estado
+    """
+    __tablename__ = 'trabajo_galeria'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    total = db.Column(db.Integer, nullable=False)
+    procesadas = db.Column(db.Integer, default=0, nullable=False)
+    fallidas = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+    
+    def __repr__(self):
+        return f'<TrabajoGaleria {self.id} {self.procesadas + self.fallidas}/{self.total}>'
+    
+    @property
+    def terminado(self):
+        return (self.procesadas or 0) + (self.fallidas or 0) >= self.total
+    
+    def to_dict(self):
+        """Convierte el modelo a diccionario"""
+        return {
+            'id': self.id,
+            'total': self.total,
+            'procesadas': self.procesadas,
+            'fallidas': self.fallidas,
+            'estado': 'completado' if self.terminado else 'procesando'
+        }
+
+
+class GaleriaImagen(db.Model):
+    """
+    Índice de la galería: una fila por imagen optimizada en static/images/gallery
+    Permite listar por páginas y contar sin recorrer la carpeta
+    """
+    __tablename__ = 'galeria_imagen'
+    __table_args__ = (
+        # Listado por cursor: ORDER BY created_at DESC, id DESC
+        db.Index('ix_galeria_imagen_fecha', 'created_at', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(64), unique=True, nullable=False)
+    # SHA-256 del archivo subido (nombre por contenido = hash[:16])
+    hash = db.Column(db.String(64), nullable=False, index=True)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    tamano_bytes = db.Column(db.Integer, nullable=False)
+    # Anchos de las variantes responsive generadas: '320,640,960'
+    variantes = db.Column(db.String(64), default='', nullable=False)
+    # Con microsegundos desde Python: func.now() de SQLite solo guarda segundos
+    # y el cursor compara fechas exactas
+    created_at = db.Column(db.DateTime, default=_ahora_utc, nullable=False)
+    
+    def __repr__(self):
+        return f'<GaleriaImagen {self.filename}>'
+    
+    @property
+    def anchos_variantes(self):
+        return [int(width) for width in self.variantes.split(',') if width]
+
+
+class Barbero(db.Model):
+    """
+    Modelo de Barbero - Cada uno tiene su propia agenda
+    """
+    __tablename__ = 'barbero'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(80), nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    
+    def __repr__(self):
+        return f'<Barbero {self.nombre}>'
+    
+    def to_dict(self):
+        """Convierte el modelo a diccionario"""
+        return {
+            'id': self.id,
+            'nombre': self.nombre
+        }
+
+
+class Appointment(db.Model):
+    """
+    Cita reservada: un barbero, un servicio y un bloque de slots de un día
+    """
+    __tablename__ = 'appointment'
+    __table_args__ = (
+        db.Index('ix_appointment_barbero_fecha', 'barbero_id', 'fecha'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    barbero_id = db.Column(db.Integer, db.ForeignKey('barbero.id'), nullable=False)
+    servicio_id = db.Column(db.Integer, db.ForeignKey('servicio.id'), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    # Primer slot (índice desde AgendaDia.APERTURA) y cantidad de slots
+    slot_inicio = db.Column(db.Integer, nullable=False)
+    slots = db.Column(db.Integer, nullable=False)
+    cliente_nombre = db.Column(db.String(100), nullable=False)
+    cliente_telefono = db.Column(db.String(30), nullable=True)
+    estado = db.Column(db.String(20), default='confirmada', nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    
+    ESTADOS = ['confirmada', 'cancelada']
+    
+    barbero = db.relationship('Barbero', lazy='joined')
+    servicio = db.relationship('Servicio', lazy='joined')
+    
+    def __repr__(self):
+        return f'<Appointment {self.fecha} slot {self.slot_inicio} barbero {self.barbero_id}>'
+    
+    @property
+    def inicio(self):
+        return AgendaDia.hora_de_slot(self.fecha, self.slot_inicio)
+    
+    def to_dict(self):
+        """Convierte el modelo a diccionario"""
+        return {
+            'id': self.id,
+            'barbero_id': self.barbero_id,
+            'servicio_id': self.servicio_id,
+            'inicio': self.inicio.isoformat(timespec='minutes'),
+            'duracion_minutos': self.slots * AgendaDia.SLOT_MINUTOS,
+            'cliente_nombre': self.cliente_nombre,
+            'estado': self.estado
         }
+
+
+class AgendaDia(db.Model):
+    """
+    Agenda de un barbero en un día como bitmap de slots de 15 minutos
+    El bit i está a 1 si el slot i (desde APERTURA) está ocupado.
+    Se reserva con compare-and-swap sobre el propio bitmap (ver AgendaRepository.ocupar).
+    Sin fila = día completamente libre.
+    """
+    __tablename__ = 'agenda_dia'
+    
+    barbero_id = db.Column(db.Integer, db.ForeignKey('barbero.id'), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+    ocupados = db.Column(db.BigInteger, default=0, nullable=False)
+    
+    SLOT_MINUTOS = 15
+    APERTURA = time(9, 0)
+    # Todos los bits del bitmap (BigInteger con signo: 63 slots útiles)
+    MASCARA_COMPLETA = (1 << 63) - 1
+    # Horario por día de la semana (0 = lunes): (apertura, cierre) o None si cierra
+    HORARIO = {
+        0: (time(9, 0), time(19, 0)),
+        1: (time(9, 0), time(19, 0)),
+        2: (time(9, 0), time(19, 0)),
+        3: (time(9, 0), time(19, 0)),
+        4: (time(9, 0), time(19, 0)),
+        5: (time(9, 0), time(17, 0)),
+        6: None,
+    }
+    
+    def __repr__(self):
+        return f'<AgendaDia barbero {self.barbero_id} {self.fecha} {self.ocupados:b}>'
+    
+    @classmethod
+    def slot_de_hora(cls, hora):
+        """Índice del slot que empieza a la hora dada"""
+        minutos = (hora.hour - cls.APERTURA.hour) * 60 + hora.minute - cls.APERTURA.minute
+        return minutos // cls.SLOT_MINUTOS
+    
+    @classmethod
+    def hora_de_slot(cls, fecha, slot):
+        """datetime de inicio del slot `slot` en `fecha`"""
+        minutos = cls.APERTURA.hour * 60 + cls.APERTURA.minute + slot * cls.SLOT_MINUTOS
+        return datetime.combine(fecha, time(minutos // 60, minutos % 60))
+    
+    @classmethod
+    def mascara_horario(cls, fecha):
+        """Bitmap con los slots dentro del horario de apertura de ese día"""
+        horario = cls.HORARIO.get(fecha.weekday())
+        if not horario:
+            return 0
+        inicio, fin = cls.slot_de_hora(horario[0]), cls.slot_de_hora(horario[1])
+        return cls.mascara(inicio, fin - inicio)
+    
+    @staticmethod
+    def mascara(slot_inicio, slots):
+        """Bitmap de `slots` slots consecutivos desde `slot_inicio`"""
+        return ((1 << slots) - 1) << slot_inicio
+    
+    @classmethod
+    def slots_para(cls, minutos):
+        """Slots necesarios para una duración (redondeando hacia arriba)"""
+        return max(1, -(-minutos // cls.SLOT_MINUTOS))
@@ -1,18 +1,72 @@
 """
 Repositorio de Servicios - Capa de acceso a datos
 """
-from app.domain.models import Servicio, db
+from datetime import datetime, timezone
+from sqlalchemy.exc import IntegrityError
+from app.domain.models import (
+    Servicio, TrabajoGaleria, GaleriaImagen, ContadorVersion, Barbero, AgendaDia, Appointment, db
+)
+
+
+class VersionRepository:
+    """
+    Repositorio de contadores de versión
+    """
+    
+    @staticmethod
+    def get(nombre):
+        """Versión actual de un conjunto de datos (0 si nunca cambió)"""
+        version = db.session.query(ContadorVersion.version).filter_by(nombre=nombre).scalar()
+        return version or 0
+    
+    @staticmethod
+    def get_estado(nombre):
+        """(versión, fecha UTC del último cambio o None) en una sola consulta"""
+        fila = (db.session.query(ContadorVersion.version, ContadorVersion.actualizado_at)
+                .filter_by(nombre=nombre).first())
+        return (fila.version, fila.actualizado_at) if fila else (0, None)
+    
+    @staticmethod
+    def incrementar(nombre):
+        """
+        Incrementa la versión dentro de la transacción actual (sin commit)
+        """
+        actualizadas = ContadorVersion.query.filter_by(nombre=nombre).update(
+            {ContadorVersion.version: ContadorVersion.version + 1,
+             ContadorVersion.actualizado_at: datetime.now(timezone.utc).replace(tzinfo=None)},
+            synchronize_session=False
+        )
+        if actualizadas:
+            return
+        
+        # Primera escritura: crear el contador (otro worker pudo adelantarse)
+        try:
+            with db.session.begin_nested():
+                db.session.add(ContadorVersion(nombre=nombre, version=1))
+        except IntegrityError:
+            VersionRepository.incrementar(nombre)
 
 
 class ServicioRepository:
     """
     Repositorio para operaciones CRUD de Servicios
+    Toda escritura incrementa la versión del catálogo
     """
     
+    VERSION = 'catalogo'
+    
+    @staticmethod
+    def get_version():
+        """Versión actual del catálogo"""
+        return VersionRepository.get(ServicioRepository.VERSION)
+    
     @staticmethod
     def get_all():
-        """Obtiene todos los servicios activos"""
-        return Servicio.query.filter_by(is_active=True).all()
+        """Obtiene todos los servicios activos, ordenados por categoría"""
+        return (Servicio.query
+                .filter_by(is_active=True)
+                .order_by(Servicio.categoria, Servicio.id)
+                .all())
     
     @staticmethod
     def get_by_id(servicio_id):
@@ -22,7 +76,58 @@ class ServicioRepository:
     @staticmethod
     def get_by_categoria(categoria):
         """Obtiene servicios por categoría"""
-        return Servicio.query.filter_by(categoria=categoria, is_active=True).all()
+        return (Servicio.query
+                .filter_by(is_active=True, categoria=categoria)
+                .order_by(Servicio.id)
+                .all())
+    
+    @staticmethod
+    def get_pagina(after_id=None, limite=50, categoria=None):
+        """
+        Página de servicios activos por cursor (keyset sobre id)
+        Pide limite + 1 filas para saber si hay página siguiente
+        """
+        query = Servicio.query.filter(Servicio.is_active.is_(True))
+        if categoria:
+            query = query.filter(Servicio.categoria == categoria)
+        if after_id is not None:
+            query = query.filter(Servicio.id > after_id)
+        return query.order_by(Servicio.id).limit(limite + 1).all()
+    
+    @staticmethod
+    def get_estado():
+        """(versión, fecha UTC del último cambio) del catálogo"""
+        return VersionRepository.get_estado(ServicioRepository.VERSION)
+    
+    @staticmethod
+    def get_by_rango_precio(minimo=None, maximo=None):
+        """Servicios activos con precio (en centavos) dentro del rango, del más barato al más caro"""
+        query = Servicio.query.filter(Servicio.is_active.is_(True),
+                                      Servicio.precio_centavos.isnot(None))
+        if minimo is not None:
+            query = query.filter(Servicio.precio_centavos >= minimo)
+        if maximo is not None:
+            query = query.filter(Servicio.precio_centavos <= maximo)
+        return query.order_by(Servicio.precio_centavos, Servicio.id).all()
+    
+    @staticmethod
+    def get_ordenados_por_precio(descendente=False):
+        """Servicios activos ordenados por precio"""
+        orden = Servicio.precio_centavos.desc() if descendente else Servicio.precio_centavos
+        return (Servicio.query
+                .filter(Servicio.is_active.is_(True), Servicio.precio_centavos.isnot(None))
+                .order_by(orden, Servicio.id)
+                .all())
+    
+    @staticmethod
+    def sumar_precios(servicio_ids):
+        """Total en centavos de un combo de servicios (calculado en SQL)"""
+        if not servicio_ids:
+            return 0
+        total = (db.session.query(db.func.sum(Servicio.precio_centavos))
+                 .filter(Servicio.id.in_(servicio_ids))
+                 .scalar())
+        return total or 0
     
     @staticmethod
     def create(nombre, precio, descripcion='', categoria='corte'):
@@ -34,6 +139,7 @@ class ServicioRepository:
             categoria=categoria
         )
         db.session.add(servicio)
+        VersionRepository.incrementar(ServicioRepository.VERSION)
         db.session.commit()
         return servicio
     
@@ -48,6 +154,7 @@ class ServicioRepository:
             if hasattr(servicio, key) and key != 'id':
                 setattr(servicio, key, value)
         
+        VersionRepository.incrementar(ServicioRepository.VERSION)
         db.session.commit()
         return servicio
     
@@ -57,6 +164,7 @@ class ServicioRepository:
         servicio = Servicio.query.get(servicio_id)
         if servicio:
             servicio.is_active = False
+            VersionRepository.incrementar(ServicioRepository.VERSION)
             db.session.commit()
         return servicio
     
@@ -66,5 +174,258 @@ class ServicioRepository:
         servicio = Servicio.query.get(servicio_id)
         if servicio:
             db.session.delete(servicio)
+            VersionRepository.incrementar(ServicioRepository.VERSION)
             db.session.commit()
         return servicio
+    
+    @staticmethod
+    def get_ids_por_nombre():
+        """{nombre en minúsculas: id} de todos los servicios (activos o no)"""
+        ids = {}
+        for nombre, servicio_id in db.session.query(Servicio.nombre, Servicio.id).order_by(Servicio.id):
+            ids.setdefault(nombre.strip().lower(), servicio_id)
+        return ids
+    
+    @staticmethod
+    def importar(nuevos, actualizados):
+        """
+        Inserta y actualiza servicios en bloque, en una sola transacción
+        y con un solo incremento de versión.
+        Las operaciones masivas no pasan por @validates: los mappings
+        deben traer precio_centavos ya calculado.
+        """
+        try:
+            if nuevos:
+                db.session.bulk_insert_mappings(Servicio, nuevos)
+            if actualizados:
+                db.session.bulk_update_mappings(Servicio, actualizados)
+            VersionRepository.incrementar(ServicioRepository.VERSION)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @staticmethod
+    def iter_columnas(columnas, lote=1000):
+        """Recorre todos los servicios por id como tuplas de `columnas`, de a `lote` filas"""
+        campos = [getattr(Servicio, columna) for columna in columnas]
+        return db.session.query(*campos).order_by(Servicio.id).yield_per(lote)
+
+
+class TrabajoGaleriaRepository:
+    """
+    Repositorio para el seguimiento de trabajos de la galería
+    """
+    
+    @staticmethod
+    def create(trabajo_id, total):
+        """Registra un nuevo trabajo"""
+        trabajo = TrabajoGaleria(id=trabajo_id, total=total)
+        db.session.add(trabajo)
+        db.session.commit()
+        return trabajo
+    
+    @staticmethod
+    def get_by_id(trabajo_id):
+        """Obtiene un trabajo por ID"""
+        return TrabajoGaleria.query.get(trabajo_id)
+    
+    @staticmethod
+    def registrar_resultado(trabajo_id, exito):
+        """Incrementa el contador de procesadas o fallidas de forma atómica"""
+        columna = TrabajoGaleria.procesadas if exito else TrabajoGaleria.fallidas
+        TrabajoGaleria.query.filter_by(id=trabajo_id).update(
+            {columna: columna + 1}, synchronize_session=False
+        )
+        db.session.commit()
+
+
+class GaleriaImagenRepository:
+    """
+    Repositorio del índice de la galería
+    Toda escritura incrementa la versión de la galería
+    """
+    
+    VERSION = 'galeria'
+    
+    @staticmethod
+    def get_version():
+        """Versión actual de la galería"""
+        return VersionRepository.get(GaleriaImagenRepository.VERSION)
+    
+    @staticmethod
+    def contar():
+        """Número de imágenes indexadas"""
+        return db.session.query(db.func.count(GaleriaImagen.id)).scalar()
+    
+    @staticmethod
+    def get_pagina(antes=None, limite=12):
+        """
+        Página de imágenes, de la más nueva a la más vieja
+        Cursor (keyset) sobre (created_at, id): `antes` es el de la última fila vista
+        Pide limite + 1 filas para saber si hay página siguiente
+        """
+        query = GaleriaImagen.query
+        if antes is not None:
+            fecha, imagen_id = antes
+            query = query.filter(db.or_(
+                GaleriaImagen.created_at < fecha,
+                db.and_(GaleriaImagen.created_at == fecha, GaleriaImagen.id < imagen_id)
+            ))
+        return (query
+                .order_by(GaleriaImagen.created_at.desc(), GaleriaImagen.id.desc())
+                .limit(limite + 1)
+                .all())
+    
+    @staticmethod
+    def get_todas():
+        """Todas las filas del índice (para sincronizar con la carpeta)"""
+        return GaleriaImagen.query.all()
+    
+    @staticmethod
+    def create(**datos):
+        """
+        Indexa una imagen
+        Retorna None si ya estaba indexada (otro worker se adelantó)
+        """
+        imagen = GaleriaImagen(**datos)
+        db.session.add(imagen)
+        try:
+            # El autoflush del incremento ya inserta la fila: también puede fallar
+            VersionRepository.incrementar(GaleriaImagenRepository.VERSION)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+        return imagen
+    
+    @staticmethod
+    def delete(filename):
+        """Quita una imagen del índice"""
+        imagen = GaleriaImagen.query.filter_by(filename=filename).first()
+        if imagen:
+            db.session.delete(imagen)
+            VersionRepository.incrementar(GaleriaImagenRepository.VERSION)
+            db.session.commit()
+        return imagen
+    
+    @staticmethod
+    def sincronizar(nuevas, actualizadas, eliminadas):
+        """
+        Aplica en bloque los cambios de una sincronización con la carpeta,
+        en una sola transacción y con un solo incremento de versión.
+        eliminadas: ids de las filas sin archivo
+        """
+        try:
+            if nuevas:
+                db.session.bulk_insert_mappings(GaleriaImagen, nuevas)
+            if actualizadas:
+                db.session.bulk_update_mappings(GaleriaImagen, actualizadas)
+            if eliminadas:
+                GaleriaImagen.query.filter(GaleriaImagen.id.in_(eliminadas)).delete(
+                    synchronize_session=False
+                )
+            VersionRepository.incrementar(GaleriaImagenRepository.VERSION)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class BarberoRepository:
+    """
+    Repositorio de Barberos
+    """
+    
+    @staticmethod
+    def get_activos():
+        """Barberos activos ordenados por id"""
+        return Barbero.query.filter_by(is_active=True).order_by(Barbero.id).all()
+    
+    @staticmethod
+    def get_by_id(barbero_id):
+        """Obtiene un barbero por ID"""
+        return db.session.get(Barbero, barbero_id)
+
+
+class AgendaRepository:
+    """
+    Repositorio de agendas diarias (bitmaps de slots)
+    """
+    
+    @staticmethod
+    def get_bitmaps(barbero_ids, desde, hasta):
+        """
+        Bitmaps de ocupación en [desde, hasta] en una sola consulta
+        Retorna {(barbero_id, fecha): ocupados}; los días sin fila están libres
+        """
+        if not barbero_ids:
+            return {}
+        filas = (db.session.query(AgendaDia.barbero_id, AgendaDia.fecha, AgendaDia.ocupados)
+                 .filter(AgendaDia.barbero_id.in_(barbero_ids),
+                         AgendaDia.fecha >= desde,
+                         AgendaDia.fecha <= hasta)
+                 .all())
+        return {(barbero_id, fecha): ocupados for barbero_id, fecha, ocupados in filas}
+    
+    @staticmethod
+    def ocupar(barbero_id, fecha, mascara):
+        """
+        Marca los slots de `mascara` como ocupados si siguen libres (sin commit).
+        Un único UPDATE condicional: si otro cliente tomó alguno de los slots
+        no actualiza nada y retorna False, sin esperar ni reintentar.
+        """
+        filtro = (AgendaDia.barbero_id == barbero_id, AgendaDia.fecha == fecha)
+        actualizadas = (AgendaDia.query
+                        .filter(*filtro, AgendaDia.ocupados.op('&')(mascara) == 0)
+                        .update({
+                            AgendaDia.ocupados: AgendaDia.ocupados.op('|')(mascara),
+                        }, synchronize_session=False))
+        if actualizadas:
+            return True
+        
+        if db.session.query(AgendaDia.ocupados).filter(*filtro).scalar() is not None:
+            return False
+        
+        # Primera reserva del día: crear la fila (otra petición pudo adelantarse)
+        try:
+            with db.session.begin_nested():
+                db.session.add(AgendaDia(barbero_id=barbero_id, fecha=fecha, ocupados=mascara))
+            return True
+        except IntegrityError:
+            return AgendaRepository.ocupar(barbero_id, fecha, mascara)
+    
+    @staticmethod
+    def liberar(barbero_id, fecha, mascara):
+        """Marca los slots de `mascara` como libres (sin commit)"""
+        AgendaDia.query.filter_by(barbero_id=barbero_id, fecha=fecha).update({
+            AgendaDia.ocupados: AgendaDia.ocupados.op('&')(AgendaDia.MASCARA_COMPLETA ^ mascara),
+        }, synchronize_session=False)
+    
+    @staticmethod
+    def registrar_cita(**datos):
+        """Crea la cita y confirma la transacción junto con la ocupación"""
+        try:
+            cita = Appointment(**datos)
+            db.session.add(cita)
+            db.session.commit()
+            return cita
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @staticmethod
+    def cancelar_cita(cita):
+        """Marca la cita como cancelada y confirma la transacción"""
+        cita.estado = 'cancelada'
+        db.session.commit()
+    
+    @staticmethod
+    def get_cita(cita_id):
+        """Obtiene una cita por ID"""
+        return db.session.get(Appointment, cita_id)
+    
+    @staticmethod
+    def deshacer():
+        """Descarta la ocupación pendiente"""
+        db.session.rollback()
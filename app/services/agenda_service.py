@@ -0,0 +1,271 @@
+"""
+Servicio de Agenda - Disponibilidad de citas sobre bitmaps de slots
+"""
+import itertools
+import math
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import current_app
+from app.domain.models import AgendaDia, Appointment, Servicio
+from app.domain.repositories import AgendaRepository, BarberoRepository, ServicioRepository
+
+
+SlotLibre = namedtuple('SlotLibre', 'inicio fecha slot barbero')
+
+
+class SlotNoDisponible(ValueError):
+    """El hueco pedido ya fue tomado; incluye huecos alternativos"""
+    
+    def __init__(self, alternativas):
+        super().__init__("El horario elegido ya no está disponible")
+        self.alternativas = alternativas
+
+
+class DisponibilidadService:
+    """
+    Responde "próximos N huecos libres para el servicio X" con operaciones de bits:
+    una consulta trae los bitmaps de la semana y cada día se resuelve con
+    desplazamientos y AND, sin recorrer citas en Python.
+    """
+    
+    DIAS_BUSQUEDA = 7
+    
+    def __init__(self, agendas=None):
+        self.servicios = ServicioRepository()
+        self.barberos = BarberoRepository()
+        self.agendas = agendas or AgendaRepository()
+    
+    def zona(self):
+        """Zona horaria de la barbería según TIMEZONE (None = la del sistema)"""
+        try:
+            return ZoneInfo(current_app.config.get('TIMEZONE') or 'UTC')
+        except ZoneInfoNotFoundError:
+            return None
+    
+    def ahora(self):
+        """Hora local de la barbería (naive), según TIMEZONE"""
+        return datetime.now(self.zona()).replace(tzinfo=None)
+    
+    def hora_local(self, momento):
+        """`momento` como hora local naive; si trae zona se convierte a TIMEZONE"""
+        if momento.tzinfo is None:
+            return momento
+        return momento.astimezone(self.zona()).replace(tzinfo=None)
+    
+    def slots_de_servicio(self, servicio_id):
+        """Slots que ocupa un servicio activo"""
+        servicio = self.servicios.get_by_id(servicio_id)
+        if not servicio or not servicio.is_active:
+            raise ValueError(f"Servicio no encontrado: {servicio_id}")
+        return AgendaDia.slots_para(servicio.duracion_minutos or Servicio.DURACION_POR_DEFECTO)
+    
+    def proximos_huecos(self, servicio_id, cantidad=5, desde=None, barbero_id=None):
+        """
+        Próximos `cantidad` inicios libres para el servicio entre todos los barberos
+        (o solo `barbero_id`) en los próximos DIAS_BUSQUEDA días.
+        Retorna una lista de SlotLibre ordenada por hora y barbero.
+        """
+        slots = self.slots_de_servicio(servicio_id)
+        desde = desde or self.ahora()
+        
+        barberos = self.barberos.get_activos()
+        if barbero_id is not None:
+            barberos = [b for b in barberos if b.id == barbero_id]
+        if not barberos or cantidad < 1:
+            return []
+        
+        primer_dia = desde.date()
+        ultimo_dia = primer_dia + timedelta(days=self.DIAS_BUSQUEDA - 1)
+        bitmaps = self.agendas.get_bitmaps([b.id for b in barberos], primer_dia, ultimo_dia)
+        
+        huecos = []
+        for dia in range(self.DIAS_BUSQUEDA):
+            fecha = primer_dia + timedelta(days=dia)
+            horario = AgendaDia.mascara_horario(fecha)
+            if not horario:
+                continue
+            if fecha == primer_dia:
+                horario &= ~AgendaDia.mascara(0, self._primer_slot_futuro(desde))
+            
+            candidatos = []
+            for barbero in barberos:
+                inicios = self.inicios_libres(horario & ~bitmaps.get((barbero.id, fecha), 0), slots)
+                # Basta con los `cantidad` primeros de cada barbero
+                for slot in self._bits(inicios, cantidad - len(huecos)):
+                    candidatos.append((slot, barbero.id, barbero))
+            
+            candidatos.sort(key=lambda c: c[:2])
+            for slot, _, barbero in candidatos[:cantidad - len(huecos)]:
+                huecos.append(SlotLibre(AgendaDia.hora_de_slot(fecha, slot), fecha, slot, barbero))
+            if len(huecos) >= cantidad:
+                break
+        
+        return huecos
+    
+    @staticmethod
+    def inicios_libres(libres, slots):
+        """
+        Bitmap de los slots i tales que i..i+slots-1 están todos libres.
+        AND con el propio bitmap desplazado, duplicando el tramo: O(log slots).
+        """
+        inicios, cubiertos = libres, 1
+        while cubiertos < slots:
+            paso = min(cubiertos, slots - cubiertos)
+            inicios &= inicios >> paso
+            cubiertos += paso
+        return inicios
+    
+    @staticmethod
+    def _bits(bitmap, limite):
+        """Índices de los bits a 1, de menor a mayor, hasta `limite`"""
+        while bitmap and limite > 0:
+            bajo = bitmap & -bitmap
+            yield bajo.bit_length() - 1
+            bitmap ^= bajo
+            limite -= 1
+    
+    @staticmethod
+    def _primer_slot_futuro(momento):
+        """Primer slot del día que todavía no empezó"""
+        apertura = datetime.combine(momento.date(), AgendaDia.APERTURA)
+        if momento <= apertura:
+            return 0
+        minutos = (momento - apertura).total_seconds() / 60
+        return math.ceil(minutos / AgendaDia.SLOT_MINUTOS)
+
+
+class ReservaService:
+    """
+    Reserva de citas sin bloqueo global.
+    La ocupación es un UPDATE condicional sobre el bitmap del día (compare-and-swap):
+    de dos peticiones por el mismo hueco gana una y la otra falla al instante
+    con alternativas, en lugar de hacer cola.
+    """
+    
+    ALTERNATIVAS = 3
+    # Longitudes de Appointment.cliente_nombre y cliente_telefono
+    MAX_NOMBRE = Appointment.cliente_nombre.type.length
+    MAX_TELEFONO = Appointment.cliente_telefono.type.length
+    
+    def __init__(self, agenda=None):
+        self.agenda = agenda or AgendaRepository()
+        self.barberos = BarberoRepository()
+        self.disponibilidad = DisponibilidadService(self.agenda)
+    
+    def reservar(self, barbero_id, servicio_id, inicio, cliente_nombre, cliente_telefono=None):
+        """
+        Reserva el hueco que empieza en `inicio` (datetime local).
+        Lanza SlotNoDisponible si ya está ocupado y ValueError si no es válido.
+        """
+        cliente_nombre = (cliente_nombre or '').strip()
+        if not cliente_nombre:
+            raise ValueError("Nombre del cliente requerido")
+        if len(cliente_nombre) > self.MAX_NOMBRE:
+            raise ValueError(f"Nombre demasiado largo (máx. {self.MAX_NOMBRE} caracteres)")
+        cliente_telefono = (cliente_telefono or '').strip() or None
+        if cliente_telefono and len(cliente_telefono) > self.MAX_TELEFONO:
+            raise ValueError(f"Teléfono demasiado largo (máx. {self.MAX_TELEFONO} caracteres)")
+        
+        barbero = self.barberos.get_by_id(barbero_id)
+        if not barbero or not barbero.is_active:
+            raise ValueError(f"Barbero no encontrado: {barbero_id}")
+        
+        slots = self.disponibilidad.slots_de_servicio(servicio_id)
+        fecha, slot = self._slot_de(inicio)
+        mascara = AgendaDia.mascara(slot, slots)
+        
+        if mascara & ~AgendaDia.mascara_horario(fecha):
+            raise ValueError("Horario fuera del horario de atención")
+        if inicio < self.disponibilidad.ahora():
+            raise ValueError("No se puede reservar en el pasado")
+        
+        if not self.agenda.ocupar(barbero_id, fecha, mascara):
+            self.agenda.deshacer()
+            raise SlotNoDisponible(
+                self.disponibilidad.proximos_huecos(servicio_id, self.ALTERNATIVAS, desde=inicio)
+            )
+        
+        return self.agenda.registrar_cita(
+            barbero_id=barbero_id,
+            servicio_id=servicio_id,
+            fecha=fecha,
+            slot_inicio=slot,
+            slots=slots,
+            cliente_nombre=cliente_nombre,
+            cliente_telefono=cliente_telefono,
+        )
+    
+    def cancelar(self, cita_id):
+        """Cancela una cita y libera sus slots"""
+        cita = self.agenda.get_cita(cita_id)
+        if not cita or cita.estado == 'cancelada':
+            raise ValueError(f"Cita no encontrada: {cita_id}")
+        
+        self.agenda.liberar(cita.barbero_id, cita.fecha,
+                            AgendaDia.mascara(cita.slot_inicio, cita.slots))
+        self.agenda.cancelar_cita(cita)
+        return cita
+    
+    @staticmethod
+    def _slot_de(inicio):
+        """(fecha, slot) de un inicio alineado a la rejilla de slots"""
+        slot = AgendaDia.slot_de_hora(inicio.time())
+        if slot < 0 or AgendaDia.hora_de_slot(inicio.date(), slot) != inicio.replace(tzinfo=None):
+            raise ValueError(f"Hora no válida: {inicio:%H:%M}")
+        return inicio.date(), slot
+
+
+class AgendaEnMemoria:
+    """
+    Sustituto en proceso de AgendaRepository (mismo contrato), para tests
+    y benchmarks. Un candado por franja de días, no uno global.
+    """
+    
+    FRANJAS = 64
+    
+    def __init__(self):
+        self._dias = {}
+        self._citas = {}
+        self._ids = itertools.count(1)
+        self._franjas = [threading.Lock() for _ in range(self.FRANJAS)]
+    
+    def _candado(self, barbero_id, fecha):
+        return self._franjas[hash((barbero_id, fecha)) % self.FRANJAS]
+    
+    def get_bitmaps(self, barbero_ids, desde, hasta):
+        ids = set(barbero_ids)
+        return {
+            clave: ocupados for clave, ocupados in list(self._dias.items())
+            if clave[0] in ids and desde <= clave[1] <= hasta
+        }
+    
+    def ocupar(self, barbero_id, fecha, mascara):
+        with self._candado(barbero_id, fecha):
+            ocupados = self._dias.get((barbero_id, fecha), 0)
+            if ocupados & mascara:
+                return False
+            self._dias[(barbero_id, fecha)] = ocupados | mascara
+            return True
+    
+    def liberar(self, barbero_id, fecha, mascara):
+        with self._candado(barbero_id, fecha):
+            self._dias[(barbero_id, fecha)] = self._dias.get((barbero_id, fecha), 0) & ~mascara
+    
+    def registrar_cita(self, **datos):
+        cita = Appointment(id=next(self._ids), estado='confirmada', **datos)
+        self._citas[cita.id] = cita
+        return cita
+    
+    def cancelar_cita(self, cita):
+        cita.estado = 'cancelada'
+    
+    def get_cita(self, cita_id):
+        return self._citas.get(cita_id)
+    
+    def citas(self):
+        return list(self._citas.values())
+    
+    def deshacer(self):
+        pass
@@ -1,15 +1,153 @@
 """
 Servicio de Autenticación
 """
+import math
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from flask_login import UserMixin
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash, check_password_hash
+from app.core.metricas import contar_cache
 from app.domain.models import User, db
 
 
+class IntentosExcedidos(ValueError):
+    """Demasiados intentos de login: se rechaza sin verificar la contraseña"""
+    
+    def __init__(self, retry_after):
+        super().__init__("Demasiados intentos, espera unos minutos")
+        self.retry_after = retry_after
+
+
+class UsuarioSesion(UserMixin):
+    """
+    Identidad del usuario logueado para Flask-Login: copia de solo lectura
+    de User, sin instancia ORM (se comparte entre peticiones e hilos)
+    """
+    
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+    
+    def __repr__(self):
+        return f'<UsuarioSesion {self.username}>'
+
+
+class LimitadorIntentos:
+    """
+    Limitador de ventana deslizante por clave (IP, usuario+IP), en memoria del proceso.
+    Guarda las marcas de tiempo de los intentos dentro de la ventana.
+    """
+    
+    # Claves máximas vigiladas; se descartan las menos recientes
+    MAX_CLAVES = 10000
+    
+    def __init__(self, max_intentos, ventana):
+        self.max_intentos = max_intentos
+        self.ventana = ventana
+        self._intentos = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def registrar(self, clave):
+        """
+        Registra un intento para la clave.
+        Retorna 0 si se permite o los segundos que faltan para poder reintentar.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            marcas = self._intentos.get(clave)
+            if marcas is None:
+                marcas = self._intentos[clave] = deque()
+                while len(self._intentos) > self.MAX_CLAVES:
+                    self._intentos.popitem(last=False)
+            self._intentos.move_to_end(clave)
+            
+            while marcas and marcas[0] <= ahora - self.ventana:
+                marcas.popleft()
+            
+            if len(marcas) >= self.max_intentos:
+                return max(1, math.ceil(marcas[0] + self.ventana - ahora))
+            
+            marcas.append(ahora)
+            return 0
+    
+    def reiniciar(self, clave):
+        """Olvida los intentos de una clave (tras un login correcto)"""
+        with self._lock:
+            self._intentos.pop(clave, None)
+
+
 class AuthService:
     """
     Servicio de autenticación y gestión de usuarios
     """
     
+    # Límites de intentos de login por ventana de 5 minutos. El límite por usuario
+    # se cuenta por (usuario, IP): desde otra IP no se puede bloquear al admin.
+    LOGIN_VENTANA = 300
+    LOGIN_MAX_POR_IP = 20
+    LOGIN_MAX_POR_USUARIO = 5
+    # Verificaciones de contraseña simultáneas por proceso
+    MAX_HASH_CONCURRENTES = 2
+    HASH_ESPERA = 5
+    
+    _limite_ip = LimitadorIntentos(LOGIN_MAX_POR_IP, LOGIN_VENTANA)
+    _limite_usuario = LimitadorIntentos(LOGIN_MAX_POR_USUARIO, LOGIN_VENTANA)
+    _hash_slots = threading.BoundedSemaphore(MAX_HASH_CONCURRENTES)
+    # Hash contra el que se verifican los usuarios inexistentes (se crea al primer uso)
+    _hash_ficticio = None
+    
+    # Caché de identidades para el user_loader de Flask-Login (por proceso).
+    # Los cambios se invalidan al instante solo en el proceso que los hace:
+    # el TTL acota cuánto tarda el resto de workers en verlos.
+    USER_CACHE_TTL = 30
+    USER_CACHE_MAX = 128
+    _usuarios = OrderedDict()
+    _usuarios_lock = threading.Lock()
+    
+    @classmethod
+    def cargar_usuario(cls, user_id):
+        """
+        Carga la identidad de un usuario por id pasando por la caché LRU con TTL.
+        Retorna un UsuarioSesion (no la instancia ORM) o None.
+        """
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        
+        ahora = time.monotonic()
+        with cls._usuarios_lock:
+            entrada = cls._usuarios.get(user_id)
+            if entrada is not None and entrada[0] > ahora:
+                cls._usuarios.move_to_end(user_id)
+                contar_cache('usuarios', True)
+                return entrada[1]
+        
+        contar_cache('usuarios', False)
+        fila = db.session.query(User.id, User.username).filter(User.id == user_id).first()
+        if fila is None:
+            return None
+        usuario = UsuarioSesion(fila.id, fila.username)
+        
+        with cls._usuarios_lock:
+            cls._usuarios[user_id] = (ahora + cls.USER_CACHE_TTL, usuario)
+            cls._usuarios.move_to_end(user_id)
+            while len(cls._usuarios) > cls.USER_CACHE_MAX:
+                cls._usuarios.popitem(last=False)
+        return usuario
+    
+    @classmethod
+    def invalidar_usuario(cls, user_id=None):
+        """Descarta un usuario de la caché (o toda la caché si no se indica id)"""
+        with cls._usuarios_lock:
+            if user_id is None:
+                cls._usuarios.clear()
+            else:
+                cls._usuarios.pop(user_id, None)
+    
     @staticmethod
     def crear_usuario(username, password):
         """Crea un nuevo usuario con contraseña hasheada"""
@@ -27,20 +165,54 @@ class AuthService:
         db.session.commit()
         return usuario
     
-    @staticmethod
-    def validar_credenciales(username, password):
-        """Valida las credenciales de un usuario"""
+    @classmethod
+    def validar_credenciales(cls, username, password, ip=None):
+        """
+        Valida las credenciales de un usuario.
+        Los límites por IP y por (usuario, IP) se comprueban antes de tocar el hash;
+        lanza IntentosExcedidos si se superan.
+        """
+        clave_usuario = ((username or '').lower(), ip)
+        espera = max(
+            cls._limite_ip.registrar(ip) if ip else 0,
+            cls._limite_usuario.registrar(clave_usuario),
+        )
+        if espera:
+            raise IntentosExcedidos(espera)
+        
         usuario = User.query.filter_by(username=username).first()
+        # Un usuario inexistente también paga la verificación del hash:
+        # el tiempo de respuesta no revela qué usuarios existen
+        hash_guardado = usuario.password if usuario else cls._obtener_hash_ficticio()
         
-        if not usuario:
-            return None
+        if not cls._hash_slots.acquire(timeout=cls.HASH_ESPERA):
+            raise IntentosExcedidos(1)
+        try:
+            valido = check_password_hash(hash_guardado, password or '')
+        finally:
+            cls._hash_slots.release()
         
-        if check_password_hash(usuario.password, password):
+        if usuario and valido:
+            cls._limite_usuario.reiniciar(clave_usuario)
             return usuario
         
         return None
     
+    @classmethod
+    def _obtener_hash_ficticio(cls):
+        """Hash de una contraseña aleatoria, con el mismo método que los reales"""
+        if cls._hash_ficticio is None:
+            cls._hash_ficticio = generate_password_hash(secrets.token_hex(16))
+        return cls._hash_ficticio
+    
     @staticmethod
     def usuario_existe(username):
         """Verifica si un usuario existe"""
         return User.query.filter_by(username=username).first() is not None
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidar_usuario_modificado(mapper, connection, target):
+    """Cualquier cambio en un usuario invalida su entrada en la caché"""
+    AuthService.invalidar_usuario(target.id)
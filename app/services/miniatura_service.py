@@ -0,0 +1,259 @@
+"""
+Servicio de Miniaturas - Imágenes de la galería redimensionadas bajo demanda
+Los resultados se guardan en una caché en disco con presupuesto de bytes (LRU)
+"""
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import suppress
+from flask import current_app
+from werkzeug.security import safe_join
+from app.core.instrumentacion import medir
+from app.core.metricas import contar_cache
+from app.services import procesador_imagenes
+from app.services.servicio_service import GaleriaService
+
+
+class MiniaturaEnCurso(ValueError):
+    """Otra petición sigue generando la misma miniatura pasada la espera máxima"""
+    
+    def __init__(self, retry_after):
+        super().__init__("La miniatura se está generando, reintenta en unos segundos")
+        self.retry_after = retry_after
+
+
+class MiniaturaService:
+    """
+    Redimensiona las imágenes de la galería a cualquier ancho, calidad y formato.
+    - Caché en disco compartida por todos los workers, con presupuesto de bytes;
+      al superarlo se borran las miniaturas usadas hace más tiempo (mtime = último uso)
+    - Peticiones idénticas simultáneas se agrupan: un solo encode por miniatura,
+      dentro del proceso (Future) y entre workers (archivo .lock exclusivo)
+    """
+    
+    ORIGEN_FOLDER = GaleriaService.UPLOAD_FOLDER
+    CACHE_FOLDER = os.path.join(tempfile.gettempdir(), 'aptbarber-miniaturas')
+    CACHE_BYTES = 256 * 1024 * 1024
+    # Al superar el presupuesto se borra hasta quedar en esta fracción
+    CACHE_OBJETIVO = 0.9
+    # Segundos entre recuentos de la carpeta (escrituras de otros workers)
+    CACHE_RECUENTO = 60
+    # Un acierto renueva el mtime como mucho cada tantos segundos
+    CACHE_TOQUE = 60
+    
+    # Solo combinaciones de una lista cerrada: con parámetros libres cualquiera
+    # podría forzar miles de encodes por imagen y vaciar la caché.
+    # Las del srcset de la galería más las que piden las plantillas (USOS_MINIATURA)
+    ANCHOS = tuple(sorted({
+        *GaleriaService.VARIANT_WIDTHS, GaleriaService.MAX_WIDTH,
+        *(ancho for ancho, _, _ in GaleriaService.USOS_MINIATURA.values()),
+    }))
+    CALIDADES = tuple(sorted({
+        GaleriaService.IMAGE_QUALITY,
+        *(calidad for _, calidad, _ in GaleriaService.USOS_MINIATURA.values()),
+    }))
+    # ?fmt= -> extensión del archivo generado
+    FORMATOS = {'jpeg': '.jpg', 'jpg': '.jpg', 'webp': '.webp', 'png': '.png'}
+    MIMETYPES = {'.jpg': 'image/jpeg', '.webp': 'image/webp', '.png': 'image/png'}
+    
+    # Espera máxima (segundos) a que otra petición termine la misma miniatura
+    ESPERA_MAXIMA = 30
+    ESPERA_SONDEO = 0.02
+    # Retry-After (segundos) sugerido si la espera se agota
+    REINTENTO = 5
+    
+    def __init__(self):
+        self._en_curso = {}
+        self._en_curso_lock = threading.Lock()
+        # Bytes en caché según este proceso (None = sin contar todavía)
+        self._bytes = None
+        self._recontado_at = 0.0
+        self._limpieza_lock = threading.Lock()
+    
+    def obtener(self, filename, width=None, quality=None, formato=None):
+        """
+        Ruta de la miniatura en la caché; la genera si no existe
+        Lanza ValueError si los parámetros no son válidos, FileNotFoundError
+        si la imagen original no existe y MiniaturaEnCurso si otra petición
+        no la termina dentro de ESPERA_MAXIMA
+        """
+        origen, destino, width, quality = self._resolver(filename, width, quality, formato)
+        
+        try:
+            mtime = os.stat(destino).st_mtime
+        except FileNotFoundError:
+            contar_cache('miniaturas', False)
+            return self._generar_unica(origen, destino, width, quality)
+        
+        contar_cache('miniaturas', True)
+        if time.time() - mtime > self.CACHE_TOQUE:
+            with suppress(FileNotFoundError):
+                os.utime(destino)
+        return destino
+    
+    def mimetype(self, ruta):
+        return self.MIMETYPES[os.path.splitext(ruta)[1]]
+    
+    def _carpeta(self):
+        return current_app.config.get('IMAGE_CACHE_DIR') or self.CACHE_FOLDER
+    
+    def _presupuesto(self):
+        return current_app.config.get('IMAGE_CACHE_BYTES') or self.CACHE_BYTES
+    
+    def _resolver(self, filename, width, quality, formato):
+        """Valida los parámetros; retorna (origen, destino, width, quality)"""
+        nombre, ext = os.path.splitext(filename or '')
+        if (os.path.basename(filename or '') != filename
+                or ext[1:].lower() not in GaleriaService.ALLOWED_EXTENSIONS):
+            raise FileNotFoundError(filename)
+        
+        origen = safe_join(self.ORIGEN_FOLDER, filename)
+        if origen is None or not os.path.isfile(origen):
+            raise FileNotFoundError(filename)
+        
+        width = self._permitido('w', width, GaleriaService.MAX_WIDTH, self.ANCHOS)
+        quality = self._permitido('q', quality, GaleriaService.IMAGE_QUALITY, self.CALIDADES)
+        
+        if formato:
+            salida = self.FORMATOS.get(formato.lower())
+            if salida is None:
+                raise ValueError(f"Formato no soportado: {formato}")
+        else:
+            salida = self.FORMATOS.get(ext[1:].lower(), ext.lower())
+        if salida == '.png':
+            # PNG no tiene calidad: una sola entrada en caché por ancho
+            quality = 0
+        
+        destino = os.path.join(self._carpeta(), f"{nombre}{ext.lower()}-{width}w-q{quality}{salida}")
+        return origen, destino, width, quality
+    
+    def _permitido(self, nombre, valor, defecto, permitidos):
+        if valor is None or valor == '':
+            return defecto
+        try:
+            valor = int(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"{nombre} debe ser un entero")
+        if valor not in permitidos:
+            raise ValueError(f"{nombre} debe ser uno de: {', '.join(map(str, permitidos))}")
+        return valor
+    
+    def _generar_unica(self, origen, destino, width, quality):
+        """
+        Genera la miniatura una sola vez aunque lleguen varias peticiones iguales:
+        la primera la genera y las demás esperan su resultado
+        """
+        with self._en_curso_lock:
+            futuro = self._en_curso.get(destino)
+            lider = futuro is None
+            if lider:
+                futuro = self._en_curso[destino] = Future()
+        
+        if not lider:
+            try:
+                return futuro.result(timeout=self.ESPERA_MAXIMA)
+            except TimeoutError:
+                raise MiniaturaEnCurso(self.REINTENTO)
+        
+        try:
+            self._generar_con_candado(origen, destino, width, quality)
+            futuro.set_result(destino)
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            with self._en_curso_lock:
+                del self._en_curso[destino]
+        return destino
+    
+    def _generar_con_candado(self, origen, destino, width, quality):
+        """
+        Genera la miniatura bajo un archivo .lock creado con O_EXCL:
+        si otro worker ya la está generando se espera a que aparezca
+        """
+        carpeta, nombre = os.path.split(destino)
+        os.makedirs(carpeta, exist_ok=True)
+        candado = os.path.join(carpeta, f".{nombre}.lock")
+        limite = time.monotonic() + self.ESPERA_MAXIMA
+        
+        while True:
+            try:
+                fd = os.open(candado, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if os.path.exists(destino):
+                    return
+                try:
+                    vencido = time.time() - os.path.getmtime(candado) > self.ESPERA_MAXIMA
+                except FileNotFoundError:
+                    continue
+                if vencido or time.monotonic() > limite:
+                    # El worker que lo tenía murió a medio generar: se toma el relevo
+                    with suppress(FileNotFoundError):
+                        os.remove(candado)
+                    continue
+                time.sleep(self.ESPERA_SONDEO)
+        
+        os.close(fd)
+        try:
+            if os.path.exists(destino):
+                return
+            with medir('miniatura'):
+                procesador_imagenes.redimensionar(
+                    origen, destino, width, quality, GaleriaService.MAX_IMAGE_PIXELS
+                )
+        finally:
+            with suppress(FileNotFoundError):
+                os.remove(candado)
+        
+        self._contabilizar(os.path.getsize(destino))
+    
+    def _contabilizar(self, tamano):
+        """Suma una miniatura nueva y limpia la caché si supera el presupuesto"""
+        with self._limpieza_lock:
+            vencido = time.monotonic() - self._recontado_at > self.CACHE_RECUENTO
+            if self._bytes is not None and not vencido:
+                self._bytes += tamano
+                if self._bytes <= self._presupuesto():
+                    return
+        self.limpiar()
+    
+    def limpiar(self, presupuesto=None):
+        """
+        Recuenta la caché y, si supera el presupuesto, borra las miniaturas
+        usadas hace más tiempo hasta quedar en CACHE_OBJETIVO del presupuesto.
+        Retorna (archivos eliminados, bytes liberados).
+        """
+        presupuesto = self._presupuesto() if presupuesto is None else presupuesto
+        carpeta = self._carpeta()
+        
+        with self._limpieza_lock:
+            archivos = []
+            try:
+                with os.scandir(carpeta) as entries:
+                    for entry in entries:
+                        # Los temporales y .lock empiezan por punto
+                        if entry.name.startswith('.') or not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                        archivos.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                pass
+            
+            total = sum(tamano for _, tamano, _ in archivos)
+            eliminados = liberados = 0
+            if total > presupuesto:
+                objetivo = presupuesto * self.CACHE_OBJETIVO
+                for _, tamano, ruta in sorted(archivos):
+                    if total - liberados <= objetivo:
+                        break
+                    with suppress(FileNotFoundError):
+                        os.remove(ruta)
+                        eliminados += 1
+                    liberados += tamano
+            
+            self._bytes = total - liberados
+            self._recontado_at = time.monotonic()
+            return eliminados, liberados
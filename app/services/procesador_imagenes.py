@@ -0,0 +1,233 @@
+"""
+Procesamiento de imágenes en segundo plano
+Las funciones de módulo se ejecutan dentro de los procesos del pool,
+por eso no dependen de Flask ni de la base de datos.
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+
+# ==================== FUNCIONES DEL WORKER ====================
+
+FORMATOS = {'.png': 'PNG', '.webp': 'WEBP', '.jpg': 'JPEG', '.jpeg': 'JPEG'}
+
+# Píxeles máximos que se decodifican en memoria (~64MB en RGBA por worker).
+# JPEG se reduce con draft() antes de decodificar; PNG y WebP no admiten
+# decodificación reducida y se decodifican completos: este es su límite real.
+MAX_PIXELS_DECODIFICADOS = 16_000_000
+
+# Resultado de optimizar_imagen (para métricas y el índice de la galería)
+Optimizacion = namedtuple(
+    'Optimizacion', 'filename segundos bytes_origen bytes_destino width height variantes'
+)
+
+
+def guardar_imagen(img, filepath, quality):
+    """
+    Guarda la imagen en el formato que indica su extensión.
+    Escribe en un temporal de la misma carpeta y lo renombra (escritura atómica):
+    nunca se sirve un archivo a medio escribir.
+    """
+    formato = FORMATOS.get(os.path.splitext(filepath)[1].lower(), 'JPEG')
+    carpeta, nombre = os.path.split(filepath)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{nombre}.', suffix='.tmp', dir=carpeta or '.')
+    
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            if formato == 'PNG':
+                img.save(tmp, 'PNG', optimize=True)
+            elif formato == 'WEBP':
+                img.save(tmp, 'WEBP', quality=quality)
+            else:
+                img.save(tmp, 'JPEG', quality=quality, optimize=True)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def generar_variantes(img, filepath, widths, variants_folder, quality):
+    """
+    Genera las variantes de ancho reducido de una imagen ya optimizada.
+    Solo se crean las más estrechas que la imagen original.
+    Retorna la lista de anchos generados.
+    """
+    base, ext = os.path.splitext(os.path.basename(filepath))
+    os.makedirs(variants_folder, exist_ok=True)
+    
+    generadas = []
+    for width in widths:
+        if width >= img.width:
+            break
+        height = max(1, round(img.height * width / img.width))
+        variante = img.resize((width, height), Image.Resampling.LANCZOS)
+        guardar_imagen(
+            variante,
+            os.path.join(variants_folder, f"{base}-{width}w{ext}"),
+            quality
+        )
+        generadas.append(width)
+    
+    return generadas
+
+
+def abrir_reducida(origen, max_width, max_pixels):
+    """
+    Abre y decodifica la imagen directamente a la escala más cercana a max_width.
+    En JPEG, draft() decodifica a 1/2, 1/4 u 1/8 sin pasar por la resolución completa.
+    Rechaza imágenes de más de max_pixels (bombas de descompresión) y las que,
+    tras draft(), seguirían ocupando más de MAX_PIXELS_DECODIFICADOS en memoria.
+    """
+    img = Image.open(origen)
+    try:
+        if img.width * img.height > max_pixels:
+            raise ValueError(
+                f"Imagen demasiado grande: {img.width}x{img.height} (máx. {max_pixels} píxeles)"
+            )
+        
+        if img.width > max_width:
+            img.draft('RGB', (max_width, max(1, img.height * max_width // img.width)))
+        # Tamaño que se va a decodificar (el reducido si draft() aplicó)
+        if img.width * img.height > MAX_PIXELS_DECODIFICADOS:
+            raise ValueError(
+                f"Imagen demasiado grande para decodificar: {img.format} {img.width}x{img.height} "
+                f"(máx. {MAX_PIXELS_DECODIFICADOS} píxeles sin reducción)"
+            )
+        img.load()
+        return img
+    except BaseException:
+        img.close()
+        raise
+
+
+def optimizar_imagen(origen, destino, max_width, quality, variant_widths, variants_folder,
+                     max_pixels=Image.MAX_IMAGE_PIXELS):
+    """
+    Redimensiona, comprime y genera variantes.
+    Lee de `origen` y escribe en `destino`; si son distintos, `origen` se elimina.
+    Retorna una Optimizacion con la duración, los tamaños antes/después,
+    las dimensiones finales y los anchos de las variantes.
+    """
+    inicio = time.perf_counter()
+    bytes_origen = os.path.getsize(origen)
+    
+    with abrir_reducida(origen, max_width, max_pixels) as img:
+        # Redimensionar si es necesario
+        if img.width > max_width:
+            ratio = max_width / img.width
+            new_height = int(img.height * ratio)
+            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+        
+        # Convertir a RGB si es necesario
+        if img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
+        
+        # Variantes primero: cuando aparece la imagen principal ya están listas
+        variantes = generar_variantes(img, destino, variant_widths, variants_folder, quality)
+        guardar_imagen(img, destino, quality)
+        width, height = img.size
+    
+    if origen != destino and os.path.exists(origen):
+        os.remove(origen)
+    
+    return Optimizacion(
+        os.path.basename(destino),
+        time.perf_counter() - inicio,
+        bytes_origen,
+        os.path.getsize(destino),
+        width,
+        height,
+        tuple(variantes),
+    )
+
+
+def redimensionar(origen, destino, width, quality, max_pixels=Image.MAX_IMAGE_PIXELS):
+    """
+    Escribe en `destino` una copia de `origen` de `width` px de ancho como máximo
+    (nunca amplía), en el formato que indica la extensión de `destino`.
+    Retorna el tamaño final (width, height).
+    """
+    with abrir_reducida(origen, width, max_pixels) as img:
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.Resampling.LANCZOS)
+        
+        formato = FORMATOS.get(os.path.splitext(destino)[1].lower(), 'JPEG')
+        if formato == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        
+        guardar_imagen(img, destino, quality)
+        return img.size
+
+
+# ==================== POOL DE PROCESOS ====================
+
+class ProcesadorImagenes:
+    """
+    Pool de procesos acotado para optimizar imágenes fuera de la petición.
+    El pool se crea bajo demanda en cada proceso (seguro tras el fork de gunicorn).
+    """
+    
+    # Tareas máximas en cola por proceso antes de rechazar subidas
+    MAX_PENDIENTES = 50
+    
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pendientes = threading.BoundedSemaphore(self.MAX_PENDIENTES)
+    
+    def _obtener_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers or min(2, os.cpu_count() or 1),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+    
+    def reservar(self, cantidad):
+        """Reserva hueco en la cola; retorna False si está llena"""
+        reservadas = 0
+        for _ in range(cantidad):
+            if not self._pendientes.acquire(blocking=False):
+                for _ in range(reservadas):
+                    self._pendientes.release()
+                return False
+            reservadas += 1
+        return True
+    
+    def encolar(self, callback, *args):
+        """
+        Envía optimizar_imagen(*args) al pool.
+        `callback(future)` se ejecuta en el proceso padre al terminar.
+        Requiere una reserva previa con reservar().
+        """
+        def _al_terminar(future):
+            self._pendientes.release()
+            callback(future)
+        
+        try:
+            future = self._obtener_executor().submit(optimizar_imagen, *args)
+        except Exception:
+            self._pendientes.release()
+            raise
+        future.add_done_callback(_al_terminar)
+        return future
+    
+    def cerrar(self, wait=True):
+        """Cierra el pool del proceso actual"""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=wait)
+            self._executor = None
+            self._pid = None
@@ -3,6 +3,9 @@ Inicializador de servicios
 """
 from app.services.servicio_service import ServicioService, GaleriaService
 from app.services.auth_service import AuthService
+from app.services.agenda_service import DisponibilidadService, ReservaService
+from app.services.miniatura_service import MiniaturaService
+from app.services.procesador_imagenes import ProcesadorImagenes
 
 
 class ServiceLocator:
@@ -32,6 +35,15 @@ class ServiceLocator:
             return GaleriaService()
         elif nombre == 'auth':
             return AuthService()
+        elif nombre == 'disponibilidad':
+            return DisponibilidadService()
+        elif nombre == 'reserva':
+            return ReservaService()
+        elif nombre == 'miniaturas':
+            return MiniaturaService()
+        elif nombre == 'procesador':
+            from flask import current_app
+            return ProcesadorImagenes(current_app.config.get('IMAGE_WORKERS'))
         else:
             raise ValueError(f"Servicio desconocido: {nombre}")
 
@@ -45,3 +57,12 @@ def get_galeria_service():
 
 def get_auth_service():
     return AuthService
+
+def get_disponibilidad_service():
+    return ServiceLocator.obtener('disponibilidad')
+
+def get_reserva_service():
+    return ServiceLocator.obtener('reserva')
+
+def get_miniatura_service():
+    return ServiceLocator.obtener('miniaturas')
@@ -1,10 +1,45 @@
 """
 Servicios de Negocio - Use Cases
 """
+import csv
+import hashlib
+import io
+import json
+import math
 import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import suppress
+from datetime import datetime, timezone
+from itertools import groupby
+from urllib.parse import urlencode
+from flask import current_app, has_request_context, url_for
 from werkzeug.utils import secure_filename
 from PIL import Image
-from app.domain.repositories import ServicioRepository
+from app.core.instrumentacion import medir
+from app.core.metricas import contar_cache, observar_optimizacion
+from app.domain.models import ID_MAXIMO, Servicio, db
+from app.domain.repositories import (
+    ServicioRepository, TrabajoGaleriaRepository, GaleriaImagenRepository
+)
+from app.services import procesador_imagenes
+
+
+# Página de la galería: entradas listas para plantilla y cursor de la siguiente
+PaginaGaleria = namedtuple('PaginaGaleria', 'imagenes siguiente')
+
+
+class ImportacionInvalida(ValueError):
+    """El archivo del catálogo tiene filas con errores; no se importó nada"""
+    
+    def __init__(self, errores):
+        super().__init__(f"{len(errores)} fila(s) con errores, no se importó ningún servicio")
+        # [(fila, mensaje)], fila empieza en 1
+        self.errores = errores
 
 
 class ServicioService:
@@ -13,18 +48,114 @@ class ServicioService:
     Implementa la lógica de aplicación
     """
     
+    # Importación/exportación del catálogo: columnas y tipos de contenido
+    COLUMNAS_CATALOGO = ('nombre', 'precio', 'descripcion', 'categoria', 'duracion_minutos', 'is_active')
+    FORMATOS_CATALOGO = {'csv': 'text/csv; charset=utf-8', 'json': 'application/json'}
+    MAX_FILAS_IMPORTACION = 20000
+    LOTE_EXPORTACION = 500
+    
     def __init__(self):
         self.repository = ServicioRepository()
+        
+        # Snapshot en memoria del catálogo, válido mientras no cambie la versión
+        self._catalogo = None
+        self._catalogo_version = None
+        self._agrupados = None
+        self._catalogo_lock = threading.Lock()
     
     def listar_servicios(self):
         """Obtiene todos los servicios"""
-        return self.repository.get_all()
+        return self._obtener_catalogo()
     
     def listar_por_categoria(self, categoria):
         """Obtiene servicios por categoría"""
         if categoria not in ['corte', 'extra']:
             raise ValueError(f"Categoría inválida: {categoria}")
-        return self.repository.get_by_categoria(categoria)
+        return dict(self.listar_agrupados()).get(categoria, ())
+    
+    def listar_agrupados(self):
+        """
+        Catálogo agrupado por categoría: [(categoria, [servicios]), ...]
+        Incluye todas las categorías de Servicio.CATEGORIA_TIPOS (aunque estén vacías)
+        """
+        catalogo = self._obtener_catalogo()
+        with self._catalogo_lock:
+            if self._agrupados is not None and self._agrupados[0] is catalogo:
+                return self._agrupados[1]
+        
+        # El catálogo ya viene ordenado por categoría: una sola pasada
+        grupos = {categoria: [] for categoria in Servicio.CATEGORIA_TIPOS}
+        for categoria, servicios in groupby(catalogo, key=lambda s: s.categoria):
+            grupos.setdefault(categoria, []).extend(servicios)
+        agrupados = [(categoria, tuple(servicios)) for categoria, servicios in grupos.items()]
+        
+        with self._catalogo_lock:
+            self._agrupados = (catalogo, agrupados)
+        return agrupados
+    
+    def listar_por_precio(self, minimo=None, maximo=None, descendente=False):
+        """
+        Servicios filtrados por rango y ordenados por precio (en SQL)
+        minimo/maximo aceptan el mismo formato que el precio ('35.000')
+        """
+        if minimo is None and maximo is None:
+            return self.repository.get_ordenados_por_precio(descendente)
+        
+        servicios = self.repository.get_by_rango_precio(
+            Servicio.precio_a_centavos(minimo) if minimo is not None else None,
+            Servicio.precio_a_centavos(maximo) if maximo is not None else None
+        )
+        return servicios[::-1] if descendente else servicios
+    
+    def total_combo(self, servicio_ids):
+        """Precio total (en centavos) de un combo de servicios"""
+        return self.repository.sumar_precios(servicio_ids)
+    
+    def paginar_servicios(self, after_id=None, limite=50, categoria=None):
+        """
+        Página del catálogo para la API
+        Retorna (servicios, cursor siguiente o None)
+        """
+        filas = self.repository.get_pagina(after_id, limite, categoria)
+        if len(filas) > limite:
+            filas = filas[:limite]
+            return filas, filas[-1].id
+        return filas, None
+    
+    def estado_catalogo(self):
+        """
+        (versión, fecha UTC del último cambio o None) del catálogo.
+        Sale del contador de versión: también cambia al borrar servicios.
+        """
+        return self.repository.get_estado()
+    
+    def version_catalogo(self):
+        """Versión actual del catálogo (cambia con cada escritura)"""
+        return self.repository.get_version()
+    
+    def _obtener_catalogo(self):
+        """
+        Devuelve el snapshot del catálogo.
+        Cada lectura solo consulta la versión; la lista completa se
+        recarga cuando create/update/delete la incrementan.
+        """
+        version = self.repository.get_version()
+        
+        with self._catalogo_lock:
+            if self._catalogo is not None and version == self._catalogo_version:
+                contar_cache('catalogo', True)
+                return self._catalogo
+        
+        contar_cache('catalogo', False)
+        servicios = self.repository.get_all()
+        # Separarlos de la sesión: los commits de otras peticiones no los expiran
+        for servicio in servicios:
+            db.session.expunge(servicio)
+        
+        with self._catalogo_lock:
+            self._catalogo = tuple(servicios)
+            self._catalogo_version = version
+            return self._catalogo
     
     def obtener_servicio(self, servicio_id):
         """Obtiene un servicio específico"""
@@ -53,6 +184,170 @@ class ServicioService:
         if not servicio:
             raise ValueError(f"Servicio no encontrado: {servicio_id}")
         return servicio
+    
+    def leer_catalogo(self, contenido, formato):
+        """
+        Convierte el contenido de un archivo (bytes o texto) en filas {columna: valor}
+        CSV con cabecera, o JSON: lista de servicios o {"servicios": [...]}
+        """
+        if formato not in self.FORMATOS_CATALOGO:
+            raise ValueError(f"Formato no soportado: {formato}")
+        if isinstance(contenido, bytes):
+            try:
+                contenido = contenido.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise ValueError("El archivo debe estar codificado en UTF-8")
+        
+        if formato == 'csv':
+            return list(csv.DictReader(io.StringIO(contenido)))
+        
+        try:
+            filas = json.loads(contenido)
+        except ValueError as e:
+            raise ValueError(f"JSON inválido: {e}")
+        if isinstance(filas, dict):
+            filas = filas.get('servicios')
+        if not isinstance(filas, list):
+            raise ValueError("El JSON debe ser una lista de servicios")
+        return filas
+    
+    def importar_catalogo(self, filas):
+        """
+        Importa servicios en bloque. Se identifican por nombre: los que ya
+        existen se actualizan y el resto se crean.
+        Valida todas las filas antes de escribir; si alguna falla lanza
+        ImportacionInvalida con los errores por fila y no toca la base.
+        Retorna (creados, actualizados).
+        """
+        if not filas:
+            raise ValueError("El archivo no contiene servicios")
+        if len(filas) > self.MAX_FILAS_IMPORTACION:
+            raise ValueError(f"Máximo {self.MAX_FILAS_IMPORTACION} servicios por importación")
+        
+        existentes = self.repository.get_ids_por_nombre()
+        nuevos, actualizados, errores, vistos = [], [], [], set()
+        
+        for numero, fila in enumerate(filas, start=1):
+            try:
+                datos = self._validar_fila(fila)
+            except ValueError as e:
+                errores.append((numero, str(e)))
+                continue
+            
+            clave = datos['nombre'].lower()
+            if clave in vistos:
+                errores.append((numero, f"Servicio repetido en el archivo: {datos['nombre']}"))
+                continue
+            vistos.add(clave)
+            
+            if clave in existentes:
+                datos['id'] = existentes[clave]
+                actualizados.append(datos)
+            else:
+                datos.setdefault('descripcion', '')
+                datos.setdefault('categoria', 'corte')
+                datos.setdefault('duracion_minutos', Servicio.DURACION_POR_DEFECTO)
+                datos.setdefault('is_active', True)
+                nuevos.append(datos)
+        
+        if errores:
+            raise ImportacionInvalida(errores)
+        
+        self.repository.importar(nuevos, actualizados)
+        return len(nuevos), len(actualizados)
+    
+    def _validar_fila(self, fila):
+        """
+        Normaliza una fila importada a un mapping de Servicio
+        Las columnas opcionales vacías no se incluyen (al actualizar se conservan)
+        """
+        if not isinstance(fila, dict):
+            raise ValueError("Se esperaba un objeto con las columnas del servicio")
+        
+        valores = {}
+        for columna in self.COLUMNAS_CATALOGO:
+            valor = fila.get(columna)
+            if isinstance(valor, str):
+                valor = valor.strip()
+            if valor is not None and valor != '':
+                valores[columna] = valor
+        
+        nombre = str(valores.get('nombre', ''))
+        if not nombre:
+            raise ValueError("Nombre requerido")
+        if len(nombre) > 100:
+            raise ValueError("Nombre demasiado largo (máx. 100 caracteres)")
+        
+        precio = str(valores.get('precio', ''))
+        if len(precio) > 20:
+            raise ValueError("Precio demasiado largo (máx. 20 caracteres)")
+        datos = {
+            'nombre': nombre,
+            'precio': precio,
+            'precio_centavos': Servicio.precio_a_centavos(precio),
+        }
+        
+        if 'descripcion' in valores:
+            datos['descripcion'] = str(valores['descripcion'])
+        
+        if 'categoria' in valores:
+            if valores['categoria'] not in Servicio.CATEGORIA_TIPOS:
+                raise ValueError(f"Categoría inválida: {valores['categoria']}")
+            datos['categoria'] = valores['categoria']
+        
+        if 'duracion_minutos' in valores:
+            try:
+                duracion = int(valores['duracion_minutos'])
+            except (TypeError, ValueError):
+                duracion = 0
+            if duracion <= 0:
+                raise ValueError(f"Duración inválida: {valores['duracion_minutos']}")
+            datos['duracion_minutos'] = duracion
+        
+        if 'is_active' in valores:
+            activo = str(valores['is_active']).lower()
+            if activo not in ('true', '1', 'si', 'sí', 'false', '0', 'no'):
+                raise ValueError(f"Valor de is_active inválido: {valores['is_active']}")
+            datos['is_active'] = activo in ('true', '1', 'si', 'sí')
+        
+        return datos
+    
+    def exportar_catalogo(self, formato):
+        """
+        Catálogo completo (activos e inactivos) como generador de trozos de texto
+        Lee la base por lotes: no carga todos los servicios en memoria
+        """
+        if formato not in self.FORMATOS_CATALOGO:
+            raise ValueError(f"Formato no soportado: {formato}")
+        
+        filas = self.repository.iter_columnas(self.COLUMNAS_CATALOGO, self.LOTE_EXPORTACION)
+        if formato == 'csv':
+            return self._exportar_csv(filas)
+        return self._exportar_json(filas)
+    
+    def _exportar_csv(self, filas):
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(self.COLUMNAS_CATALOGO)
+        for numero, fila in enumerate(filas, start=1):
+            escritor.writerow(fila)
+            if numero % self.LOTE_EXPORTACION == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    def _exportar_json(self, filas):
+        trozo, separador = ['['], ''
+        for numero, fila in enumerate(filas, start=1):
+            trozo.append(separador + json.dumps(dict(zip(self.COLUMNAS_CATALOGO, fila)),
+                                                ensure_ascii=False))
+            separador = ','
+            if numero % self.LOTE_EXPORTACION == 0:
+                yield ''.join(trozo)
+                trozo = []
+        trozo.append(']')
+        yield ''.join(trozo)
 
 
 class GaleriaService:
@@ -62,12 +357,56 @@ class GaleriaService:
     
     UPLOAD_FOLDER = 'static/images/gallery'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
-    MAX_IMAGES = 10
+    MAX_IMAGES = 5000
     MAX_WIDTH = 1200
     IMAGE_QUALITY = 80
+    # Límites por imagen: 25MB en disco y 60MP declarados (lo que se decodifica
+    # en memoria lo acota además procesador_imagenes.MAX_PIXELS_DECODIFICADOS)
+    MAX_IMAGE_BYTES = 25 * 1024 * 1024
+    MAX_IMAGE_PIXELS = 60_000_000
+    # Segundos entre comprobaciones de la versión de la galería en BD
+    MANIFEST_CHECK_INTERVAL = 2.0
+    
+    # Listado paginado (inicio, scroll infinito y dashboard)
+    PAGINA_GALERIA = 12
+    PAGINA_MAXIMA = 60
+    CURSOR_FECHA = '%Y%m%d%H%M%S%f'
+    
+    # Variantes responsive (srcset)
+    VARIANTS_FOLDER = os.path.join(UPLOAD_FOLDER, 'variantes')
+    VARIANT_WIDTHS = (320, 640, 960)
+    # Ruta de UPLOAD_FOLDER dentro de static/ (para url_for)
+    STATIC_SUBFOLDER = 'images/gallery'
+    
+    # Subidas pendientes de procesar (fuera de static/)
+    STAGING_FOLDER = os.path.join(tempfile.gettempdir(), 'aptbarber-subidas')
+    CHUNK_SIZE = 64 * 1024
+    
+    # Nombres direccionados por contenido: <sha256[:16]>.<ext>
+    HASH_LENGTH = 16
+    HASHED_NAME = re.compile(r'^[0-9a-f]{16}(-\d+w)?\.(png|jpg|jpeg|webp)$')
+    # Caja de .gallery-item por breakpoint (04-gallery.css):
+    # (max-width del viewport o None, ancho, alto de la imagen). La imagen se pinta
+    # con object-fit: cover, así que su ancho real depende de la proporción.
+    CAJAS_GALERIA = ((320, 180, 250), (375, 200, 280), (414, 250, 350), (None, 240, 460))
+    # Miniaturas bajo demanda (/img) que piden las plantillas: uso -> (ancho, calidad, formato)
+    USOS_MINIATURA = {
+        # Rejilla del panel: columnas de 90 a 180 px (minmax(90px, 1fr)) a 2x
+        'panel': (360, 60, None),
+        # Lightbox: la imagen entera; WebP pesa bastante menos que la original
+        'lightbox': (MAX_WIDTH, IMAGE_QUALITY, 'webp'),
+        # og:image: JPEG, el único formato que leen todos los rastreadores
+        'tarjeta': (MAX_WIDTH, IMAGE_QUALITY, 'jpeg'),
+    }
     
     def __init__(self):
         os.makedirs(self.UPLOAD_FOLDER, exist_ok=True)
+        
+        # Manifiesto en memoria: primeras PAGINA_MAXIMA imágenes y total de la versión vigente
+        self._manifest = None
+        self._manifest_version = None
+        self._manifest_checked_at = 0.0
+        self._manifest_lock = threading.Lock()
     
     def validar_archivo(self, filename):
         """Valida que el archivo sea una imagen permitida"""
@@ -78,49 +417,114 @@ class GaleriaService:
     
     def obtener_contador_imagenes(self):
         """Obtiene el número de imágenes actualmente en la galería"""
-        try:
-            files = os.listdir(self.UPLOAD_FOLDER)
-            return len([f for f in files if f.lower().endswith(tuple(self.ALLOWED_EXTENSIONS))])
-        except Exception:
-            return 0
+        return self._obtener_manifest()[3]
     
     def puede_subir_imagenes(self, cantidad=1):
         """Verifica si se pueden subir más imágenes"""
         actual = self.obtener_contador_imagenes()
         return (actual + cantidad) <= self.MAX_IMAGES
     
-    def optimizar_imagen(self, filepath):
+    def optimizar_imagen(self, filepath, destino=None):
         """
         Redimensiona y comprime la imagen
         Máximo 1200px de ancho, calidad 80%
+        Genera además las variantes de VARIANT_WIDTHS para srcset
+        Retorna la Optimizacion o None si falla
         """
         try:
-            with Image.open(filepath) as img:
-                # Redimensionar si es necesario
-                if img.width > self.MAX_WIDTH:
-                    ratio = self.MAX_WIDTH / img.width
-                    new_height = int(img.height * ratio)
-                    img = img.resize((self.MAX_WIDTH, new_height), Image.Resampling.LANCZOS)
-                
-                # Convertir a RGB si es necesario
-                if img.mode in ("RGBA", "P"):
-                    img = img.convert("RGB")
-                
-                # Guardar optimizada
-                if filepath.lower().endswith('.png'):
-                    img.save(filepath, 'PNG', optimize=True)
-                else:
-                    img.save(filepath, 'JPEG', quality=self.IMAGE_QUALITY, optimize=True)
-            
-            return True
+            resultado = procesador_imagenes.optimizar_imagen(*self._args_optimizacion(filepath, destino))
+            observar_optimizacion(resultado)
+            return resultado
         except Exception as e:
             print(f"Error optimizando imagen: {e}")
-            return False
+            observar_optimizacion(None)
+            return None
+    
+    def generar_variantes(self, filepath):
+        """
+        Genera las variantes de ancho reducido de una imagen ya optimizada.
+        Retorna la lista de anchos generados.
+        """
+        with Image.open(filepath) as img:
+            img.load()
+            return procesador_imagenes.generar_variantes(
+                img, filepath, self.VARIANT_WIDTHS, self.VARIANTS_FOLDER, self.IMAGE_QUALITY
+            )
+    
+    def generar_variantes_faltantes(self):
+        """
+        Genera las variantes que falten a las imágenes de la carpeta
+        (p. ej. las incluidas en el repositorio). No actualiza el índice.
+        Retorna la cantidad de variantes generadas.
+        """
+        existentes = self._escanear_variantes()
+        total = 0
+        for _, filename in self._listar_archivos():
+            filepath = os.path.join(self.UPLOAD_FOLDER, filename)
+            try:
+                with Image.open(filepath) as img:
+                    faltan = [w for w in self.VARIANT_WIDTHS
+                              if w < img.width and w not in existentes.get(filename, ())]
+            except Exception as e:
+                print(f"Error en galería: {filename}: {e}")
+                continue
+            if faltan:
+                total += len(self.generar_variantes(filepath))
+        return total
+    
+    def _args_optimizacion(self, origen, destino=None):
+        """Argumentos (serializables) para procesador_imagenes.optimizar_imagen"""
+        return (origen, destino or origen, self.MAX_WIDTH, self.IMAGE_QUALITY,
+                self.VARIANT_WIDTHS, self.VARIANTS_FOLDER, self.MAX_IMAGE_PIXELS)
+    
+    def nombre_por_contenido(self, digest, filename):
+        """Nombre direccionado por contenido: <hash>.<ext>"""
+        ext = os.path.splitext(secure_filename(filename))[1].lower()
+        return f"{digest[:self.HASH_LENGTH]}{ext}"
+    
+    def _guardar_staging(self, file, staging):
+        """
+        Copia la subida a staging por bloques calculando su SHA-256 al vuelo
+        Lanza ValueError si supera MAX_IMAGE_BYTES
+        """
+        sha = hashlib.sha256()
+        leidos = 0
+        try:
+            with open(staging, 'wb') as out:
+                for chunk in iter(lambda: file.stream.read(self.CHUNK_SIZE), b''):
+                    leidos += len(chunk)
+                    if leidos > self.MAX_IMAGE_BYTES:
+                        raise ValueError(f"Imagen demasiado grande: {file.filename}")
+                    sha.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            # Si open() falló no hay archivo: no tapar el error original
+            with suppress(FileNotFoundError):
+                os.remove(staging)
+            raise
+        return sha.hexdigest()
+    
+    def _preparar_subida(self, file, staging, reservados=()):
+        """
+        Guarda la subida en staging y calcula su nombre por contenido.
+        Retorna (nombre final, SHA-256, duplicada). Si la imagen ya existe
+        se descarta la copia de staging.
+        """
+        digest = self._guardar_staging(file, staging)
+        new_filename = self.nombre_por_contenido(digest, file.filename)
+        
+        if (new_filename in reservados
+                or os.path.exists(os.path.join(self.UPLOAD_FOLDER, new_filename))):
+            os.remove(staging)
+            return new_filename, digest, True
+        
+        return new_filename, digest, False
     
     def subir_imagen(self, file):
         """
         Sube y optimiza una imagen
         Retorna el nombre del archivo o None si falla
+        Si la imagen ya estaba en la galería retorna su nombre sin reprocesarla
         """
         if not file or not self.validar_archivo(file.filename):
             return None
@@ -128,44 +532,349 @@ class GaleriaService:
         if not self.puede_subir_imagenes():
             return None
         
-        # Generar nombre seguro y evitar duplicados
-        filename = secure_filename(file.filename)
-        base, ext = os.path.splitext(filename)
-        counter = 1
-        new_filename = filename
+        os.makedirs(self.STAGING_FOLDER, exist_ok=True)
+        staging = os.path.join(self.STAGING_FOLDER, uuid.uuid4().hex)
+        
+        try:
+            new_filename, digest, duplicada = self._preparar_subida(file, staging)
+        except ValueError as e:
+            print(f"Error subiendo imagen: {e}")
+            return None
+        if duplicada:
+            return new_filename
         
-        while os.path.exists(os.path.join(self.UPLOAD_FOLDER, new_filename)):
-            new_filename = f"{base}_{counter}{ext}"
-            counter += 1
+        try:
+            filepath = os.path.join(self.UPLOAD_FOLDER, new_filename)
+            resultado = self.optimizar_imagen(staging, filepath)
+            if resultado:
+                self._indexar_imagen(resultado, digest)
+                return new_filename
+            return None
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+            self.invalidar_manifest()
+    
+    def encolar_subidas(self, files):
+        """
+        Acepta las imágenes y las optimiza en segundo plano
+        Retorna (TrabajoGaleria o None, número de imágenes duplicadas)
+        """
+        files = [f for f in files if f and self.validar_archivo(f.filename)]
+        disponibles = self.MAX_IMAGES - self.obtener_contador_imagenes()
+        files = files[:max(disponibles, 0)]
+        if not files:
+            return None, 0
         
-        filepath = os.path.join(self.UPLOAD_FOLDER, new_filename)
-        file.save(filepath)
+        os.makedirs(self.STAGING_FOLDER, exist_ok=True)
+        lote = uuid.uuid4().hex
         
-        # Optimizar imagen
-        if self.optimizar_imagen(filepath):
-            return new_filename
+        reservados = set()
+        tareas = []
+        duplicadas = 0
+        for i, file in enumerate(files):
+            # Copia temporal fuera de static/ hasta que el worker la procese
+            staging = os.path.join(self.STAGING_FOLDER, f"{lote}-{i}")
+            try:
+                new_filename, digest, duplicada = self._preparar_subida(file, staging, reservados)
+            except ValueError as e:
+                print(f"Error subiendo imagen: {e}")
+                continue
+            if duplicada:
+                duplicadas += 1
+                continue
+            
+            reservados.add(new_filename)
+            destino = os.path.join(self.UPLOAD_FOLDER, new_filename)
+            tareas.append((self._args_optimizacion(staging, destino), digest))
+        
+        if not tareas:
+            return None, duplicadas
+        
+        procesador = self._procesador()
+        if procesador is not None and not procesador.reservar(len(tareas)):
+            # Cola llena: descartar las copias temporales
+            for args, _ in tareas:
+                os.remove(args[0])
+            return None, duplicadas
+        
+        trabajo = TrabajoGaleriaRepository.create(lote, len(tareas))
+        
+        if procesador is None:
+            # Sin pool (tests / IMAGE_WORKERS = 0): procesar en línea
+            for args, digest in tareas:
+                resultado = self.optimizar_imagen(args[0], args[1])
+                self._registrar_resultado(trabajo.id, args[0], resultado, digest)
         else:
-            # Si falla la optimización, eliminar el archivo
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            app = current_app._get_current_object()
+            for args, digest in tareas:
+                procesador.encolar(self._callback_trabajo(app, trabajo.id, args[0], digest), *args)
+        
+        return trabajo, duplicadas
+    
+    def obtener_trabajo(self, trabajo_id):
+        """Obtiene el estado de un trabajo de subida"""
+        trabajo = TrabajoGaleriaRepository.get_by_id(trabajo_id)
+        if not trabajo:
+            raise ValueError(f"Trabajo no encontrado: {trabajo_id}")
+        return trabajo
+    
+    def _procesador(self):
+        """Pool de procesos o None si el procesamiento es en línea"""
+        if not current_app.config.get('IMAGE_WORKERS'):
             return None
+        from app.services.service_locator import ServiceLocator
+        return ServiceLocator.obtener('procesador')
+    
+    def _callback_trabajo(self, app, trabajo_id, staging, digest):
+        """Callback que registra el resultado de una tarea del pool"""
+        def _callback(future):
+            resultado = None
+            if future.exception() is None:
+                resultado = future.result()
+                observar_optimizacion(resultado)
+            else:
+                print(f"Error optimizando imagen: {future.exception()}")
+                observar_optimizacion(None)
+            with app.app_context():
+                self._registrar_resultado(trabajo_id, staging, resultado, digest)
+        return _callback
+    
+    def _registrar_resultado(self, trabajo_id, staging, resultado, digest):
+        if os.path.exists(staging):
+            os.remove(staging)
+        if resultado:
+            self._indexar_imagen(resultado, digest)
+        self.invalidar_manifest()
+        TrabajoGaleriaRepository.registrar_resultado(trabajo_id, resultado is not None)
+    
+    def _indexar_imagen(self, resultado, digest):
+        """Agrega al índice una imagen recién optimizada"""
+        GaleriaImagenRepository.create(
+            filename=resultado.filename,
+            hash=digest,
+            width=resultado.width,
+            height=resultado.height,
+            tamano_bytes=resultado.bytes_destino,
+            variantes=','.join(str(width) for width in resultado.variantes),
+        )
     
     def obtener_galeria(self):
-        """Obtiene lista de imágenes de la galería, ordenadas por fecha"""
-        try:
-            files = os.listdir(self.UPLOAD_FOLDER)
-            images = [f for f in files if f.lower().endswith(tuple(self.ALLOWED_EXTENSIONS))]
+        """Primera página de la galería (más nuevas primero)"""
+        return self.obtener_pagina().imagenes
+    
+    def obtener_pagina(self, cursor=None, limite=None):
+        """
+        Página de la galería por cursor (más nuevas primero)
+        Retorna PaginaGaleria(imagenes, cursor de la siguiente o None)
+        Lanza ValueError si el cursor no es válido
+        """
+        limite = min(max(limite or self.PAGINA_GALERIA, 1), self.PAGINA_MAXIMA)
+        if cursor:
+            imagenes, _, siguiente = self._leer_pagina(self._decodificar_cursor(cursor), limite)
+            return PaginaGaleria(imagenes, siguiente)
+        
+        # Primera página (inicio, API y dashboard): sale del manifiesto
+        imagenes, cursores, siguiente, _ = self._obtener_manifest()
+        if limite < len(imagenes):
+            return PaginaGaleria(imagenes[:limite], cursores[limite - 1])
+        return PaginaGaleria(imagenes, siguiente)
+    
+    def version_galeria(self):
+        """Versión de la galería (para ETags)"""
+        self._obtener_manifest()
+        with self._manifest_lock:
+            return str(self._manifest_version)
+    
+    def invalidar_manifest(self):
+        """Descarta el manifiesto en memoria; se reconstruye en la próxima lectura"""
+        with self._manifest_lock:
+            self._manifest = None
+            self._manifest_version = None
+    
+    def _obtener_manifest(self):
+        """
+        Devuelve (imágenes, cursores, cursor siguiente, total) de la primera
+        página de PAGINA_MAXIMA imágenes, cacheados.
+        La versión de la galería se comprueba como máximo cada
+        MANIFEST_CHECK_INTERVAL segundos (cambios hechos por otros workers).
+        """
+        with self._manifest_lock:
+            ahora = time.monotonic()
+            if (self._manifest is not None
+                    and ahora - self._manifest_checked_at < self.MANIFEST_CHECK_INTERVAL):
+                return self._manifest
             
-            # Ordenar por fecha (más nueva primero)
-            images.sort(
-                key=lambda x: os.path.getmtime(os.path.join(self.UPLOAD_FOLDER, x)),
-                reverse=True
-            )
+            version = GaleriaImagenRepository.get_version()
+            self._manifest_checked_at = ahora
+            vigente = self._manifest is not None and version == self._manifest_version
+            contar_cache('galeria', vigente)
+            if not vigente:
+                with medir('galeria'):
+                    self._manifest = (
+                        *self._leer_pagina(None, self.PAGINA_MAXIMA),
+                        GaleriaImagenRepository.contar(),
+                    )
+                self._manifest_version = version
             
-            return images[:self.MAX_IMAGES]
-        except Exception as e:
-            print(f"Error en galería: {e}")
-            return []
+            return self._manifest
+    
+    def _leer_pagina(self, antes, limite):
+        """(imágenes, cursor de cada una, cursor de la página siguiente o None)"""
+        filas = GaleriaImagenRepository.get_pagina(antes, limite)
+        hay_mas = len(filas) > limite
+        filas = filas[:limite]
+        cursores = tuple(self._codificar_cursor(imagen) for imagen in filas)
+        imagenes = tuple(self._entrada_manifest(imagen) for imagen in filas)
+        return imagenes, cursores, (cursores[-1] if hay_mas else None)
+    
+    def _codificar_cursor(self, imagen):
+        return f"{imagen.created_at.strftime(self.CURSOR_FECHA)}-{imagen.id}"
+    
+    def _decodificar_cursor(self, cursor):
+        """
+        '<fecha>-<id>' -> (datetime, id)
+        Solo se aceptan cursores con la forma que genera _codificar_cursor
+        y un id de 64 bits: uno mayor desborda el driver de la base (500)
+        """
+        try:
+            texto, _, imagen_id = cursor.partition('-')
+            fecha = datetime.strptime(texto, self.CURSOR_FECHA)
+            imagen_id = int(imagen_id) if imagen_id.isdigit() else 0
+            if fecha.strftime(self.CURSOR_FECHA) != texto or not 0 < imagen_id <= ID_MAXIMO:
+                raise ValueError
+            return fecha, imagen_id
+        except (TypeError, ValueError):
+            raise ValueError(f"Cursor inválido: {cursor}")
+    
+    def indexar_carpeta(self):
+        """
+        Sincroniza el índice con la carpeta: agrega las imágenes sin fila,
+        corrige dimensiones/tamaño/variantes y elimina las filas sin archivo.
+        Retorna (agregadas, actualizadas, eliminadas)
+        """
+        indexadas = {imagen.filename: imagen for imagen in GaleriaImagenRepository.get_todas()}
+        variantes = self._escanear_variantes()
+        nuevas, actualizadas = [], []
+        
+        # De la más vieja a la más nueva: los ids siguen el orden por fecha
+        for mtime, filename in sorted(self._listar_archivos()):
+            filepath = os.path.join(self.UPLOAD_FOLDER, filename)
+            try:
+                with Image.open(filepath) as img:
+                    width, height = img.size
+            except Exception as e:
+                print(f"Error en galería: {filename}: {e}")
+                continue
+            
+            datos = {
+                'width': width,
+                'height': height,
+                'tamano_bytes': os.path.getsize(filepath),
+                'variantes': ','.join(str(w) for w in variantes.get(filename, ())),
+            }
+            imagen = indexadas.pop(filename, None)
+            if imagen is None:
+                datos.update(
+                    filename=filename,
+                    hash=self._hash_archivo(filepath),
+                    created_at=datetime.fromtimestamp(mtime, timezone.utc).replace(tzinfo=None),
+                )
+                nuevas.append(datos)
+            elif any(getattr(imagen, campo) != valor for campo, valor in datos.items()):
+                datos['id'] = imagen.id
+                actualizadas.append(datos)
+        
+        eliminadas = [imagen.id for imagen in indexadas.values()]
+        if nuevas or actualizadas or eliminadas:
+            GaleriaImagenRepository.sincronizar(nuevas, actualizadas, eliminadas)
+            self.invalidar_manifest()
+        return len(nuevas), len(actualizadas), len(eliminadas)
+    
+    def _listar_archivos(self):
+        """[(mtime, filename)] de las imágenes de la carpeta"""
+        archivos = []
+        with os.scandir(self.UPLOAD_FOLDER) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(tuple(self.ALLOWED_EXTENSIONS)) and entry.is_file():
+                    archivos.append((entry.stat().st_mtime, entry.name))
+        return archivos
+    
+    def _hash_archivo(self, filepath):
+        sha = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+    
+    def _escanear_variantes(self):
+        """Agrupa los anchos disponibles por imagen: {'foto.jpg': [320, 640]}"""
+        variantes = {}
+        try:
+            nombres = os.listdir(self.VARIANTS_FOLDER)
+        except FileNotFoundError:
+            return variantes
+        
+        for nombre in nombres:
+            base, ext = os.path.splitext(nombre)
+            base, sep, width = base.rpartition('-')
+            if not sep or not width.endswith('w') or not width[:-1].isdigit():
+                continue
+            variantes.setdefault(base + ext, []).append(int(width[:-1]))
+        
+        for widths in variantes.values():
+            widths.sort()
+        return variantes
+    
+    def _entrada_manifest(self, imagen):
+        """Datos listos para plantilla: url, srcset y sizes"""
+        filename, width, height = imagen.filename, imagen.width, imagen.height
+        base, ext = os.path.splitext(filename)
+        url = self._url_estatica(filename)
+        
+        candidatos = [
+            f"{self._url_estatica(f'variantes/{base}-{w}w{ext}')} {w}w"
+            for w in imagen.anchos_variantes if w < width
+        ]
+        # La original (máx. MAX_WIDTH) cierra el srcset
+        candidatos.append(f"{url} {width}w")
+        
+        return {
+            'filename': filename,
+            'url': url,
+            'thumb': self._url_miniatura(filename, 'panel'),
+            'grande': self._url_miniatura(filename, 'lightbox'),
+            'tarjeta': self._url_miniatura(filename, 'tarjeta'),
+            'srcset': ', '.join(candidatos),
+            'sizes': self._sizes(width, height),
+            'width': width,
+            'height': height,
+        }
+    
+    def _url_estatica(self, ruta):
+        """URL de un archivo de la galería; fuera de una petición (CLI) sin script root"""
+        ruta = f"{self.STATIC_SUBFOLDER}/{ruta}"
+        if has_request_context():
+            return url_for('static', filename=ruta)
+        return f"{current_app.static_url_path}/{ruta}"
+    
+    def _url_miniatura(self, filename, uso):
+        """URL de /img con el ancho, calidad y formato de un uso de USOS_MINIATURA"""
+        ancho, calidad, formato = self.USOS_MINIATURA[uso]
+        parametros = {'w': ancho, 'q': calidad}
+        if formato:
+            parametros['fmt'] = formato
+        if has_request_context():
+            return url_for('main.imagen', filename=filename, **parametros)
+        return f"/img/{filename}?{urlencode(parametros)}"
+    
+    def _sizes(self, width, height):
+        """Atributo sizes: ancho pintado en cada breakpoint, cubriendo la caja"""
+        partes = []
+        for viewport, caja_w, caja_h in self.CAJAS_GALERIA:
+            pintado = max(caja_w, math.ceil(caja_h * width / max(height, 1)))
+            partes.append(f"(max-width: {viewport}px) {pintado}px" if viewport else f"{pintado}px")
+        return ', '.join(partes)
     
     def eliminar_imagen(self, filename):
         """Elimina una imagen de la galería"""
@@ -173,13 +882,64 @@ class GaleriaService:
             return False
         
         filepath = os.path.join(self.UPLOAD_FOLDER, filename)
+        indexada = GaleriaImagenRepository.delete(filename) is not None
         
         if os.path.exists(filepath) and os.path.isfile(filepath):
             try:
                 os.remove(filepath)
+                self._eliminar_variantes(filename)
                 return True
             except Exception as e:
                 print(f"Error eliminando imagen: {e}")
                 return False
+            finally:
+                self.invalidar_manifest()
         
-        return False
+        if indexada:
+            self.invalidar_manifest()
+        return indexada
+    
+    def migrar_a_contenido(self):
+        """
+        Renombra las imágenes antiguas a su nombre por contenido
+        y elimina las que estén duplicadas byte a byte.
+        Retorna (renombradas, duplicadas eliminadas)
+        """
+        renombradas = duplicadas = 0
+        
+        for _, filename in sorted(self._listar_archivos(), reverse=True):
+            if self.HASHED_NAME.match(filename):
+                continue
+            
+            filepath = os.path.join(self.UPLOAD_FOLDER, filename)
+            new_filename = self.nombre_por_contenido(self._hash_archivo(filepath), filename)
+            
+            if os.path.exists(os.path.join(self.UPLOAD_FOLDER, new_filename)):
+                os.remove(filepath)
+                self._eliminar_variantes(filename)
+                duplicadas += 1
+                continue
+            
+            os.rename(filepath, os.path.join(self.UPLOAD_FOLDER, new_filename))
+            self._renombrar_variantes(filename, new_filename)
+            renombradas += 1
+        
+        self.indexar_carpeta()
+        return renombradas, duplicadas
+    
+    def _renombrar_variantes(self, filename, new_filename):
+        """Renombra las variantes responsive de una imagen"""
+        base, ext = os.path.splitext(filename)
+        new_base, new_ext = os.path.splitext(new_filename)
+        for width in self.VARIANT_WIDTHS:
+            path = os.path.join(self.VARIANTS_FOLDER, f"{base}-{width}w{ext}")
+            if os.path.exists(path):
+                os.rename(path, os.path.join(self.VARIANTS_FOLDER, f"{new_base}-{width}w{new_ext}"))
+    
+    def _eliminar_variantes(self, filename):
+        """Elimina las variantes responsive de una imagen"""
+        base, ext = os.path.splitext(filename)
+        for width in self.VARIANT_WIDTHS:
+            path = os.path.join(self.VARIANTS_FOLDER, f"{base}-{width}w{ext}")
+            if os.path.exists(path):
+                os.remove(path)
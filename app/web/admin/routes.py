@@ -1,13 +1,21 @@
 """
 Blueprint de rutas del administrador
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import (
+    Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify,
+    stream_with_context
+)
 from flask_login import login_user, logout_user, login_required, current_user
-from app.services.auth_service import AuthService
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.services.auth_service import AuthService, IntentosExcedidos
 from app.services.service_locator import get_servicio_service, get_galeria_service
+from app.services.servicio_service import ImportacionInvalida
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# Errores de importación que se muestran fila a fila (el resto se resume)
+MAX_ERRORES_MOSTRADOS = 10
+
 
 # ==================== AUTENTICACIÓN ====================
 
@@ -18,7 +26,12 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        user = AuthService.validar_credenciales(username, password)
+        try:
+            user = AuthService.validar_credenciales(username, password, ip=request.remote_addr)
+        except IntentosExcedidos as e:
+            flash(str(e), 'error')
+            return (render_template('admin/login.html'), 429,
+                    {'Retry-After': str(e.retry_after)})
         
         if user:
             login_user(user)
@@ -48,10 +61,19 @@ def dashboard():
     
     servicios = servicio_service.listar_servicios()
     
+    try:
+        galeria = galeria_service.obtener_pagina(request.args.get('galeria'), galeria_service.PAGINA_MAXIMA)
+    except ValueError as e:
+        flash(f'Error: {str(e)}', 'error')
+        galeria = galeria_service.obtener_pagina(None, galeria_service.PAGINA_MAXIMA)
+    
     return render_template(
         'admin/dashboard.html',
         servicios=servicios,
-        gallery_images=galeria_service.obtener_galeria()
+        gallery_images=galeria.imagenes,
+        galeria_siguiente=galeria.siguiente,
+        galeria_total=galeria_service.obtener_contador_imagenes(),
+        galeria_maximo=galeria_service.MAX_IMAGES
     )
 
 
@@ -125,6 +147,56 @@ def eliminar_servicio(servicio_id):
     return redirect(url_for('admin.dashboard'))
 
 
+@admin_bp.route('/servicios/importar', methods=['POST'])
+@login_required
+def importar_servicios():
+    """Importa el catálogo desde un archivo CSV o JSON"""
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        flash('No se seleccionó ningún archivo', 'error')
+        return redirect(url_for('admin.dashboard'))
+    
+    formato = archivo.filename.rsplit('.', 1)[-1].lower()
+    servicio_service = get_servicio_service()
+    
+    try:
+        filas = servicio_service.leer_catalogo(archivo.read(), formato)
+        creados, actualizados = servicio_service.importar_catalogo(filas)
+        flash(f'{creados} servicio(s) creado(s), {actualizados} actualizado(s)', 'success')
+    except ImportacionInvalida as e:
+        flash(f'Error: {str(e)}', 'error')
+        for fila, mensaje in e.errores[:MAX_ERRORES_MOSTRADOS]:
+            flash(f'Fila {fila}: {mensaje}', 'error')
+        if len(e.errores) > MAX_ERRORES_MOSTRADOS:
+            flash(f'... y {len(e.errores) - MAX_ERRORES_MOSTRADOS} error(es) más', 'error')
+    except ValueError as e:
+        flash(f'Error: {str(e)}', 'error')
+    except Exception as e:
+        flash(f'Error inesperado: {str(e)}', 'error')
+    
+    return redirect(url_for('admin.dashboard'))
+
+
+@admin_bp.route('/servicios/exportar', methods=['GET'])
+@login_required
+def exportar_servicios():
+    """Descarga el catálogo completo en CSV o JSON (en streaming)"""
+    formato = request.args.get('formato', 'csv')
+    servicio_service = get_servicio_service()
+    
+    try:
+        contenido = servicio_service.exportar_catalogo(formato)
+    except ValueError as e:
+        flash(f'Error: {str(e)}', 'error')
+        return redirect(url_for('admin.dashboard'))
+    
+    return Response(
+        stream_with_context(contenido),
+        mimetype=servicio_service.FORMATOS_CATALOGO[formato],
+        headers={'Content-Disposition': f'attachment; filename=catalogo.{formato}'}
+    )
+
+
 # ==================== GESTIÓN DE GALERÍA ====================
 
 @admin_bp.route('/galeria/subir', methods=['POST'])
@@ -135,24 +207,37 @@ def subir_galeria():
         flash('No se seleccionó ningún archivo', 'error')
         return redirect(url_for('admin.dashboard'))
     
-    files = request.files.getlist('images')
+    files = [f for f in request.files.getlist('images') if f and f.filename]
     galeria_service = get_galeria_service()
     
-    uploaded = 0
-    for file in files:
-        if file and file.filename:
-            filename = galeria_service.subir_imagen(file)
-            if filename:
-                uploaded += 1
+    trabajo, duplicadas = galeria_service.encolar_subidas(files)
     
-    if uploaded > 0:
-        flash(f'{uploaded} imagen(es) subida(s) y optimizada(s)', 'success')
-    else:
-        flash('No se pudo subir ninguna imagen o límite alcanzado', 'error')
+    if duplicadas:
+        flash(f'{duplicadas} imagen(es) ya estaba(n) en la galería', 'success')
+    
+    if trabajo:
+        flash(f'{trabajo.total} imagen(es) recibida(s), optimizando...', 'success')
+        return redirect(url_for('admin.dashboard', trabajo=trabajo.id))
     
+    if not duplicadas:
+        flash('No se pudo subir ninguna imagen o límite alcanzado', 'error')
     return redirect(url_for('admin.dashboard'))
 
 
+@admin_bp.route('/galeria/trabajos/<trabajo_id>', methods=['GET'])
+@login_required
+def estado_trabajo(trabajo_id):
+    """Estado de un trabajo de subida (consultado por el dashboard)"""
+    galeria_service = get_galeria_service()
+    
+    try:
+        trabajo = galeria_service.obtener_trabajo(trabajo_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    
+    return jsonify(trabajo.to_dict())
+
+
 @admin_bp.route('/galeria/<filename>/eliminar', methods=['GET'])
 @login_required
 def eliminar_galeria(filename):
@@ -165,3 +250,10 @@ def eliminar_galeria(filename):
         flash('Imagen no encontrada', 'error')
     
     return redirect(url_for('admin.dashboard'))
+
+
+@admin_bp.errorhandler(RequestEntityTooLarge)
+def subida_demasiado_grande(error):
+    """La petición supera MAX_CONTENT_LENGTH"""
+    flash('La subida supera el tamaño máximo permitido', 'error')
+    return redirect(url_for('admin.dashboard'))
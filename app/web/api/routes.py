@@ -0,0 +1,214 @@
+"""
+Blueprint de la API JSON (widget de reservas, bot de WhatsApp)
+"""
+import hashlib
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify
+from werkzeug.http import is_resource_modified
+from app.domain.models import ID_MAXIMO, Servicio
+from app.services.agenda_service import SlotNoDisponible
+from app.services.service_locator import (
+    get_servicio_service, get_galeria_service, get_disponibilidad_service, get_reserva_service
+)
+
+api_bp = Blueprint('api', __name__, url_prefix='/api')
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+CAMPOS_SERVICIO = ('id', 'nombre', 'precio', 'precio_centavos', 'descripcion', 'categoria',
+                   'duracion_minutos')
+MAX_HUECOS = 50
+
+
+def _error(mensaje, status=400):
+    return jsonify({'error': mensaje}), status
+
+
+def _hueco_a_dict(hueco):
+    return {'inicio': hueco.inicio.isoformat(timespec='minutes'), 'barbero': hueco.barbero.to_dict()}
+
+
+@api_bp.route('/servicios', methods=['GET'])
+def servicios():
+    """
+    Catálogo paginado por cursor (keyset)
+    ?limit=50        tamaño de página (máx. 200)
+    ?after=<id>      cursor devuelto en 'siguiente'
+    ?categoria=corte filtra por categoría
+    ?fields=id,nombre,precio  campos a devolver
+    """
+    try:
+        limite = min(int(request.args.get('limit', LIMITE_POR_DEFECTO)), LIMITE_MAXIMO)
+        if limite < 1:
+            raise ValueError
+    except ValueError:
+        return _error('limit debe ser un entero positivo')
+    
+    # Un cursor corrupto es un error: devolver la primera página haría que
+    # el cliente recorriera la página 1 en bucle
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+            if not 0 <= after <= ID_MAXIMO:
+                raise ValueError
+        except ValueError:
+            return _error('Cursor inválido')
+    
+    categoria = request.args.get('categoria')
+    if categoria and categoria not in Servicio.CATEGORIA_TIPOS:
+        return _error(f'Categoría inválida: {categoria}')
+    
+    campos = CAMPOS_SERVICIO
+    if request.args.get('fields'):
+        campos = tuple(c.strip() for c in request.args['fields'].split(',') if c.strip())
+        desconocidos = [c for c in campos if c not in CAMPOS_SERVICIO]
+        if desconocidos:
+            return _error(f"Campos desconocidos: {', '.join(desconocidos)}")
+    
+    # Validación condicional antes de leer la página
+    servicio_service = get_servicio_service()
+    version, ultima_modificacion = servicio_service.estado_catalogo()
+    if ultima_modificacion is not None:
+        ultima_modificacion = ultima_modificacion.replace(tzinfo=timezone.utc)
+    
+    etag = hashlib.sha1('|'.join((
+        str(version),
+        request.query_string.decode(),
+    )).encode()).hexdigest()
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=ultima_modificacion):
+        response = jsonify()
+        response.status_code = 304
+        response.set_data(b'')
+    else:
+        pagina, siguiente = servicio_service.paginar_servicios(after, limite, categoria)
+        response = jsonify({
+            'servicios': [
+                {campo: datos[campo] for campo in campos}
+                for datos in (s.to_dict() for s in pagina)
+            ],
+            'siguiente': siguiente,
+        })
+    
+    response.set_etag(etag)
+    if ultima_modificacion is not None:
+        response.last_modified = ultima_modificacion
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@api_bp.route('/galeria', methods=['GET'])
+def galeria():
+    """
+    Galería paginada por cursor, de la imagen más nueva a la más vieja
+    (scroll infinito de la página de inicio)
+    ?limit=12        tamaño de página (máx. 60)
+    ?after=<cursor>  cursor devuelto en 'siguiente'
+    """
+    galeria_service = get_galeria_service()
+    etag = hashlib.sha1('|'.join((
+        galeria_service.version_galeria(),
+        request.query_string.decode(),
+    )).encode()).hexdigest()
+    
+    if not is_resource_modified(request.environ, etag=etag):
+        response = jsonify()
+        response.status_code = 304
+        response.set_data(b'')
+    else:
+        try:
+            pagina = galeria_service.obtener_pagina(
+                request.args.get('after'), request.args.get('limit', type=int)
+            )
+        except ValueError as e:
+            return _error(str(e))
+        response = jsonify({
+            'imagenes': list(pagina.imagenes),
+            'siguiente': pagina.siguiente,
+            'total': galeria_service.obtener_contador_imagenes(),
+        })
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@api_bp.route('/disponibilidad', methods=['GET'])
+def disponibilidad():
+    """
+    Próximos huecos libres para un servicio
+    ?servicio=<id>   servicio a reservar (define la duración)
+    ?n=5             cantidad de huecos (máx. 50)
+    ?barbero=<id>    limita a un barbero
+    """
+    servicio_id = request.args.get('servicio', type=int)
+    barbero_id = request.args.get('barbero', type=int)
+    cantidad = request.args.get('n', 5, type=int)
+    if servicio_id is None:
+        return _error('servicio es obligatorio')
+    # Fuera de 64 bits la base de datos falla con OverflowError
+    if not all(0 < i <= ID_MAXIMO for i in (servicio_id, barbero_id) if i is not None):
+        return _error('servicio y barbero deben ser identificadores válidos')
+    
+    try:
+        huecos = get_disponibilidad_service().proximos_huecos(
+            servicio_id,
+            cantidad=min(max(cantidad, 1), MAX_HUECOS),
+            barbero_id=barbero_id
+        )
+    except ValueError as e:
+        return _error(str(e), 404)
+    
+    response = jsonify({'huecos': [_hueco_a_dict(h) for h in huecos]})
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@api_bp.route('/reservas', methods=['POST'])
+def reservar():
+    """
+    Reserva un hueco
+    JSON: {"barbero": 1, "servicio": 3, "inicio": "2025-06-07T10:30",
+           "nombre": "Cliente", "telefono": "+53..."}
+    409 con 'alternativas' si otro cliente lo tomó primero
+    """
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return _error('Se esperaba un objeto JSON')
+    if not all(datos.get(campo) for campo in ('barbero', 'servicio', 'inicio', 'nombre')):
+        return _error('barbero, servicio, inicio y nombre son obligatorios')
+    
+    nombre, telefono = datos.get('nombre'), datos.get('telefono')
+    try:
+        barbero_id = int(datos.get('barbero'))
+        servicio_id = int(datos.get('servicio'))
+        inicio = datetime.fromisoformat(str(datos.get('inicio')))
+        if not isinstance(nombre, str) or not isinstance(telefono, (str, type(None))):
+            raise TypeError
+        # Fuera de 64 bits la base de datos falla con OverflowError
+        if not (0 < barbero_id <= ID_MAXIMO and 0 < servicio_id <= ID_MAXIMO):
+            raise ValueError
+    except (TypeError, ValueError):
+        return _error('barbero y servicio deben ser enteros, inicio una fecha ISO 8601 '
+                      'y nombre y telefono texto')
+    
+    reservas = get_reserva_service()
+    try:
+        cita = reservas.reservar(
+            barbero_id,
+            servicio_id,
+            reservas.disponibilidad.hora_local(inicio),
+            nombre,
+            telefono,
+        )
+    except SlotNoDisponible as e:
+        return jsonify({
+            'error': str(e),
+            'alternativas': [_hueco_a_dict(h) for h in e.alternativas],
+        }), 409
+    except ValueError as e:
+        # Mensajes propios del servicio (barbero inexistente, fuera de horario...)
+        return _error(str(e))
+    
+    return jsonify(cita.to_dict()), 201
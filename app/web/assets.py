@@ -0,0 +1,121 @@
+"""
+Empaquetado de CSS: une la cadena de @import en un único archivo con hash
+"""
+import hashlib
+import json
+import os
+import posixpath
+import re
+from flask import current_app
+
+
+CSS_ENTRADA = 'css/style.css'
+MANIFEST = 'css/manifest.json'
+# style.<hash>.css: mismo patrón que reconoce la caché inmutable
+BUNDLE_NAME = re.compile(r'^style\.[0-9a-f]{12}\.css$')
+HASH_LENGTH = 12
+
+IMPORT = re.compile(r"""@import\s+(?:url\(\s*)?['"]?([^'")\s]+)['"]?\s*\)?\s*;""")
+URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+# Cadenas y comentarios en un solo patrón para no tocar el contenido de las cadenas
+TOKENS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)""", re.S)
+
+
+def _resolver_imports(static_folder, ruta, visitados):
+    """Lee un CSS sustituyendo sus @import (en orden) por el contenido del módulo"""
+    if ruta in visitados:
+        return ''
+    visitados.add(ruta)
+    
+    with open(os.path.join(static_folder, ruta), encoding='utf-8') as f:
+        css = f.read()
+    
+    carpeta = posixpath.dirname(ruta)
+    
+    def _url_relativa(match):
+        # Las url() relativas se reescriben respecto a la carpeta del bundle
+        comilla, url = match.groups()
+        if url.startswith(('/', 'data:', 'http:', 'https:', '#')):
+            return match.group(0)
+        nueva = posixpath.relpath(posixpath.join(carpeta, url), posixpath.dirname(CSS_ENTRADA))
+        return f"url({comilla}{nueva}{comilla})"
+    
+    def _importar(match):
+        modulo = posixpath.normpath(posixpath.join(carpeta, match.group(1)))
+        return _resolver_imports(static_folder, modulo, visitados)
+    
+    # Los @import se resuelven respecto a este archivo: sus rutas no pasan por
+    # _url_relativa, y el contenido importado ya viene reescrito
+    partes, posicion = [], 0
+    for match in IMPORT.finditer(css):
+        partes.append(URL.sub(_url_relativa, css[posicion:match.start()]))
+        partes.append(_importar(match))
+        posicion = match.end()
+    partes.append(URL.sub(_url_relativa, css[posicion:]))
+    return ''.join(partes)
+
+
+def minificar_css(css):
+    """Quita comentarios y espacios sobrantes sin alterar cadenas ni url()"""
+    cadenas = []
+    
+    def _apartar(match):
+        if match.group(2):
+            return ''
+        cadenas.append(match.group(1))
+        return f"\0{len(cadenas) - 1}\0"
+    
+    css = TOKENS.sub(_apartar, css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css).replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda m: cadenas[int(m.group(1))], css)
+
+
+def construir_css(static_folder):
+    """
+    Genera css/style.<hash>.css y el manifest que lo asocia a css/style.css.
+    Elimina los bundles anteriores. Retorna la ruta relativa del bundle.
+    """
+    css = minificar_css(_resolver_imports(static_folder, CSS_ENTRADA, set()))
+    digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:HASH_LENGTH]
+    bundle = posixpath.join(posixpath.dirname(CSS_ENTRADA), f"style.{digest}.css")
+    
+    carpeta = os.path.join(static_folder, posixpath.dirname(CSS_ENTRADA))
+    for nombre in os.listdir(carpeta):
+        if BUNDLE_NAME.match(nombre) and nombre != posixpath.basename(bundle):
+            os.remove(os.path.join(carpeta, nombre))
+    
+    with open(os.path.join(static_folder, bundle), 'w', encoding='utf-8') as f:
+        f.write(css)
+    with open(os.path.join(static_folder, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump({CSS_ENTRADA: bundle}, f)
+    
+    return bundle
+
+
+def cargar_manifest(static_folder):
+    """Lee el manifest; ignora entradas cuyo bundle no exista"""
+    try:
+        with open(os.path.join(static_folder, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        origen: bundle for origen, bundle in manifest.items()
+        if os.path.isfile(os.path.join(static_folder, bundle))
+    }
+
+
+def registrar_assets(app):
+    """
+    Hace que url_for('static', filename='css/style.css') apunte al bundle con hash.
+    En modo debug se sirven los módulos sin empaquetar.
+    """
+    app.extensions['assets'] = {} if app.debug else cargar_manifest(app.static_folder)
+    
+    @app.url_defaults
+    def resolver_bundle(endpoint, values):
+        if endpoint == 'static':
+            bundle = current_app.extensions['assets'].get(values.get('filename'))
+            if bundle:
+                values['filename'] = bundle
@@ -1,27 +1,76 @@
 """
 Blueprint de rutas principales (público)
 """
-from flask import Blueprint, render_template
-from app.services.service_locator import get_servicio_service
+from flask import Blueprint, abort, render_template, request, send_file
+from werkzeug.exceptions import ServiceUnavailable
+from app.domain.models import Servicio
+from app.services.miniatura_service import MiniaturaEnCurso
+from app.services.servicio_service import GaleriaService
+from app.services.service_locator import get_servicio_service, get_miniatura_service
+from app.web.page_cache import cache_publico
+from app.web.static_cache import IMMUTABLE_CACHE_CONTROL
 
 main_bp = Blueprint('main', __name__)
 
 
 @main_bp.route('/')
+@cache_publico
 def index():
     """Página de inicio"""
     return render_template('index.html')
 
 
 @main_bp.route('/servicios')
+@cache_publico
 def servicios():
     """Página de servicios"""
     servicio_service = get_servicio_service()
-    servicios = servicio_service.listar_servicios()
-    return render_template('servicios.html', servicios=servicios)
+    categorias = servicio_service.listar_agrupados()
+    return render_template(
+        'servicios.html',
+        categorias=categorias,
+        titulos=Servicio.CATEGORIA_TITULOS
+    )
+
+
+@main_bp.route('/img/<filename>')
+def imagen(filename):
+    """
+    Imagen de la galería redimensionada bajo demanda
+    ?w=320     ancho máximo en px (MiniaturaService.ANCHOS: 320, 360, 640, 960, 1200)
+    ?q=80      calidad (MiniaturaService.CALIDADES: 60, 80)
+    ?fmt=webp  formato: jpeg | webp | png (por defecto, el del original)
+    """
+    miniatura_service = get_miniatura_service()
+    
+    # Dos intentos: la miniatura puede ser desalojada entre obtenerla y abrirla
+    for _ in range(2):
+        try:
+            ruta = miniatura_service.obtener(
+                filename, request.args.get('w'), request.args.get('q'), request.args.get('fmt')
+            )
+            response = send_file(ruta, mimetype=miniatura_service.mimetype(ruta), conditional=True)
+            break
+        except MiniaturaEnCurso as e:
+            # Otra petición la sigue generando: mejor reintentar que colgar el worker
+            raise ServiceUnavailable(str(e), retry_after=e.retry_after)
+        except ValueError as e:
+            abort(400, str(e))
+        except FileNotFoundError:
+            continue
+    else:
+        abort(404)
+    
+    if GaleriaService.HASHED_NAME.match(filename):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+    return response
 
 
 @main_bp.route('/contacto')
+@cache_publico
 def contacto():
     """Página de contacto"""
     return render_template('contacto.html')
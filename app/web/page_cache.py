@@ -0,0 +1,98 @@
+"""
+Caché de páginas públicas con ETag / 304
+El HTML de main_bp solo depende del catálogo, de la galería y de las
+plantillas desplegadas, así que esos tres datos forman la ETag.
+"""
+import hashlib
+import os
+import threading
+from functools import wraps
+from flask import current_app, request, make_response
+from flask_login import current_user
+from app.core.metricas import contar_cache
+from app.services.service_locator import get_servicio_service, get_galeria_service
+
+
+_paginas = {}
+_paginas_lock = threading.Lock()
+_firma_despliegue = None
+
+
+def _calcular_firma_despliegue(app):
+    """
+    Huella de plantillas y estáticos (ruta, tamaño, mtime).
+    Es igual en todos los workers y cambia con cada despliegue.
+    """
+    sha = hashlib.sha1()
+    for carpeta in (app.template_folder, app.static_folder):
+        for raiz, dirs, archivos in os.walk(carpeta):
+            dirs[:] = sorted(d for d in dirs if d != 'gallery')
+            for nombre in sorted(archivos):
+                stat = os.stat(os.path.join(raiz, nombre))
+                sha.update(f"{raiz}/{nombre}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return sha.hexdigest()
+
+
+def firma_despliegue():
+    global _firma_despliegue
+    if _firma_despliegue is None:
+        _firma_despliegue = _calcular_firma_despliegue(current_app)
+    return _firma_despliegue
+
+
+def calcular_etag(endpoint, view_args):
+    """ETag fuerte de una página pública"""
+    partes = (
+        endpoint,
+        repr(sorted(view_args.items())),
+        str(get_servicio_service().version_catalogo()),
+        get_galeria_service().version_galeria(),
+        firma_despliegue(),
+    )
+    return hashlib.sha1('|'.join(partes).encode()).hexdigest()
+
+
+def cache_publico(view):
+    """
+    Decorador para vistas públicas:
+    - Usuarios autenticados: sin caché (el header muestra el enlace Admin)
+    - If-None-Match coincidente: 304 sin renderizar
+    - En otro caso se sirve el HTML cacheado para esa ETag o se renderiza
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or current_user.is_authenticated:
+            return view(*args, **kwargs)
+        
+        etag = calcular_etag(request.endpoint, request.view_args or {})
+        
+        if request.if_none_match.contains(etag):
+            contar_cache('paginas', True)
+            response = make_response('', 304)
+        else:
+            clave = (request.endpoint, tuple(sorted((request.view_args or {}).items())))
+            with _paginas_lock:
+                cacheada = _paginas.get(clave)
+            
+            contar_cache('paginas', bool(cacheada and cacheada[0] == etag))
+            if cacheada and cacheada[0] == etag:
+                response = make_response(cacheada[1])
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                with _paginas_lock:
+                    _paginas[clave] = (etag, response.get_data())
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, no-cache'
+        response.vary.add('Cookie')
+        return response
+    
+    return wrapper
+
+
+def limpiar_cache_paginas():
+    """Vacía la caché de páginas del proceso"""
+    with _paginas_lock:
+        _paginas.clear()
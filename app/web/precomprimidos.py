@@ -0,0 +1,111 @@
+"""
+Estáticos precomprimidos: .br y .gz generados en el build y elegidos según Accept-Encoding
+"""
+import gzip
+import mimetypes
+import os
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli solo se generan .gz
+    brotli = None
+
+
+EXTENSIONES_COMPRIMIBLES = {'.css', '.js', '.svg', '.json', '.txt', '.xml', '.map'}
+# Por debajo de este tamaño la compresión no compensa
+TAMANO_MINIMO = 256
+# Orden de preferencia: (codificación de Accept-Encoding, sufijo del archivo)
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def es_comprimible(filename):
+    return os.path.splitext(filename)[1].lower() in EXTENSIONES_COMPRIMIBLES
+
+
+def _comprimir(datos, sufijo):
+    if sufijo == '.br':
+        return brotli.compress(datos, quality=11)
+    return gzip.compress(datos, compresslevel=9, mtime=0)
+
+
+def comprimir_estaticos(static_folder):
+    """
+    Escribe los hermanos .br/.gz de los estáticos comprimibles que estén desactualizados
+    y elimina los que ya no tienen original. Retorna (generados, eliminados).
+    """
+    sufijos = [sufijo for _, sufijo in CODIFICACIONES if sufijo != '.br' or brotli]
+    generados = eliminados = 0
+    
+    for raiz, _, archivos in os.walk(static_folder):
+        for nombre in archivos:
+            ruta = os.path.join(raiz, nombre)
+            base, sufijo = os.path.splitext(ruta)
+            
+            if sufijo in ('.br', '.gz'):
+                if not os.path.exists(base):
+                    os.remove(ruta)
+                    eliminados += 1
+                continue
+            
+            if not es_comprimible(nombre) or os.path.getsize(ruta) < TAMANO_MINIMO:
+                continue
+            
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+            
+            for sufijo in sufijos:
+                destino = ruta + sufijo
+                if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(ruta):
+                    continue
+                comprimido = _comprimir(datos, sufijo)
+                if len(comprimido) >= len(datos):
+                    continue
+                with open(destino, 'wb') as f:
+                    f.write(comprimido)
+                generados += 1
+    
+    return generados, eliminados
+
+
+def _variante_precomprimida(filename):
+    """Retorna (codificación, archivo) del mejor hermano aceptado, o None"""
+    aceptadas = request.accept_encodings
+    original = safe_join(current_app.static_folder, filename)
+    if original is None or not os.path.isfile(original):
+        return None
+    
+    for codificacion, sufijo in CODIFICACIONES:
+        if not aceptadas[codificacion]:
+            continue
+        ruta = original + sufijo
+        # Un hermano más viejo que el original está desactualizado
+        if os.path.isfile(ruta) and os.path.getmtime(ruta) >= os.path.getmtime(original):
+            return codificacion, filename + sufijo
+    return None
+
+
+def registrar_precomprimidos(app):
+    """Sustituye la vista 'static' por una que negocia Accept-Encoding"""
+    
+    def servir_estatico(filename):
+        if not es_comprimible(filename):
+            return app.send_static_file(filename)
+        
+        variante = _variante_precomprimida(filename)
+        if variante is None:
+            response = app.send_static_file(filename)
+        else:
+            codificacion, archivo = variante
+            response = send_from_directory(
+                app.static_folder, archivo,
+                mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                max_age=app.get_send_file_max_age(filename),
+            )
+            response.headers['Content-Encoding'] = codificacion
+        
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    app.view_functions['static'] = servir_estatico
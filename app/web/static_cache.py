@@ -0,0 +1,33 @@
+"""
+Cabeceras de caché para archivos estáticos
+"""
+import posixpath
+from flask import request
+from app.services.servicio_service import GaleriaService
+from app.web.assets import BUNDLE_NAME
+
+
+# Un año: el contenido de una URL con hash nunca cambia
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def es_recurso_inmutable(filename):
+    """Indica si un archivo estático tiene nombre direccionado por contenido"""
+    carpeta, nombre = posixpath.split(filename)
+    if carpeta in ('images/gallery', 'images/gallery/variantes'):
+        return GaleriaService.HASHED_NAME.match(nombre) is not None
+    if carpeta == 'css':
+        return BUNDLE_NAME.match(nombre) is not None
+    return False
+
+
+def registrar_cache_estaticos(app):
+    """Añade Cache-Control inmutable a los estáticos con hash en el nombre"""
+    
+    @app.after_request
+    def cache_inmutable(response):
+        if (request.endpoint == 'static'
+                and response.status_code in (200, 304)
+                and es_recurso_inmutable(request.view_args.get('filename', ''))):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,181 @@
+"""
+Prueba de la caché de miniaturas (/img/<nombre>)
+    
+    python benchmarks/miniaturas.py [--hilos 32] [--procesos 4]
+
+1) Ráfaga de peticiones idénticas desde muchos hilos: debe haber un solo encode
+2) La misma ráfaga repartida en varios procesos (workers): un solo encode
+3) Presupuesto de bytes: pidiendo todos los anchos permitidos la caché no lo
+   supera y conserva las miniaturas usadas más recientemente
+Sale con código 1 si alguna comprobación falla.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Agregar la raíz del proyecto al PATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from app.core.factory import create_app
+from app.services import procesador_imagenes
+from app.services.miniatura_service import MiniaturaService
+from app.services.service_locator import ServiceLocator
+
+
+ORIGINAL = '0123456789abcdef.jpg'
+
+# Encodes realizados (compartido entre procesos)
+_encodes = multiprocessing.Value('i', 0)
+_redimensionar = procesador_imagenes.redimensionar
+
+
+def _redimensionar_contando(*args, **kwargs):
+    with _encodes.get_lock():
+        _encodes.value += 1
+    return _redimensionar(*args, **kwargs)
+
+
+procesador_imagenes.redimensionar = _redimensionar_contando
+
+
+def preparar(carpeta):
+    """App de testing con la galería y la caché en carpetas temporales"""
+    origen = os.path.join(carpeta, 'galeria')
+    os.makedirs(origen)
+    Image.effect_noise((3000, 2000), 64).convert('RGB').save(
+        os.path.join(origen, ORIGINAL), 'JPEG', quality=95
+    )
+    
+    app = create_app('testing')
+    app.config['IMAGE_CACHE_DIR'] = os.path.join(carpeta, 'cache')
+    clase = type('MiniaturaBenchmark', (MiniaturaService,), {'ORIGEN_FOLDER': origen})
+    ServiceLocator.registrar('miniaturas', clase())
+    return app
+
+
+def rafaga(app, url, hilos, barrera=None):
+    """`hilos` peticiones simultáneas a `url`; retorna (estados, latencias en ms)"""
+    barrera = barrera or threading.Barrier(hilos)
+    estados, latencias = [], []
+    candado = threading.Lock()
+    
+    def cliente():
+        client = app.test_client()
+        barrera.wait()
+        inicio = time.perf_counter()
+        status = client.get(url).status_code
+        with candado:
+            estados.append(status)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+    
+    hilos_ = [threading.Thread(target=cliente) for _ in range(hilos)]
+    for hilo in hilos_:
+        hilo.start()
+    for hilo in hilos_:
+        hilo.join()
+    return estados, latencias
+
+
+def _proceso(app, url, hilos, barrera, salida):
+    estados, _ = rafaga(app, url, hilos, barrera)
+    salida.put(estados)
+
+
+def comprobar(nombre, estados, esperados_ok, fallos):
+    encodes = _encodes.value
+    ok = estados.count(200)
+    print(f"  {nombre:<40} {ok}/{esperados_ok} OK, {encodes} encode(s)")
+    if ok != esperados_ok or encodes != 1:
+        fallos.append(nombre)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hilos', type=int, default=32)
+    parser.add_argument('--procesos', type=int, default=4)
+    args = parser.parse_args()
+    
+    carpeta = tempfile.mkdtemp(prefix='aptbarber-miniaturas-')
+    fallos = []
+    try:
+        app = preparar(carpeta)
+        print("Agrupación de peticiones idénticas")
+        
+        # 1) Hilos de un mismo worker
+        _encodes.value = 0
+        estados, latencias = rafaga(app, f'/img/{ORIGINAL}?w=640&fmt=webp', args.hilos)
+        comprobar(f"{args.hilos} hilos", estados, args.hilos, fallos)
+        print(f"  {'latencia mediana / máxima':<40} {statistics.median(latencias):.1f} / "
+              f"{max(latencias):.1f} ms")
+        
+        # 2) Varios workers (procesos) con varios hilos cada uno
+        _encodes.value = 0
+        contexto = multiprocessing.get_context('fork')
+        hilos = max(args.hilos // args.procesos, 1)
+        barrera = contexto.Barrier(args.procesos * hilos)
+        salida = contexto.Queue()
+        procesos = [
+            contexto.Process(target=_proceso, args=(app, f'/img/{ORIGINAL}?w=320', hilos,
+                                                    barrera, salida))
+            for _ in range(args.procesos)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        estados = [status for _ in procesos for status in salida.get(timeout=60)]
+        for proceso in procesos:
+            proceso.join()
+        comprobar(f"{args.procesos} procesos x {hilos} hilos", estados, args.procesos * hilos, fallos)
+        
+        # Acierto en caché
+        client = app.test_client()
+        inicio = time.perf_counter()
+        for _ in range(100):
+            client.get(f'/img/{ORIGINAL}?w=640&fmt=webp')
+        print(f"  {'acierto en caché':<40} {(time.perf_counter() - inicio) * 10:.2f} ms")
+        
+        # 3) Presupuesto: el doble de la miniatura más grande, con la caché vacía;
+        #    se piden todas las combinaciones JPEG/WebP de la más grande a la más chica
+        print("Presupuesto de la caché (LRU)")
+        servicio = ServiceLocator.obtener('miniaturas')
+        anchos = sorted(MiniaturaService.ANCHOS, reverse=True)
+        with app.app_context():
+            presupuesto = 2 * max(
+                os.path.getsize(servicio.obtener(ORIGINAL, width, None, 'jpeg')) for width in anchos
+            )
+            app.config['IMAGE_CACHE_BYTES'] = presupuesto
+            servicio.limpiar(0)
+        
+        urls = [f'/img/{ORIGINAL}?w={width}&fmt={fmt}' for fmt in ('jpeg', 'webp') for width in anchos]
+        for url in urls:
+            client.get(url)
+        ultima = urls[-1]
+        
+        cache = app.config['IMAGE_CACHE_DIR']
+        archivos = [n for n in os.listdir(cache) if not n.startswith('.')]
+        total = sum(os.path.getsize(os.path.join(cache, n)) for n in archivos)
+        print(f"  {len(archivos)} miniatura(s), {total} de {presupuesto} bytes")
+        if total > presupuesto:
+            fallos.append('presupuesto superado')
+        _encodes.value = 0
+        client.get(ultima)
+        if _encodes.value:
+            fallos.append('la miniatura más reciente fue desalojada')
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+    
+    if fallos:
+        print(f"✗ Fallos: {', '.join(fallos)}")
+        return 1
+    print("✓ Un solo encode por ráfaga y caché dentro del presupuesto")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Prueba de estrés de reservas concurrentes
+    
+    python benchmarks/reservas.py [--hilos 32] [--intentos 20]
+
+Muchos hilos intentan reservar los mismos huecos de un sábado por la mañana,
+primero contra SQLite en modo WAL (archivo temporal) y después contra el
+sustituto en memoria. Sale con código 1 si hay dobles reservas, si el bitmap
+no coincide con las citas o si alguna petición falla con un error inesperado.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Base de datos en archivo: SQLite en memoria no admite escrituras concurrentes
+_carpeta = tempfile.mkdtemp(prefix='aptbarber-reservas-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_carpeta, 'reservas.db')}"
+
+# Agregar la raíz del proyecto al PATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.factory import create_app
+from app.domain.models import AgendaDia, Appointment, Barbero, db
+from app.services.agenda_service import AgendaEnMemoria, ReservaService, SlotNoDisponible
+
+
+BARBEROS = 3
+SERVICIO_ID = 3  # Corte + Barba: 60 minutos
+# Inicios disputados: sábado de 9:00 a 11:45
+INICIOS = [timedelta(minutes=15 * i) for i in range(12)]
+
+
+def proximo_sabado(ahora):
+    dias = (5 - ahora.weekday()) % 7 or 7
+    return datetime.combine(ahora.date() + timedelta(days=dias), AgendaDia.APERTURA)
+
+
+def estresar(app, crear_servicio, hilos, intentos, sabado):
+    """Lanza `hilos` clientes; retorna (reservas, conflictos, errores, latencias en ms)"""
+    resultados = {'ok': 0, 'conflicto': 0, 'errores': [], 'latencias': []}
+    candado = threading.Lock()
+    barrera = threading.Barrier(hilos)
+    
+    def cliente(n):
+        rng = random.Random(n)
+        with app.app_context():
+            servicio = crear_servicio()
+            barrera.wait()
+            for i in range(intentos):
+                inicio = sabado + rng.choice(INICIOS)
+                t = time.perf_counter()
+                try:
+                    servicio.reservar(rng.randint(1, BARBEROS), SERVICIO_ID, inicio, f"Cliente {n}-{i}")
+                    clave = 'ok'
+                except SlotNoDisponible as e:
+                    clave = 'conflicto'
+                    assert e.alternativas is not None
+                except Exception as e:
+                    clave = None
+                    with candado:
+                        resultados['errores'].append(repr(e))
+                ms = (time.perf_counter() - t) * 1000
+                with candado:
+                    if clave:
+                        resultados[clave] += 1
+                    resultados['latencias'].append(ms)
+            db.session.remove()
+    
+    threads = [threading.Thread(target=cliente, args=(n,)) for n in range(hilos)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    resultados['segundos'] = time.perf_counter() - inicio
+    return resultados
+
+
+def verificar(citas, bitmaps):
+    """Las citas confirmadas no se solapan y reconstruyen exactamente el bitmap"""
+    problemas = []
+    reconstruido = {}
+    for cita in citas:
+        if cita.estado != 'confirmada':
+            continue
+        clave = (cita.barbero_id, cita.fecha)
+        mascara = AgendaDia.mascara(cita.slot_inicio, cita.slots)
+        if reconstruido.get(clave, 0) & mascara:
+            problemas.append(f"Doble reserva: barbero {cita.barbero_id} slot {cita.slot_inicio}")
+        reconstruido[clave] = reconstruido.get(clave, 0) | mascara
+    
+    for clave in set(reconstruido) | set(bitmaps):
+        if reconstruido.get(clave, 0) != bitmaps.get(clave, 0):
+            problemas.append(f"Bitmap inconsistente en {clave}")
+    return problemas
+
+
+def informar(nombre, resultados, problemas):
+    latencias = sorted(resultados['latencias'])
+    p95 = latencias[int(len(latencias) * 0.95) - 1] if latencias else 0
+    print(f"{nombre}")
+    print(f"  reservas {resultados['ok']}, conflictos {resultados['conflicto']}, "
+          f"errores {len(resultados['errores'])} en {resultados['segundos']:.2f} s")
+    print(f"  latencia mediana {statistics.median(latencias or [0]):.2f} ms, p95 {p95:.2f} ms")
+    for error in sorted(set(resultados['errores']))[:5]:
+        print(f"  ✗ {error}")
+    for problema in problemas[:5]:
+        print(f"  ✗ {problema}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hilos', type=int, default=32)
+    parser.add_argument('--intentos', type=int, default=20)
+    args = parser.parse_args()
+    
+    app = create_app('development')
+    with app.app_context():
+        while Barbero.query.count() < BARBEROS:
+            db.session.add(Barbero(nombre=f"Barbero {Barbero.query.count() + 1}"))
+            db.session.commit()
+        sabado = proximo_sabado(ReservaService().disponibilidad.ahora())
+    
+    fallos = 0
+    
+    # 1) SQLite WAL: UPDATE condicional sobre agenda_dia
+    resultados = estresar(app, ReservaService, args.hilos, args.intentos, sabado)
+    with app.app_context():
+        bitmaps = {(a.barbero_id, a.fecha): a.ocupados for a in AgendaDia.query.all()}
+        problemas = verificar(Appointment.query.all(), bitmaps)
+    informar(f"SQLite WAL ({args.hilos} hilos x {args.intentos})", resultados, problemas)
+    fallos += len(problemas) + len(resultados['errores'])
+    
+    # 2) Sustituto en memoria con el mismo contrato
+    agenda = AgendaEnMemoria()
+    resultados = estresar(app, lambda: ReservaService(agenda), args.hilos, args.intentos, sabado)
+    problemas = verificar(agenda.citas(), dict(agenda._dias))
+    informar(f"En memoria ({args.hilos} hilos x {args.intentos})", resultados, problemas)
+    fallos += len(problemas) + len(resultados['errores'])
+    
+    if fallos:
+        print("✗ La reserva concurrente no es segura")
+        return 1
+    print("✓ Sin dobles reservas ni errores")
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        codigo = main()
+    finally:
+        shutil.rmtree(_carpeta, ignore_errors=True)
+    sys.exit(codigo)
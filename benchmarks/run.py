@@ -0,0 +1,267 @@
+"""
+Micro-benchmarks de servicios y repositorios + presupuestos de consultas SQL
+    
+    python benchmarks/run.py            # tamaños completos
+    python benchmarks/run.py --rapido   # tamaños pequeños (CI)
+
+Se ejecuta con TestingConfig (SQLite en memoria). Sale con código 1 si alguna
+ruta supera su presupuesto de consultas: un N+1 rompe el build.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Agregar la raíz del proyecto al PATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+from PIL import Image
+from sqlalchemy import event
+from app.core.factory import create_app
+from app.domain.models import GaleriaImagen, Servicio, db
+from app.domain.repositories import ServicioRepository, VersionRepository
+from app.services import procesador_imagenes
+from app.services.auth_service import AuthService
+from app.services.servicio_service import ServicioService, GaleriaService
+from app.services.service_locator import get_galeria_service
+from app.web.page_cache import limpiar_cache_paginas
+
+
+CATALOGOS = (10, 100, 1000, 10000)
+GALERIAS = (10, 100, 1000, 5000)
+CATALOGOS_RAPIDO = (10, 1000)
+GALERIAS_RAPIDO = (10, 500)
+
+# Consultas SQL máximas por petición, en frío (sin caché de páginas, manifiesto
+# de galería ni identidades) y en caliente. Deben cumplirse con cualquier
+# tamaño de catálogo.
+PRESUPUESTOS = {
+    '/': (4, 1),
+    '/servicios': (6, 1),
+    '/api/servicios': (2, 2),
+    '/api/servicios?categoria=extra&fields=id,precio': (2, 2),
+    '/api/galeria': (3, 1),
+    '/admin/': (5, 1),
+}
+
+
+# ==================== UTILIDADES ====================
+
+class ContadorConsultas:
+    """Cuenta las sentencias SQL ejecutadas por el motor"""
+    
+    def __init__(self, engine):
+        self.total = 0
+        event.listen(engine, 'before_cursor_execute', self._contar)
+    
+    def _contar(self, *args):
+        self.total += 1
+    
+    def medir(self, fn):
+        inicio = self.total
+        fn()
+        return self.total - inicio
+
+
+def medir(fn, repeticiones=5):
+    """Mediana en milisegundos de `repeticiones` ejecuciones de fn()"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def informar(nombre, tamano, ms):
+    print(f"  {nombre:<34} n={tamano:<6} {ms:>9.2f} ms")
+
+
+# ==================== DATOS SINTÉTICOS ====================
+
+def generar_catalogo(cantidad):
+    """Reemplaza el catálogo por `cantidad` servicios sintéticos"""
+    Servicio.query.delete()
+    filas = []
+    for i in range(cantidad):
+        centavos = (10 + i % 90) * 100000
+        filas.append({
+            'nombre': f"Servicio {i}",
+            'precio': f"{centavos // 100:,}".replace(',', '.'),
+            'precio_centavos': centavos,
+            'descripcion': f"Descripción del servicio sintético {i}",
+            'categoria': Servicio.CATEGORIA_TIPOS[i % len(Servicio.CATEGORIA_TIPOS)],
+            'is_active': i % 10 != 0,
+        })
+    db.session.bulk_insert_mappings(Servicio, filas)
+    VersionRepository.incrementar(ServicioRepository.VERSION)
+    db.session.commit()
+
+
+def generar_galeria(carpeta, cantidad):
+    """Crea `cantidad` JPEG pequeños con nombre por contenido"""
+    os.makedirs(os.path.join(carpeta, 'variantes'), exist_ok=True)
+    img = Image.new('RGB', (16, 12), (200, 160, 40))
+    for i in range(cantidad):
+        nombre = hashlib.sha256(str(i).encode()).hexdigest()[:GaleriaService.HASH_LENGTH]
+        img.save(os.path.join(carpeta, f"{nombre}.jpg"), 'JPEG')
+
+
+def galeria_en(carpeta):
+    """GaleriaService que lee de una carpeta temporal"""
+    clase = type('GaleriaBenchmark', (GaleriaService,), {
+        'UPLOAD_FOLDER': carpeta,
+        'VARIANTS_FOLDER': os.path.join(carpeta, 'variantes'),
+    })
+    return clase()
+
+
+# ==================== BENCHMARKS ====================
+
+def bench_catalogo(app, tamanos):
+    print("Catálogo (ServicioService / ServicioRepository)")
+    with app.test_request_context():
+        for cantidad in tamanos:
+            generar_catalogo(cantidad)
+            servicio_service = ServicioService()
+            
+            def en_frio():
+                servicio_service._catalogo = None
+                servicio_service.listar_servicios()
+            
+            informar('listar_servicios (frío)', cantidad, medir(en_frio, 3))
+            informar('listar_servicios (snapshot)', cantidad, medir(servicio_service.listar_servicios))
+            informar('listar_agrupados', cantidad, medir(servicio_service.listar_agrupados))
+            informar('listar_por_precio (SQL)', cantidad,
+                     medir(lambda: servicio_service.listar_por_precio('20.000', '50.000')))
+            informar('ServicioRepository.get_all', cantidad, medir(ServicioRepository.get_all, 3))
+            informar('render servicios.html', cantidad, medir(lambda: render_template(
+                'servicios.html',
+                categorias=servicio_service.listar_agrupados(),
+                titulos=Servicio.CATEGORIA_TITULOS,
+            ), 3))
+            db.session.remove()
+
+
+def bench_galeria(app, tamanos):
+    print("Galería (GaleriaService)")
+    with app.app_context():
+        for cantidad in tamanos:
+            carpeta = tempfile.mkdtemp(prefix='aptbarber-bench-')
+            try:
+                generar_galeria(carpeta, cantidad)
+                galeria_service = galeria_en(carpeta)
+                
+                def indexar():
+                    GaleriaImagen.query.delete()
+                    db.session.commit()
+                    galeria_service.indexar_carpeta()
+                
+                def en_frio():
+                    galeria_service.invalidar_manifest()
+                    galeria_service.obtener_galeria()
+                
+                def ultima_pagina():
+                    cursor = galeria_service.obtener_pagina(None, galeria_service.PAGINA_MAXIMA).siguiente
+                    while cursor:
+                        cursor = galeria_service.obtener_pagina(cursor, galeria_service.PAGINA_MAXIMA).siguiente
+                
+                informar('indexar_carpeta', cantidad, medir(indexar, 1))
+                informar('obtener_galeria (BD)', cantidad, medir(en_frio, 3))
+                informar('obtener_galeria (manifest)', cantidad, medir(galeria_service.obtener_galeria))
+                informar('obtener_contador_imagenes', cantidad, medir(galeria_service.obtener_contador_imagenes))
+                informar('recorrer todas las páginas', cantidad, medir(ultima_pagina, 3))
+            finally:
+                shutil.rmtree(carpeta, ignore_errors=True)
+                GaleriaImagen.query.delete()
+                db.session.commit()
+
+
+def bench_optimizar():
+    print("Procesamiento (optimizar_imagen)")
+    carpeta = tempfile.mkdtemp(prefix='aptbarber-bench-')
+    try:
+        original = os.path.join(carpeta, 'original.jpg')
+        Image.effect_noise((3000, 2000), 64).convert('RGB').save(original, 'JPEG', quality=95)
+        origen = os.path.join(carpeta, 'origen.jpg')
+        destino = os.path.join(carpeta, 'destino.jpg')
+        
+        def optimizar():
+            # optimizar_imagen elimina el origen: se parte de una copia
+            shutil.copyfile(original, origen)
+            procesador_imagenes.optimizar_imagen(
+                origen, destino, GaleriaService.MAX_WIDTH, GaleriaService.IMAGE_QUALITY,
+                GaleriaService.VARIANT_WIDTHS, os.path.join(carpeta, 'variantes'),
+                GaleriaService.MAX_IMAGE_PIXELS
+            )
+        
+        informar('optimizar_imagen 3000x2000', 1, medir(optimizar, 3))
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def comprobar_presupuestos(app, contador, tamanos):
+    """Comprueba las consultas por ruta; retorna la lista de excesos"""
+    print("Presupuestos de consultas SQL (frío / caliente)")
+    excesos = []
+    
+    for cantidad in tamanos:
+        with app.app_context():
+            generar_catalogo(cantidad)
+        
+        client = app.test_client()
+        for url, (max_frio, max_caliente) in PRESUPUESTOS.items():
+            if url.startswith('/admin'):
+                client.post('/admin/login', data={'username': 'admin', 'password': 'barber123'})
+            else:
+                client.get('/admin/logout')
+            
+            # En frío no hay ni páginas ni manifiesto de galería en memoria:
+            # la primera petición paga también la carga del índice
+            limpiar_cache_paginas()
+            with app.app_context():
+                get_galeria_service().invalidar_manifest()
+            AuthService.invalidar_usuario()
+            frio = contador.medir(lambda: client.get(url))
+            caliente = contador.medir(lambda: client.get(url))
+            
+            estado = 'ok'
+            if frio > max_frio or caliente > max_caliente:
+                estado = f'EXCEDIDO (máx. {max_frio}/{max_caliente})'
+                excesos.append((url, cantidad, frio, caliente))
+            print(f"  {url:<48} n={cantidad:<6} {frio:>3} / {caliente:<3} {estado}")
+    
+    return excesos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rapido', action='store_true', help='tamaños pequeños')
+    args = parser.parse_args()
+    
+    catalogos = CATALOGOS_RAPIDO if args.rapido else CATALOGOS
+    galerias = GALERIAS_RAPIDO if args.rapido else GALERIAS
+    
+    app = create_app('testing')
+    with app.app_context():
+        contador = ContadorConsultas(db.engine)
+    
+    bench_catalogo(app, catalogos)
+    bench_galeria(app, galerias)
+    bench_optimizar()
+    excesos = comprobar_presupuestos(app, contador, catalogos)
+    
+    if excesos:
+        print(f"✗ {len(excesos)} ruta(s) superan su presupuesto de consultas")
+        return 1
+    print("✓ Presupuestos de consultas cumplidos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Configuración de gunicorn: gunicorn -c gunicorn.conf.py
+Dimensiona workers e hilos según los núcleos y la memoria del contenedor,
+precarga la app y la precalienta antes del fork.
+"""
+import gc
+import os
+import shutil
+import tempfile
+
+
+def _nucleos():
+    """Núcleos disponibles respetando afinidad y la cuota de CPU del cgroup"""
+    try:
+        nucleos = len(os.sched_getaffinity(0))
+    except AttributeError:
+        nucleos = os.cpu_count() or 1
+    
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            cuota, periodo = f.read().split()
+        if cuota != 'max':
+            nucleos = min(nucleos, max(1, int(int(cuota) / int(periodo))))
+    except (OSError, ValueError):
+        pass
+    
+    return nucleos
+
+
+def _memoria_mb():
+    """Memoria disponible para el contenedor en MB (límite del cgroup o RAM total)"""
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            limite = f.read().strip()
+        if limite != 'max':
+            return int(limite) // (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    
+    try:
+        with open('/proc/meminfo') as f:
+            for linea in f:
+                if linea.startswith('MemTotal:'):
+                    return int(linea.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    
+    return None
+
+
+# Memoria estimada por worker (app + hilos)
+MEMORIA_POR_WORKER_MB = int(os.environ.get('WORKER_MEMORY_MB', 150))
+# Cada worker crea bajo demanda su propio pool de imágenes (procesos spawn):
+# un proceso por worker salvo IMAGE_WORKERS explícito. Se fija antes de que
+# la app precargada lea app.core.config.
+os.environ.setdefault('IMAGE_WORKERS', '1')
+IMAGE_WORKERS = int(os.environ['IMAGE_WORKERS'])
+MEMORIA_POR_PROCESO_IMAGEN_MB = int(os.environ.get('IMAGE_WORKER_MEMORY_MB', 100))
+
+
+def _workers():
+    if os.environ.get('WEB_CONCURRENCY'):
+        return int(os.environ['WEB_CONCURRENCY'])
+    
+    workers = 2 * _nucleos() + 1
+    memoria = _memoria_mb()
+    if memoria:
+        # Pico por worker: la app más su pool de imágenes completo
+        por_worker = MEMORIA_POR_WORKER_MB + IMAGE_WORKERS * MEMORIA_POR_PROCESO_IMAGEN_MB
+        workers = min(workers, memoria // por_worker)
+    return max(1, workers)
+
+
+# Métricas multiproceso: debe definirse antes de que la app importe prometheus_client.
+# La carpeta se vacía en on_starting: un arranque nuevo no hereda contadores de otro.
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(tempfile.gettempdir(), 'aptbarber-metricas')
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+wsgi_app = 'wsgi:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+workers = _workers()
+# Hilos: las peticiones esperan sobre todo E/S (SQLite, disco de la galería)
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Reciclar workers de vez en cuando acota fugas de memoria
+max_requests = 2000
+max_requests_jitter = 200
+
+preload_app = True
+accesslog = '-'
+
+
+def on_starting(server):
+    """Borra los .db de métricas de ejecuciones anteriores"""
+    carpeta = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        if os.path.isdir(ruta):
+            shutil.rmtree(ruta, ignore_errors=True)
+        else:
+            os.remove(ruta)
+
+
+def when_ready(server):
+    """Precalienta la app precargada en el maestro antes de crear los workers"""
+    from app.core.warmup import precalentar
+    
+    plantillas = precalentar(server.app.wsgi())
+    # Fuera del GC: sus recorridos no tocan (ni copian) la memoria heredada
+    gc.freeze()
+    server.log.info(
+        "Precalentado: %d plantillas; %d workers x %d hilos, %d proceso(s) de imágenes por worker",
+        plantillas, workers, threads, IMAGE_WORKERS
+    )
+
+
+def post_fork(server, worker):
+    """Cada worker abre sus propias conexiones a la base de datos"""
+    from app.domain.models import db
+    
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Descarta las métricas en vivo (gauges) del worker terminado"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,22 @@
+// Seguimiento de subidas a la galería procesadas en segundo plano
+const galeriaTrabajo = document.getElementById('galeriaTrabajo');
+
+if (galeriaTrabajo) {
+    const consultarTrabajo = () => {
+        fetch(galeriaTrabajo.dataset.url)
+            .then(res => res.json())
+            .then(trabajo => {
+                if (trabajo.estado === 'completado' || trabajo.error) {
+                    // Recargar sin el parámetro ?trabajo para mostrar la galería nueva
+                    window.location.replace(window.location.pathname);
+                    return;
+                }
+                galeriaTrabajo.textContent =
+                    `Optimizando imágenes... ${trabajo.procesadas + trabajo.fallidas}/${trabajo.total}`;
+                setTimeout(consultarTrabajo, 1500);
+            })
+            .catch(() => setTimeout(consultarTrabajo, 3000));
+    };
+
+    consultarTrabajo();
+}
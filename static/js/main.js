@@ -4,8 +4,9 @@ window.addEventListener('scroll', () => {
 });
 
 // Duplicar carrusel para loop infinito
+// (solo si la galería cabe en una página: si no, se cargan más con scroll infinito)
 const track = document.querySelector('.gallery-track');
-if (track) {
+if (track && !track.dataset.siguiente) {
     track.innerHTML += track.innerHTML;
 }
 
@@ -42,7 +43,7 @@ document.querySelectorAll('.mobile-nav a').forEach(link => {
 
 // Duplicar para loop infinito
 const galleryTrack = document.getElementById('galleryTrack');
-if (galleryTrack) {
+if (galleryTrack && !galleryTrack.dataset.siguiente) {
     galleryTrack.innerHTML += galleryTrack.innerHTML;
 }
 
@@ -0,0 +1,68 @@
+"""
+Fixtures comunes: una app de testing (SQLite en memoria) por test
+"""
+import pytest
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from app.core.factory import create_app
+from app.domain.models import db
+from app.services.auth_service import AuthService, LimitadorIntentos
+from app.services.service_locator import ServiceLocator
+from app.web.page_cache import limpiar_cache_paginas
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """App nueva con servicios, cachés y limitadores vacíos"""
+    # Los singletons guardan versiones de la base anterior: se empiezan de cero
+    monkeypatch.setattr(ServiceLocator, '_servicios', {})
+    monkeypatch.setattr(AuthService, '_limite_ip', LimitadorIntentos(
+        AuthService.LOGIN_MAX_POR_IP, AuthService.LOGIN_VENTANA
+    ))
+    monkeypatch.setattr(AuthService, '_limite_usuario', LimitadorIntentos(
+        AuthService.LOGIN_MAX_POR_USUARIO, AuthService.LOGIN_VENTANA
+    ))
+    AuthService.invalidar_usuario()
+    limpiar_cache_paginas()
+    
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+
+
+class ClientePorPeticion(FlaskClient):
+    """
+    Cada petición con su propio contexto de aplicación, como en producción.
+    Sin esto reutilizaría el del fixture `app` y compartiría `g` (y el
+    usuario que Flask-Login guarda en él) con las peticiones anteriores.
+    """
+    
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            return super().open(*args, **kwargs)
+
+
+@pytest.fixture
+def client(app):
+    app.test_client_class = ClientePorPeticion
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(client):
+    """Cliente con la sesión del administrador iniciada"""
+    client.post('/admin/login', data={'username': 'admin', 'password': 'barber123'})
+    return client
+
+
+@pytest.fixture
+def consultas(app):
+    """Lista con las sentencias SQL ejecutadas desde el inicio del test"""
+    sentencias = []
+    
+    def _registrar(conn, cursor, sentencia, *args):
+        sentencias.append(sentencia)
+    
+    event.listen(db.engine, 'before_cursor_execute', _registrar)
+    yield sentencias
+    event.remove(db.engine, 'before_cursor_execute', _registrar)
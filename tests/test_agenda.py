@@ -0,0 +1,133 @@
+"""
+Agenda: bitmap de slots, búsqueda de huecos y API de reservas
+"""
+import random
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+import pytest
+from app.domain.models import AgendaDia, Appointment, db
+from app.services.agenda_service import DisponibilidadService
+
+
+def test_mascara_y_slots():
+    assert AgendaDia.mascara(2, 3) == 0b11100
+    assert AgendaDia.slots_para(15) == 1
+    assert AgendaDia.slots_para(20) == 2
+    assert AgendaDia.slots_para(0) == 1
+
+
+def test_slot_y_hora_son_inversos():
+    fecha = date(2026, 10, 19)
+    for slot in range(40):
+        hora = AgendaDia.hora_de_slot(fecha, slot)
+        assert AgendaDia.slot_de_hora(hora.time()) == slot
+
+
+def test_mascara_horario():
+    # Lunes 9:00-19:00 (40 slots), sábado 9:00-17:00 (32), domingo cerrado
+    assert AgendaDia.mascara_horario(date(2026, 10, 19)) == (1 << 40) - 1
+    assert AgendaDia.mascara_horario(date(2026, 10, 24)) == (1 << 32) - 1
+    assert AgendaDia.mascara_horario(date(2026, 10, 25)) == 0
+
+
+@pytest.mark.parametrize('slots', [1, 2, 3, 4, 5, 7, 8, 13])
+def test_inicios_libres_coincide_con_fuerza_bruta(slots):
+    rnd = random.Random(slots)
+    for _ in range(200):
+        libres = rnd.getrandbits(48) | rnd.getrandbits(48)
+        esperado = sum(
+            1 << i for i in range(48)
+            if all(libres >> j & 1 for j in range(i, i + slots))
+        )
+        assert DisponibilidadService.inicios_libres(libres, slots) == esperado
+
+
+def test_api_disponibilidad_devuelve_huecos_libres(client):
+    datos = client.get('/api/disponibilidad?servicio=1&n=5').get_json()
+    
+    inicios = [datetime.fromisoformat(h['inicio']) for h in datos['huecos']]
+    assert len(inicios) == 5
+    assert inicios == sorted(inicios)
+    assert all(inicio.minute % AgendaDia.SLOT_MINUTOS == 0 for inicio in inicios)
+
+
+@pytest.mark.parametrize('query, status', [
+    ('', 400), ('servicio=abc', 400), ('servicio=999', 404),
+    (f'servicio={2 ** 63}', 400), ('servicio=1&barbero=' + '9' * 30, 400),
+])
+def test_api_disponibilidad_parametros_invalidos(client, query, status):
+    assert client.get(f'/api/disponibilidad?{query}').status_code == status
+
+
+def _primer_hueco(client):
+    hueco = client.get('/api/disponibilidad?servicio=1&n=1').get_json()['huecos'][0]
+    return hueco['barbero']['id'], datetime.fromisoformat(hueco['inicio'])
+
+
+def test_reserva_y_conflicto(client):
+    barbero, inicio = _primer_hueco(client)
+    datos = {'barbero': barbero, 'servicio': 1, 'inicio': inicio.isoformat(), 'nombre': 'Ana'}
+    
+    assert client.post('/api/reservas', json=datos).status_code == 201
+    
+    conflicto = client.post('/api/reservas', json=dict(datos, nombre='Luis'))
+    assert conflicto.status_code == 409
+    assert conflicto.get_json()['alternativas']
+
+
+def test_reserva_convierte_la_zona_horaria(app, client):
+    barbero, inicio = _primer_hueco(client)
+    # La misma hora expresada en otra zona
+    otra_zona = inicio.replace(tzinfo=ZoneInfo(app.config['TIMEZONE'])).astimezone(ZoneInfo('Asia/Tokyo'))
+    
+    respuesta = client.post('/api/reservas', json={
+        'barbero': barbero, 'servicio': 1, 'inicio': otra_zona.isoformat(), 'nombre': 'Ana',
+    })
+    
+    assert respuesta.status_code == 201
+    assert respuesta.get_json()['inicio'] == inicio.isoformat(timespec='minutes')
+
+
+def test_reserva_recorta_nombre_y_telefono(client):
+    barbero, inicio = _primer_hueco(client)
+    
+    respuesta = client.post('/api/reservas', json={
+        'barbero': barbero, 'servicio': 1, 'inicio': inicio.isoformat(),
+        'nombre': '  Ana  ', 'telefono': '   ',
+    })
+    
+    assert respuesta.status_code == 201
+    cita = db.session.get(Appointment, respuesta.get_json()['id'])
+    assert cita.cliente_nombre == 'Ana'
+    assert cita.cliente_telefono is None
+
+
+@pytest.mark.parametrize('cuerpo', [
+    [1, 2],
+    'texto',
+    {'barbero': 1, 'servicio': 1, 'inicio': 'mañana', 'nombre': 'Ana'},
+    {'barbero': 'uno', 'servicio': 1, 'inicio': '2030-01-07T10:00', 'nombre': 'Ana'},
+    {'barbero': 1, 'servicio': 1, 'inicio': '2030-01-07T10:00', 'nombre': ['Ana']},
+    {'barbero': 2 ** 63, 'servicio': 1, 'inicio': '2030-01-07T10:00', 'nombre': 'Ana'},
+    {'barbero': 1, 'servicio': -1, 'inicio': '2030-01-07T10:00', 'nombre': 'Ana'},
+])
+def test_reserva_cuerpo_invalido(client, cuerpo):
+    respuesta = client.post('/api/reservas', json=cuerpo)
+    
+    assert respuesta.status_code == 400
+    assert 'isoformat' not in respuesta.get_json()['error']
+
+
+@pytest.mark.parametrize('campo, valor', [
+    ('nombre', 'A' * 5000),
+    ('nombre', '   '),
+    ('telefono', '6' * 31),
+])
+def test_reserva_valida_los_textos(client, campo, valor):
+    barbero, inicio = _primer_hueco(client)
+    datos = {'barbero': barbero, 'servicio': 1, 'inicio': inicio.isoformat(), 'nombre': 'Ana'}
+    
+    respuesta = client.post('/api/reservas', json=dict(datos, **{campo: valor}))
+    
+    assert respuesta.status_code == 400
+    assert Appointment.query.filter_by(cliente_nombre=valor).count() == 0
@@ -0,0 +1,74 @@
+"""
+Arranque: comandos de esquema y datos iniciales y precalentamiento previo al fork
+"""
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import inspect, text
+from app.core.config import TestingConfig
+from app.core.database import inicializar_esquema
+from app.domain.models import Servicio, User, db
+from app.core.warmup import PAGINAS_PUBLICAS, precalentar
+from app.web import page_cache
+
+
+@pytest.fixture
+def sin_auto_init(monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'AUTO_INIT_DB', False)
+
+
+def test_create_app_no_toca_la_base(sin_auto_init, app):
+    assert inspect(db.engine).get_table_names() == []
+
+
+def test_db_init_y_seed_son_idempotentes(sin_auto_init, app):
+    runner = app.test_cli_runner()
+    
+    for _ in range(2):
+        assert runner.invoke(args=['db-init']).exit_code == 0
+        resultado = runner.invoke(args=['seed'])
+        assert resultado.exit_code == 0, resultado.output
+    
+    nombres = [s.nombre for s in Servicio.query]
+    assert User.query.count() == 1
+    assert nombres and len(nombres) == len(set(nombres))
+
+
+def test_db_init_elimina_columnas_obsoletas(sin_auto_init, app):
+    # Esquema anterior: agenda_dia con `version` NOT NULL sin valor por defecto
+    with db.engine.begin() as conn:
+        conn.execute(text('CREATE TABLE agenda_dia (barbero_id INTEGER NOT NULL, fecha DATE NOT NULL, '
+                          'ocupados BIGINT NOT NULL, version INTEGER NOT NULL, '
+                          'PRIMARY KEY (barbero_id, fecha))'))
+    
+    inicializar_esquema()
+    
+    columnas = {c['name'] for c in inspect(db.engine).get_columns('agenda_dia')}
+    assert 'version' not in columnas
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO agenda_dia (barbero_id, fecha, ocupados) VALUES (1, '2030-01-07', 1)"))
+
+
+def _total(muestra):
+    """Suma de una serie de contadores del registro por defecto"""
+    return sum(s.value for familia in REGISTRY.collect() for s in familia.samples if s.name == muestra)
+
+
+@pytest.fixture
+def base_en_archivo(tmp_path, monkeypatch):
+    """precalentar() cierra las conexiones: una base en memoria se perdería"""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'barberia.db'}")
+
+
+def test_precalentar_llena_las_caches_sin_contar_metricas(base_en_archivo, app):
+    peticiones = _total('aptbarber_http_requests_total')
+    caches = _total('aptbarber_cache_total')
+    
+    plantillas = precalentar(app)
+    
+    assert plantillas == len(app.jinja_env.list_templates(extensions=('html',)))
+    assert len(page_cache._paginas) == len(PAGINAS_PUBLICAS)
+    assert _total('aptbarber_http_requests_total') == peticiones
+    assert _total('aptbarber_cache_total') == caches
+    # Fuera del precalentamiento las peticiones sí cuentan
+    app.test_client().get('/servicios')
+    assert _total('aptbarber_http_requests_total') == peticiones + 1
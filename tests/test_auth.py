@@ -0,0 +1,115 @@
+"""
+Autenticación: caché de identidades y limitador de intentos de login
+"""
+import pytest
+from app.domain.models import User, db
+from app.services.auth_service import AuthService, IntentosExcedidos, LimitadorIntentos, UsuarioSesion
+
+
+def test_cargar_usuario_devuelve_copia(app):
+    usuario = AuthService.cargar_usuario(1)
+    
+    assert isinstance(usuario, UsuarioSesion)
+    assert usuario.username == 'admin' and usuario.get_id() == '1'
+    assert AuthService.cargar_usuario('1') is usuario
+    assert AuthService.cargar_usuario('abc') is None
+    assert AuthService.cargar_usuario(999) is None
+
+
+def test_peticion_autenticada_no_consulta_el_usuario(admin, consultas):
+    admin.get('/admin/')
+    del consultas[:]
+    
+    admin.get('/admin/')
+    
+    assert not any('FROM user' in sentencia for sentencia in consultas)
+
+
+def test_cambio_de_usuario_invalida_la_cache(app):
+    usuario = AuthService.cargar_usuario(1)
+    
+    db.session.get(User, 1).username = 'barbero'
+    db.session.commit()
+    
+    assert AuthService.cargar_usuario(1) is not usuario
+    assert AuthService.cargar_usuario(1).username == 'barbero'
+
+
+def test_cache_caduca_con_el_ttl(app, monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr('app.services.auth_service.time.monotonic', lambda: reloj[0])
+    usuario = AuthService.cargar_usuario(1)
+    
+    reloj[0] += AuthService.USER_CACHE_TTL + 1
+    
+    assert AuthService.cargar_usuario(1) is not usuario
+
+
+# ==================== LÍMITE DE INTENTOS ====================
+
+def test_limitador_ventana_deslizante(monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr('app.services.auth_service.time.monotonic', lambda: reloj[0])
+    limitador = LimitadorIntentos(max_intentos=3, ventana=60)
+    
+    assert [limitador.registrar('ip') for _ in range(3)] == [0, 0, 0]
+    assert limitador.registrar('ip') == 60
+    assert limitador.registrar('otra') == 0
+    
+    reloj[0] += 30
+    assert limitador.registrar('ip') == 30
+    reloj[0] += 30
+    assert limitador.registrar('ip') == 0
+
+
+def test_limitador_reiniciar():
+    limitador = LimitadorIntentos(max_intentos=1, ventana=60)
+    limitador.registrar('clave')
+    limitador.reiniciar('clave')
+    
+    assert limitador.registrar('clave') == 0
+
+
+def test_limitador_descarta_claves_antiguas(monkeypatch):
+    monkeypatch.setattr(LimitadorIntentos, 'MAX_CLAVES', 2)
+    limitador = LimitadorIntentos(max_intentos=1, ventana=60)
+    for clave in ('a', 'b', 'c'):
+        limitador.registrar(clave)
+    
+    assert list(limitador._intentos) == ['b', 'c']
+
+
+def test_bloqueo_por_usuario_no_afecta_a_otra_ip(app):
+    for _ in range(AuthService.LOGIN_MAX_POR_USUARIO):
+        assert AuthService.validar_credenciales('admin', 'mal', ip='10.0.0.1') is None
+    with pytest.raises(IntentosExcedidos):
+        AuthService.validar_credenciales('ADMIN', 'barber123', ip='10.0.0.1')
+    
+    assert AuthService.validar_credenciales('admin', 'barber123', ip='10.0.0.2') is not None
+
+
+def test_bloqueo_no_verifica_el_hash(app, monkeypatch):
+    for _ in range(AuthService.LOGIN_MAX_POR_USUARIO):
+        AuthService.validar_credenciales('admin', 'mal', ip='10.0.0.1')
+    monkeypatch.setattr('app.services.auth_service.check_password_hash', None)
+    
+    with pytest.raises(IntentosExcedidos):
+        AuthService.validar_credenciales('admin', 'barber123', ip='10.0.0.1')
+
+
+def test_usuario_inexistente_verifica_hash(app, monkeypatch):
+    verificados = []
+    monkeypatch.setattr('app.services.auth_service.check_password_hash',
+                        lambda hash_, password: verificados.append(hash_) or False)
+    
+    assert AuthService.validar_credenciales('nadie', 'x', ip='10.0.0.3') is None
+    assert verificados == [AuthService._obtener_hash_ficticio()]
+
+
+def test_login_excedido_responde_429(client):
+    for _ in range(AuthService.LOGIN_MAX_POR_USUARIO):
+        client.post('/admin/login', data={'username': 'admin', 'password': 'mal'})
+    
+    respuesta = client.post('/admin/login', data={'username': 'admin', 'password': 'mal'})
+    assert respuesta.status_code == 429
+    assert 'Retry-After' in respuesta.headers
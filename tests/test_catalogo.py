@@ -0,0 +1,182 @@
+"""
+Catálogo: snapshot en memoria, agrupación, precios, API paginada e importación
+"""
+import time
+import pytest
+from app.domain.models import Servicio
+from app.domain.repositories import ServicioRepository
+from app.services.service_locator import get_servicio_service
+from app.services.servicio_service import ImportacionInvalida, ServicioService
+
+
+def test_snapshot_solo_consulta_la_version(app, consultas):
+    servicio_service = ServicioService()
+    primera = servicio_service.listar_servicios()
+    
+    del consultas[:]
+    
+    assert servicio_service.listar_servicios() is primera
+    assert len(consultas) == 1 and 'contador_version' in consultas[0]
+
+
+def test_snapshot_se_invalida_al_editar_desde_el_panel(admin):
+    servicio_service = get_servicio_service()
+    servicio = servicio_service.listar_servicios()[0]
+    
+    admin.post(f'/admin/servicios/{servicio.id}/editar', data={
+        'nombre': 'Corte renovado', 'precio': '50.000', 'descripcion': '', 'categoria': servicio.categoria,
+    })
+    
+    nombres = [s.nombre for s in servicio_service.listar_servicios()]
+    assert 'Corte renovado' in nombres and servicio.nombre not in nombres
+
+
+def test_listar_agrupados_por_categoria(app):
+    servicio_service = ServicioService()
+    
+    agrupados = servicio_service.listar_agrupados()
+    
+    assert [categoria for categoria, _ in agrupados] == list(Servicio.CATEGORIA_TIPOS)
+    for categoria, servicios in agrupados:
+        assert all(s.categoria == categoria for s in servicios)
+    assert sum(len(s) for _, s in agrupados) == len(servicio_service.listar_servicios())
+    # Sin cambios de versión se reutiliza la agrupación
+    assert servicio_service.listar_agrupados() is agrupados
+    assert servicio_service.listar_por_categoria('extra') == dict(agrupados)['extra']
+
+
+@pytest.mark.parametrize('precio, centavos', [
+    ('35.000', 3500000),
+    ('35,50', 3550),
+    ('1.234,5', 123450),
+    ('1,234.56', 123456),
+    ('1.000.000', 100000000),
+    ('$ 25', 2500),
+    (12, 1200),
+])
+def test_precio_a_centavos(precio, centavos):
+    assert Servicio.precio_a_centavos(precio) == centavos
+
+
+@pytest.mark.parametrize('precio', ['', None, 'abc', '-5', 'NaN', 'Infinity'])
+def test_precio_a_centavos_invalido(precio):
+    with pytest.raises(ValueError):
+        Servicio.precio_a_centavos(precio)
+
+
+def test_listar_por_precio_filtra_y_ordena_en_sql(app):
+    servicio_service = ServicioService()
+    
+    servicios = servicio_service.listar_por_precio('20.000', '50.000', descendente=True)
+    
+    centavos = [s.precio_centavos for s in servicios]
+    assert centavos
+    assert centavos == sorted(centavos, reverse=True)
+    assert all(2000000 <= c <= 5000000 for c in centavos)
+    assert len(servicios) == sum(
+        2000000 <= s.precio_centavos <= 5000000 for s in servicio_service.listar_servicios()
+    )
+
+
+# ==================== IMPORTACIÓN ====================
+
+def test_validar_fila_normaliza():
+    datos = ServicioService()._validar_fila({
+        'nombre': '  Corte  ', 'precio': '35.000', 'descripcion': '',
+        'categoria': 'extra', 'duracion_minutos': '45', 'is_active': 'Sí',
+    })
+    # Las columnas opcionales vacías no se incluyen
+    assert datos == {
+        'nombre': 'Corte', 'precio': '35.000', 'precio_centavos': 3500000,
+        'categoria': 'extra', 'duracion_minutos': 45, 'is_active': True,
+    }
+
+
+@pytest.mark.parametrize('fila, mensaje', [
+    (['Corte', '10'], 'Se esperaba un objeto'),
+    ({'precio': '10'}, 'Nombre requerido'),
+    ({'nombre': 'x' * 101, 'precio': '10'}, 'demasiado largo'),
+    ({'nombre': 'Corte', 'precio': 'gratis'}, 'Precio inválido'),
+    ({'nombre': 'Corte', 'precio': '10', 'categoria': 'otra'}, 'Categoría inválida'),
+    ({'nombre': 'Corte', 'precio': '10', 'duracion_minutos': '0'}, 'Duración inválida'),
+    ({'nombre': 'Corte', 'precio': '10', 'is_active': 'quizás'}, 'is_active'),
+])
+def test_validar_fila_rechaza(fila, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        ServicioService()._validar_fila(fila)
+
+
+def test_importar_catalogo_crea_y_actualiza(app):
+    servicio_service = ServicioService()
+    filas = servicio_service.leer_catalogo(
+        'nombre,precio,categoria\ncorte clásico,40.000,corte\nNuevo,10.000,extra\n', 'csv'
+    )
+    
+    assert servicio_service.importar_catalogo(filas) == (1, 1)
+    assert Servicio.query.filter_by(nombre='corte clásico').one().precio_centavos == 4000000
+
+
+def test_importar_catalogo_con_errores_no_escribe(app):
+    servicio_service = ServicioService()
+    total = Servicio.query.count()
+    
+    with pytest.raises(ImportacionInvalida) as e:
+        servicio_service.importar_catalogo([
+            {'nombre': 'A', 'precio': '10'},
+            {'nombre': 'a', 'precio': '20'},
+            {'nombre': '', 'precio': '30'},
+        ])
+    
+    assert [fila for fila, _ in e.value.errores] == [2, 3]
+    assert Servicio.query.count() == total
+
+
+# ==================== API ====================
+
+def test_api_servicios_recorre_paginas_sin_repetir(client):
+    ids, cursor = [], None
+    while True:
+        url = '/api/servicios?limit=3' + (f'&after={cursor}' if cursor else '')
+        datos = client.get(url).get_json()
+        ids += [s['id'] for s in datos['servicios']]
+        cursor = datos['siguiente']
+        if not cursor:
+            break
+    
+    assert ids == sorted(set(ids))
+    assert len(ids) == Servicio.query.filter_by(is_active=True).count()
+
+
+def test_api_servicios_campos(client):
+    datos = client.get('/api/servicios?fields=id,precio&categoria=extra').get_json()
+    
+    assert datos['servicios']
+    assert all(set(s) == {'id', 'precio'} for s in datos['servicios'])
+    assert client.get('/api/servicios?fields=id,clave').status_code == 400
+
+
+@pytest.mark.parametrize('after', ['abc', '-1', '²', '1.5', '', str(2 ** 63), '9' * 30])
+def test_api_servicios_cursor_invalido(client, after):
+    respuesta = client.get(f'/api/servicios?after={after}')
+    
+    assert respuesta.status_code == 400
+    assert respuesta.get_json() == {'error': 'Cursor inválido'}
+
+
+def test_api_servicios_cursor_en_el_limite(client):
+    datos = client.get(f'/api/servicios?after={2 ** 63 - 1}').get_json()
+    
+    assert datos['servicios'] == [] and datos['siguiente'] is None
+
+
+def test_api_servicios_304_y_last_modified_cambia_al_borrar(client):
+    primera = client.get('/api/servicios')
+    assert client.get('/api/servicios', headers={'If-None-Match': primera.headers['ETag']}).status_code == 304
+    # Last-Modified tiene resolución de segundos
+    time.sleep(1.1)
+    ServicioRepository.hard_delete(primera.get_json()['servicios'][0]['id'])
+    
+    segunda = client.get('/api/servicios',
+                         headers={'If-Modified-Since': primera.headers['Last-Modified']})
+    assert segunda.status_code == 200
+    assert segunda.headers['Last-Modified'] != primera.headers['Last-Modified']
@@ -0,0 +1,49 @@
+"""
+Configuración: perfiles del motor por backend y PRAGMAs de SQLite
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from app.core import config
+from app.core.database import registrar_pragmas_sqlite
+
+
+@pytest.mark.parametrize('url, esperada', [
+    ('postgres://u:p@host/db', 'postgresql://u:p@host/db'),
+    ('postgresql://u:p@host/db', 'postgresql://u:p@host/db'),
+    ('sqlite:///barberia.db', 'sqlite:///barberia.db'),
+])
+def test_normalizar_database_url(url, esperada):
+    assert config.normalizar_database_url(url) == esperada
+
+
+def test_perfil_motor_por_backend():
+    assert config.perfil_motor('sqlite:///x.db') is config.SQLITE_ENGINE_OPTIONS
+    assert config.perfil_motor('postgresql://h/db')['pool_pre_ping'] is True
+    assert config.perfil_motor('mysql://h/db') == {}
+
+
+def test_get_config_resuelve_el_perfil(monkeypatch):
+    monkeypatch.setattr(config.ProductionConfig, 'SQLALCHEMY_DATABASE_URI', 'postgres://u:p@h/db')
+    
+    produccion = config.get_config('production')
+    
+    assert produccion.SQLALCHEMY_DATABASE_URI == 'postgresql://u:p@h/db'
+    assert produccion.SQLALCHEMY_ENGINE_OPTIONS['pool_size'] == config.POSTGRES_ENGINE_OPTIONS['pool_size']
+
+
+def test_sqlite_espera_el_bloqueo_el_tiempo_configurado(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'barberia.db'}", **config.SQLITE_ENGINE_OPTIONS)
+    registrar_pragmas_sqlite(engine)
+    
+    with engine.connect() as conn:
+        # El PRAGMA se aplica tras el timeout del driver: es el valor efectivo
+        assert conn.execute(text('PRAGMA busy_timeout')).scalar() == config.SQLITE_LOCK_TIMEOUT * 1000
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA synchronous')).scalar() == 1
+    engine.dispose()
+
+
+def test_timeout_del_driver_coincide_con_el_pragma():
+    timeout = config.SQLITE_ENGINE_OPTIONS['connect_args']['timeout']
+    
+    assert timeout * 1000 == config.SQLITE_PRAGMAS['busy_timeout']
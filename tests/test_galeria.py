@@ -0,0 +1,335 @@
+"""
+Galería: manifiesto en memoria, variantes, almacenamiento por contenido,
+subidas, cursores de paginación y API /api/galeria
+"""
+import hashlib
+import io
+import math
+import os
+import re
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from app.domain.models import GaleriaImagen
+from app.domain.repositories import GaleriaImagenRepository
+from app.services import procesador_imagenes
+from app.services.procesador_imagenes import ProcesadorImagenes
+from app.services.servicio_service import GaleriaService
+from app.web.assets import CSS_ENTRADA, _resolver_imports, minificar_css
+
+
+def test_manifiesto_no_consulta_la_base_en_caliente(app, consultas):
+    galeria_service = GaleriaService()
+    primera = galeria_service.obtener_galeria()
+    
+    del consultas[:]
+    
+    assert galeria_service.obtener_galeria() == primera
+    assert galeria_service.obtener_contador_imagenes() == len(primera)
+    assert consultas == []
+
+
+def test_manifiesto_se_reconstruye_al_cambiar_la_version(app, monkeypatch):
+    monkeypatch.setattr(GaleriaService, 'MANIFEST_CHECK_INTERVAL', 0)
+    galeria_service = GaleriaService()
+    total = galeria_service.obtener_contador_imagenes()
+    
+    # Otro worker indexa una imagen: solo cambia la versión en BD
+    GaleriaImagenRepository.create(
+        filename='0123456789abcdef.jpg', hash='0' * 64, width=800, height=600,
+        tamano_bytes=1000, variantes='', created_at=datetime(2099, 1, 1),
+    )
+    
+    assert galeria_service.obtener_contador_imagenes() == total + 1
+    assert galeria_service.obtener_galeria()[0]['filename'] == '0123456789abcdef.jpg'
+
+
+def _reglas_css(css):
+    """(media query o '', selector, declaraciones) de un CSS minificado, en orden"""
+    reglas, medias = [], ['']
+    for media, selector, cuerpo, cierre in re.findall(
+            r'(@media[^{]*)\{|([^{}]+)\{([^{}]*)\}|(\})', css):
+        if media:
+            medias.append(media)
+        elif cierre:
+            medias.pop()
+        else:
+            reglas.append((medias[-1], selector, dict(
+                d.split(':', 1) for d in cuerpo.split(';') if ':' in d
+            )))
+    return reglas
+
+
+def _aplica(media, viewport):
+    maximo = re.search(r'max-width:\s*(\d+)px', media)
+    minimo = re.search(r'min-width:\s*(\d+)px', media)
+    return ((not maximo or viewport <= int(maximo.group(1)))
+            and (not minimo or viewport >= int(minimo.group(1))))
+
+
+def _valor(reglas, viewport, selector, propiedad):
+    """Valor que gana la cascada (mismo selector, gana la última regla)"""
+    valor = None
+    for media, sel, declaraciones in reglas:
+        if sel == selector and propiedad in declaraciones and _aplica(media, viewport):
+            valor = declaraciones[propiedad]
+    return int(valor.removesuffix('px'))
+
+
+def test_sizes_cubre_la_caja_del_css(app):
+    css = minificar_css(_resolver_imports(app.static_folder, CSS_ENTRADA, set()))
+    reglas = _reglas_css(css)
+    galeria_service = GaleriaService()
+    
+    for width, height in ((800, 400), (100, 1000), (1200, 800)):
+        esperado = []
+        for viewport, _, _ in galeria_service.CAJAS_GALERIA:
+            caja_w = _valor(reglas, viewport or 1920, '.gallery-item', 'width')
+            caja_h = _valor(reglas, viewport or 1920, '.gallery-item img', 'height')
+            # object-fit: cover: la imagen cubre la caja conservando la proporción
+            pintado = max(caja_w, math.ceil(caja_h * width / height))
+            esperado.append(f"(max-width: {viewport}px) {pintado}px" if viewport else f"{pintado}px")
+        
+        assert galeria_service._sizes(width, height) == ', '.join(esperado)
+
+
+def test_srcset_incluye_variantes_y_original(app):
+    galeria_service = GaleriaService()
+    imagen = GaleriaImagenRepository.create(
+        filename='0123456789abcdef.jpg', hash='1' * 64, width=1000, height=750,
+        tamano_bytes=1000, variantes='320,640,960',
+    )
+    
+    entrada = galeria_service._entrada_manifest(imagen)
+    
+    assert entrada['srcset'] == (
+        '/static/images/gallery/variantes/0123456789abcdef-320w.jpg 320w, '
+        '/static/images/gallery/variantes/0123456789abcdef-640w.jpg 640w, '
+        '/static/images/gallery/variantes/0123456789abcdef-960w.jpg 960w, '
+        '/static/images/gallery/0123456789abcdef.jpg 1000w'
+    )
+    # Panel, lightbox y og:image piden miniaturas a /img
+    assert entrada['thumb'] == '/img/0123456789abcdef.jpg?w=360&q=60'
+    assert entrada['grande'] == '/img/0123456789abcdef.jpg?w=1200&q=80&fmt=webp'
+    assert entrada['tarjeta'] == '/img/0123456789abcdef.jpg?w=1200&q=80&fmt=jpeg'
+
+
+# ==================== SUBIDAS ====================
+
+@pytest.fixture
+def carpeta_galeria(app, tmp_path, monkeypatch):
+    """Galería, variantes y staging en una carpeta temporal"""
+    galeria = tmp_path / 'gallery'
+    monkeypatch.setattr(GaleriaService, 'UPLOAD_FOLDER', str(galeria))
+    monkeypatch.setattr(GaleriaService, 'VARIANTS_FOLDER', str(galeria / 'variantes'))
+    monkeypatch.setattr(GaleriaService, 'STAGING_FOLDER', str(tmp_path / 'staging'))
+    galeria.mkdir()
+    return galeria
+
+
+def _jpeg(color=(200, 160, 40), size=(1000, 750)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def _subir(admin, *imagenes):
+    archivos = [(io.BytesIO(datos), f'foto{i}.jpg') for i, datos in enumerate(imagenes)]
+    return admin.post('/admin/galeria/subir', data={'images': archivos})
+
+
+def test_subida_crea_trabajo_e_indexa(admin, carpeta_galeria):
+    respuesta = _subir(admin, _jpeg((10, 20, 30)), _jpeg((30, 20, 10)))
+    
+    trabajo = respuesta.headers['Location'].rsplit('trabajo=', 1)[1]
+    estado = admin.get(f'/admin/galeria/trabajos/{trabajo}').get_json()
+    assert estado == {'id': trabajo, 'total': 2, 'procesadas': 2, 'fallidas': 0, 'estado': 'completado'}
+    
+    nombres = sorted(p.name for p in carpeta_galeria.glob('*.jpg'))
+    assert len(nombres) == 2
+    assert GaleriaImagen.query.filter(GaleriaImagen.filename.in_(nombres)).count() == 2
+    assert len(list((carpeta_galeria / 'variantes').glob('*.jpg'))) == 6
+    assert not os.listdir(GaleriaService.STAGING_FOLDER)
+
+
+def test_trabajo_inexistente(admin):
+    assert admin.get('/admin/galeria/trabajos/no-existe').status_code == 404
+
+
+def test_cola_llena_descarta_la_subida(app, carpeta_galeria, monkeypatch):
+    monkeypatch.setattr(ProcesadorImagenes, 'MAX_PENDIENTES', 1)
+    galeria_service = GaleriaService()
+    monkeypatch.setattr(galeria_service, '_procesador', lambda: ProcesadorImagenes(1))
+    archivos = [FileStorage(io.BytesIO(_jpeg((i, i, i))), f'{i}.jpg') for i in range(2)]
+    
+    assert galeria_service.encolar_subidas(archivos) == (None, 0)
+    assert not os.listdir(GaleriaService.STAGING_FOLDER)
+    assert not list(carpeta_galeria.glob('*.jpg'))
+
+
+def test_reservar_es_todo_o_nada(monkeypatch):
+    monkeypatch.setattr(ProcesadorImagenes, 'MAX_PENDIENTES', 3)
+    procesador = ProcesadorImagenes(1)
+    
+    assert procesador.reservar(2)
+    assert not procesador.reservar(2)
+    assert procesador.reservar(1)
+
+
+def test_pool_optimiza_en_otro_proceso(tmp_path):
+    origen = tmp_path / 'origen.jpg'
+    origen.write_bytes(_jpeg(size=(2000, 1500)))
+    procesador = ProcesadorImagenes(1)
+    terminado = threading.Event()
+    
+    try:
+        assert procesador.reservar(1)
+        future = procesador.encolar(
+            lambda f: terminado.set(),
+            str(origen), str(tmp_path / 'destino.jpg'), 1200, 80, (320, 640), str(tmp_path / 'variantes'),
+        )
+        resultado = future.result(timeout=60)
+    finally:
+        procesador.cerrar()
+    
+    assert terminado.wait(5)
+    assert (resultado.filename, resultado.width, resultado.variantes) == ('destino.jpg', 1200, (320, 640))
+    assert not origen.exists()
+    # El hueco de la cola se libera al terminar
+    assert procesador.reservar(ProcesadorImagenes.MAX_PENDIENTES)
+
+
+def test_subida_repetida_no_duplica(admin, carpeta_galeria):
+    datos = _jpeg()
+    _subir(admin, datos)
+    
+    respuesta = _subir(admin, datos)
+    
+    assert 'trabajo=' not in respuesta.headers['Location']
+    assert [p.name for p in carpeta_galeria.glob('*.jpg')] == [
+        f"{hashlib.sha256(datos).hexdigest()[:GaleriaService.HASH_LENGTH]}.jpg"
+    ]
+
+
+def test_misma_imagen_en_un_lote_se_procesa_una_vez(app, carpeta_galeria):
+    datos = _jpeg()
+    archivos = [FileStorage(io.BytesIO(datos), nombre) for nombre in ('a.jpg', 'b.jpg')]
+    
+    trabajo, duplicadas = GaleriaService().encolar_subidas(archivos)
+    
+    assert (trabajo.total, duplicadas) == (1, 1)
+
+
+@pytest.mark.parametrize('ruta, inmutable', [
+    ('images/gallery/07a17b848b9d6327.jpeg', True),
+    ('images/hero.jpg', False),
+])
+def test_cache_control_inmutable_solo_con_hash(client, ruta, inmutable):
+    respuesta = client.get(f'/static/{ruta}')
+    
+    assert respuesta.status_code == 200
+    assert ('immutable' in respuesta.headers.get('Cache-Control', '')) is inmutable
+
+
+# ==================== DECODIFICACIÓN ACOTADA ====================
+
+def test_subida_demasiado_grande_no_deja_staging(app, carpeta_galeria, monkeypatch):
+    monkeypatch.setattr(GaleriaService, 'MAX_IMAGE_BYTES', 1024)
+    galeria_service = GaleriaService()
+    
+    resultado = galeria_service.encolar_subidas([FileStorage(io.BytesIO(_jpeg()), 'a.jpg')])
+    
+    assert resultado == (None, 0)
+    assert not os.listdir(GaleriaService.STAGING_FOLDER)
+
+
+def test_jpeg_se_decodifica_reducido(tmp_path):
+    origen = tmp_path / 'grande.jpg'
+    origen.write_bytes(_jpeg(size=(4800, 3600)))
+    
+    with procesador_imagenes.abrir_reducida(str(origen), 1200, 60_000_000) as img:
+        assert img.size == (1200, 900)
+
+
+def test_rechaza_bomba_de_descompresion(tmp_path):
+    origen = tmp_path / 'bomba.jpg'
+    origen.write_bytes(_jpeg(size=(2000, 1500)))
+    
+    with pytest.raises(ValueError, match='demasiado grande'):
+        procesador_imagenes.abrir_reducida(str(origen), 1200, 1_000_000)
+
+
+@pytest.mark.parametrize('formato', ['PNG', 'WEBP'])
+def test_formatos_sin_draft_tienen_limite_propio(tmp_path, monkeypatch, formato):
+    monkeypatch.setattr(procesador_imagenes, 'MAX_PIXELS_DECODIFICADOS', 2_000_000)
+    origen = tmp_path / f'grande.{formato.lower()}'
+    Image.new('RGB', (2000, 1500)).save(origen, formato)
+    
+    with pytest.raises(ValueError, match='decodificar'):
+        procesador_imagenes.abrir_reducida(str(origen), 1200, 60_000_000)
+    # Un JPEG aún mayor pasa: se decodifica a 1/4 (1200x900)
+    (tmp_path / 'grande.jpg').write_bytes(_jpeg(size=(4800, 3600)))
+    with procesador_imagenes.abrir_reducida(str(tmp_path / 'grande.jpg'), 1200, 60_000_000) as img:
+        assert img.size == (1200, 900)
+
+
+# ==================== CURSORES Y API ====================
+
+ID_DESBORDADO = str(2 ** 63)
+
+
+def test_cursor_ida_y_vuelta():
+    galeria_service = GaleriaService()
+    imagen = SimpleNamespace(created_at=datetime(2026, 1, 21, 23, 57, 38, 123456), id=42)
+    
+    cursor = galeria_service._codificar_cursor(imagen)
+    
+    assert galeria_service._decodificar_cursor(cursor) == (imagen.created_at, 42)
+
+
+@pytest.mark.parametrize('cursor', [
+    '', 'abc', '20260121-', '-5', '20261399000000000000-1',
+    '20260121235738123456-0', '20260121235738123456--5', '20260121235738123456-²',
+    f'20260121235738123456-{ID_DESBORDADO}', '20260121235738123456-' + '9' * 30,
+    # Fecha válida pero con otra forma que la que genera el servicio
+    '2026121235738123456-1', ' 20260121235738123456-1',
+])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        GaleriaService()._decodificar_cursor(cursor)
+
+
+def test_api_galeria_recorre_paginas_sin_repetir(client):
+    primera = client.get('/api/galeria?limit=4').get_json()
+    nombres, siguiente = [i['filename'] for i in primera['imagenes']], primera['siguiente']
+    
+    while siguiente:
+        pagina = client.get(f'/api/galeria?limit=4&after={siguiente}').get_json()
+        nombres += [i['filename'] for i in pagina['imagenes']]
+        siguiente = pagina['siguiente']
+    
+    assert len(nombres) == len(set(nombres)) == primera['total']
+
+
+def test_api_galeria_etag(client):
+    respuesta = client.get('/api/galeria')
+    
+    assert client.get('/api/galeria', headers={'If-None-Match': respuesta.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('after', ['basura', f'20260121235738123456-{ID_DESBORDADO}'])
+def test_api_galeria_cursor_invalido(client, after):
+    respuesta = client.get(f'/api/galeria?after={after}')
+    
+    assert respuesta.status_code == 400
+    assert 'Cursor inválido' in respuesta.get_json()['error']
+
+
+def test_panel_con_cursor_desbordado_muestra_la_primera_pagina(admin):
+    respuesta = admin.get(f'/admin/?galeria=20260121235738123456-{ID_DESBORDADO}')
+    
+    assert respuesta.status_code == 200
+    assert 'Cursor inválido' in respuesta.get_data(as_text=True)
@@ -0,0 +1,107 @@
+"""
+Instrumentación por petición (Server-Timing) y métricas Prometheus
+"""
+import logging
+import re
+import pytest
+from sqlalchemy import text
+from prometheus_client import REGISTRY
+from sqlalchemy.exc import OperationalError
+from app.core.config import ProductionConfig, TestingConfig
+from app.core.instrumentacion import resumen
+from app.domain.models import db
+
+
+def _server_timing(respuesta):
+    """{métrica: (cantidad o None, ms)} de la cabecera Server-Timing"""
+    metricas = {}
+    for parte in respuesta.headers['Server-Timing'].split(', '):
+        nombre, dur = re.match(r'(\w+);dur=([\d.]+)', parte).groups()
+        cantidad = re.search(r'\((\d+)\)"$', parte)
+        metricas[nombre] = (int(cantidad.group(1)) if cantidad else None, float(dur))
+    return metricas
+
+
+def test_server_timing_desglosa_sql_y_plantillas(client, consultas):
+    respuesta = client.get('/servicios')
+    
+    metricas = _server_timing(respuesta)
+    assert metricas['db'][0] == len(consultas)
+    assert metricas['tpl'][0] >= 1
+    assert metricas['galeria'][0] == 1
+    assert metricas['total'][1] >= metricas['db'][1]
+
+
+def test_server_timing_desactivable(app, client):
+    app.config['SERVER_TIMING'] = False
+    
+    assert 'Server-Timing' not in client.get('/servicios').headers
+
+
+def test_peticion_lenta_se_registra(app, client, caplog):
+    app.config['SLOW_REQUEST_MS'] = 1
+    
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get('/servicios')
+    
+    assert any('Petición lenta: GET /servicios -> 200' in r.getMessage() for r in caplog.records)
+
+
+def test_sentencia_fallida_no_se_mide(app):
+    with app.test_request_context():
+        with pytest.raises(OperationalError):
+            db.session.execute(text('SELECT * FROM no_existe'))
+        db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+        
+        assert resumen()['db'][0] == 1
+
+
+# ==================== /metrics ====================
+
+def _muestra(nombre, **etiquetas):
+    return REGISTRY.get_sample_value(nombre, etiquetas) or 0
+
+
+def test_metrics_expone_peticiones_y_latencia(client):
+    antes = _muestra('aptbarber_http_requests_total', endpoint='main.servicios', method='GET', status='200')
+    client.get('/servicios')
+    
+    respuesta = client.get('/metrics')
+    
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/plain'
+    texto = respuesta.get_data(as_text=True)
+    assert 'aptbarber_http_request_duration_seconds_bucket{endpoint="main.servicios"' in texto
+    assert _muestra('aptbarber_http_requests_total',
+                    endpoint='main.servicios', method='GET', status='200') == antes + 1
+
+
+def test_excepcion_no_controlada_cuenta_como_500(app, client):
+    def falla():
+        raise RuntimeError('falla')
+    app.add_url_rule('/falla', 'falla', falla)
+    antes = _muestra('aptbarber_http_requests_total', endpoint='falla', method='GET', status='500')
+    
+    with pytest.raises(RuntimeError):
+        client.get('/falla')
+    
+    assert _muestra('aptbarber_http_requests_total', endpoint='falla', method='GET', status='500') == antes + 1
+
+
+def test_metrics_con_token(app, client):
+    app.config['METRICS_TOKEN'] = 'secreto'
+    
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer otro'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secreto'}).status_code == 200
+
+
+@pytest.fixture
+def token_obligatorio(monkeypatch):
+    monkeypatch.setattr(TestingConfig, 'METRICS_REQUIRE_TOKEN', True)
+
+
+def test_sin_token_obligatorio_no_se_expone(token_obligatorio, client):
+    assert ProductionConfig.METRICS_REQUIRE_TOKEN
+    assert client.get('/metrics').status_code == 404
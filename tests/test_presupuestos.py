@@ -0,0 +1,16 @@
+"""
+Presupuestos de consultas SQL por ruta (los de benchmarks/run.py) como test:
+un N+1 en cualquier página rompe el build
+"""
+from app.domain.models import db
+from benchmarks.run import CATALOGOS_RAPIDO, ContadorConsultas, comprobar_presupuestos
+
+
+def test_presupuestos_de_consultas(app):
+    contador = ContadorConsultas(db.engine)
+    
+    excesos = comprobar_presupuestos(app, contador, CATALOGOS_RAPIDO)
+    
+    assert excesos == [], [
+        f"{url} n={cantidad}: {frio}/{caliente} consultas" for url, cantidad, frio, caliente in excesos
+    ]
@@ -0,0 +1,264 @@
+"""
+Páginas y estáticos: caché de páginas, mensajes del panel, assets empaquetados,
+precomprimidos y miniaturas /img
+"""
+import gzip
+import io
+import json
+import os
+from concurrent.futures import Future
+import pytest
+from flask import url_for
+from app.domain.repositories import ServicioRepository
+from app.services.service_locator import get_miniatura_service
+from app.web import assets, page_cache, precomprimidos
+from app.web.static_cache import IMMUTABLE_CACHE_CONTROL
+
+
+def test_pagina_publica_responde_304_con_su_etag(client, consultas):
+    respuesta = client.get('/servicios')
+    etag = respuesta.headers['ETag']
+    
+    del consultas[:]
+    revalidada = client.get('/servicios', headers={'If-None-Match': etag})
+    
+    assert revalidada.status_code == 304
+    assert revalidada.headers['ETag'] == etag
+    assert revalidada.get_data() == b''
+    # Solo se comprueban las versiones: nada de renderizar ni cargar el catálogo
+    assert all('contador_version' in sentencia for sentencia in consultas)
+
+
+def test_pagina_cacheada_se_sirve_sin_renderizar(client, monkeypatch):
+    html = client.get('/servicios').get_data()
+    monkeypatch.setattr('app.web.main.routes.render_template', None)
+    
+    assert client.get('/servicios').get_data() == html
+
+
+def test_etag_cambia_con_el_catalogo(client):
+    antes = client.get('/servicios')
+    servicio_id = ServicioRepository.get_all()[0].id
+    ServicioRepository.update(servicio_id, nombre='Corte renovado')
+    
+    despues = client.get('/servicios', headers={'If-None-Match': antes.headers['ETag']})
+    
+    assert despues.status_code == 200
+    assert despues.headers['ETag'] != antes.headers['ETag']
+    assert 'Corte renovado' in despues.get_data(as_text=True)
+
+
+def test_admin_autenticado_no_usa_la_cache(admin):
+    page_cache.limpiar_cache_paginas()
+    
+    respuesta = admin.get('/servicios')
+    
+    assert respuesta.status_code == 200
+    assert 'ETag' not in respuesta.headers
+    assert not page_cache._paginas
+
+
+# ==================== PANEL ====================
+
+def test_importacion_con_errores_se_muestra_en_el_panel(admin):
+    archivo = (io.BytesIO('nombre,precio\n,10\nCorte,abc\n'.encode()), 'catalogo.csv')
+    
+    respuesta = admin.post('/admin/servicios/importar', data={'archivo': archivo},
+                           follow_redirects=True)
+    
+    html = respuesta.get_data(as_text=True)
+    assert 'alert alert-error' in html
+    assert 'Fila 1: Nombre requerido' in html
+    assert 'Fila 2: Precio inválido' in html
+
+
+# ==================== CSS EMPAQUETADO ====================
+
+@pytest.fixture
+def estaticos(tmp_path):
+    """Carpeta static/ con una cadena de @import que entra en subcarpetas"""
+    css = tmp_path / 'css'
+    (css / 'components' / 'base').mkdir(parents=True)
+    (css / 'style.css').write_text(
+        "@import url('components/01-gallery.css');\n.raiz { background: url(\"../images/hero.jpg\"); }\n"
+    )
+    (css / 'components' / '01-gallery.css').write_text(
+        "@import 'base/colores.css';\n@import url(\"02-flechas.css\");\n"
+        ".galeria { background: url('../../images/fondo.png'); }\n"
+    )
+    (css / 'components' / '02-flechas.css').write_text(".flecha { mask: url(flecha.svg); }\n")
+    (css / 'components' / 'base' / 'colores.css').write_text(
+        ".color { background: url(data:image/png;base64,AAAA); }\n"
+    )
+    return tmp_path
+
+
+def test_bundle_resuelve_imports_anidados_en_subcarpetas(estaticos):
+    css = assets._resolver_imports(str(estaticos), assets.CSS_ENTRADA, set())
+    
+    assert '@import' not in css
+    # En orden, y cada url() relativa a css/ (donde vive el bundle)
+    assert [linea for linea in css.splitlines() if linea] == [
+        ".color { background: url(data:image/png;base64,AAAA); }",
+        ".flecha { mask: url(components/flecha.svg); }",
+        ".galeria { background: url('../images/fondo.png'); }",
+        '.raiz { background: url("../images/hero.jpg"); }',
+    ]
+
+
+def test_construir_css_reemplaza_el_bundle_anterior(estaticos):
+    primero = assets.construir_css(str(estaticos))
+    (estaticos / 'css' / 'components' / '02-flechas.css').write_text('.flecha { color: red; }\n')
+    
+    segundo = assets.construir_css(str(estaticos))
+    
+    assert primero != segundo and assets.BUNDLE_NAME.match(segundo.split('/')[1])
+    assert not (estaticos / primero).exists()
+    assert json.loads((estaticos / assets.MANIFEST).read_text()) == {assets.CSS_ENTRADA: segundo}
+    assert '.flecha{color: red}' in (estaticos / segundo).read_text()
+
+
+def test_url_for_apunta_al_bundle(app):
+    app.extensions['assets'] = {assets.CSS_ENTRADA: 'css/style.0123456789ab.css'}
+    
+    with app.test_request_context():
+        assert url_for('static', filename='css/style.css') == '/static/css/style.0123456789ab.css'
+        assert url_for('static', filename='css/base/01-variables.css') == '/static/css/base/01-variables.css'
+
+
+def test_bundle_se_sirve_inmutable(app, client, estaticos, monkeypatch):
+    monkeypatch.setattr(app, 'static_folder', str(estaticos))
+    bundle = assets.construir_css(str(estaticos))
+    
+    respuesta = client.get(f'/static/{bundle}')
+    
+    assert respuesta.status_code == 200
+    assert respuesta.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert 'immutable' not in client.get('/static/css/style.css').headers.get('Cache-Control', '')
+
+
+# ==================== ESTÁTICOS PRECOMPRIMIDOS ====================
+
+@pytest.fixture
+def comprimidos(app, estaticos, monkeypatch):
+    """static/ temporal con css/app.css y sus hermanos .br/.gz"""
+    monkeypatch.setattr(app, 'static_folder', str(estaticos))
+    (estaticos / 'css' / 'app.css').write_text('.a { color: red; }\n' * 100)
+    (estaticos / 'css' / 'corto.css').write_text('.a { color: red; }\n')
+    precomprimidos.comprimir_estaticos(str(estaticos))
+    return estaticos
+
+
+def test_comprimir_estaticos(comprimidos):
+    css = comprimidos / 'css'
+    
+    assert (css / 'app.css.gz').exists()
+    assert (css / 'app.css.br').exists() == (precomprimidos.brotli is not None)
+    # Demasiado pequeño para compensar
+    assert not (css / 'corto.css.gz').exists()
+    # Los hermanos sin original se eliminan
+    (css / 'app.css').unlink()
+    assert precomprimidos.comprimir_estaticos(str(comprimidos))[1] >= 1
+    assert not (css / 'app.css.gz').exists()
+
+
+@pytest.mark.parametrize('aceptadas, codificacion', [
+    ('br, gzip', 'br'),
+    ('gzip;q=1.0, br;q=0', 'gzip'),
+    ('identity', None),
+])
+def test_negocia_accept_encoding(client, comprimidos, aceptadas, codificacion):
+    if codificacion == 'br' and precomprimidos.brotli is None:
+        pytest.skip('brotli no instalado')
+    
+    respuesta = client.get('/static/css/app.css', headers={'Accept-Encoding': aceptadas})
+    
+    assert respuesta.headers.get('Content-Encoding') == codificacion
+    assert respuesta.mimetype == 'text/css'
+    assert 'Accept-Encoding' in respuesta.headers['Vary']
+    cuerpo = respuesta.get_data()
+    if codificacion == 'br':
+        cuerpo = precomprimidos.brotli.decompress(cuerpo)
+    elif codificacion == 'gzip':
+        cuerpo = gzip.decompress(cuerpo)
+    assert cuerpo == (comprimidos / 'css' / 'app.css').read_bytes()
+
+
+def test_hermano_desactualizado_no_se_sirve(client, comprimidos):
+    original = comprimidos / 'css' / 'app.css'
+    original.write_text('.b { color: blue; }\n' * 100)
+    mtime = os.path.getmtime(original) + 10
+    os.utime(original, (mtime, mtime))
+    
+    respuesta = client.get('/static/css/app.css', headers={'Accept-Encoding': 'br, gzip'})
+    
+    assert 'Content-Encoding' not in respuesta.headers
+    assert respuesta.get_data() == original.read_bytes()
+
+
+# ==================== MINIATURAS /img ====================
+
+@pytest.fixture
+def miniaturas(app, tmp_path):
+    """Caché de miniaturas en una carpeta temporal"""
+    app.config['IMAGE_CACHE_DIR'] = str(tmp_path)
+    return tmp_path
+
+
+def _una_imagen(client):
+    return client.get('/api/galeria?limit=1').get_json()['imagenes'][0]
+
+
+def test_miniatura_ancho_permitido(client, miniaturas):
+    respuesta = client.get(f"/img/{_una_imagen(client)['filename']}?w=320&fmt=webp")
+    
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'image/webp'
+
+
+@pytest.mark.parametrize('query', ['w=500', 'w=320&q=70', 'w=abc', 'fmt=gif'])
+def test_miniatura_parametros_fuera_de_la_lista(client, miniaturas, query):
+    assert client.get(f"/img/{_una_imagen(client)['filename']}?{query}").status_code == 400
+
+
+def test_miniatura_inexistente(client, miniaturas):
+    assert client.get('/img/no-existe.jpg?w=320').status_code == 404
+
+
+@pytest.mark.parametrize('campo, mimetype', [
+    ('thumb', None), ('grande', 'image/webp'), ('tarjeta', 'image/jpeg'),
+])
+def test_urls_de_las_plantillas_estan_permitidas(client, miniaturas, campo, mimetype):
+    url = _una_imagen(client)[campo]
+    
+    respuesta = client.get(url)
+    
+    assert url.startswith('/img/')
+    assert respuesta.status_code == 200
+    assert mimetype is None or respuesta.mimetype == mimetype
+
+
+def test_espera_agotada_responde_503(app, client, miniaturas, monkeypatch):
+    filename = _una_imagen(client)['filename']
+    miniatura_service = get_miniatura_service()
+    monkeypatch.setattr(miniatura_service, 'ESPERA_MAXIMA', 0.05)
+    # Otra petición "generando" la misma miniatura que nunca termina
+    with app.test_request_context():
+        destino = miniatura_service._resolver(filename, '320', None, None)[1]
+    miniatura_service._en_curso[destino] = Future()
+    
+    respuesta = client.get(f'/img/{filename}?w=320')
+    
+    assert respuesta.status_code == 503
+    assert respuesta.headers['Retry-After'] == str(miniatura_service.REINTENTO)
+
+
+def test_og_image_usa_la_url_publica(app, client, miniaturas):
+    assert 'og:image' not in client.get('/').get_data(as_text=True)
+    
+    app.config['SITE_URL'] = 'https://aptbarber.example'
+    page_cache.limpiar_cache_paginas()
+    html = client.get('/').get_data(as_text=True)
+    
+    tarjeta = _una_imagen(client)['tarjeta'].replace('&', '&amp;')
+    assert f'<meta property="og:image" content="https://aptbarber.example{tarjeta}">' in html